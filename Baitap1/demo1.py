@@ -13,8 +13,13 @@ from mininet.node import Host
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info
 from mininet.link import TCLink
+import os
+import sys
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import ovsbatch
+
 class LinuxRouter(Host):
     """Host với chức năng router"""
     
@@ -115,38 +120,27 @@ def buildTopology():
     # =====================================
     info('*** Cấu hình OVS switches\n')
     
-    for switch in [s1, s2, s3, s4, s5]:
-        switch.cmd('ovs-ofctl del-flows ' + switch.name)
+    cfg = {sw.name: ovsbatch.SwitchConfig(sw).replace_flows('priority=0,action=normal')
+           for sw in [s1, s2, s3, s4, s5]}
     
     # Switch S1
-    s1.cmd('ovs-vsctl set port s1-eth1 vlan_mode=trunk trunk=10,20,30,99')
-    s1.cmd('ovs-vsctl set port s1-eth2 tag=99')
-    s1.cmd('ovs-vsctl set port s1-eth3 vlan_mode=trunk trunk=10,20,30,99')
-    s1.cmd('ovs-ofctl add-flow s1 priority=0,action=normal')
+    cfg['s1'].trunk('s1-eth1', [10, 20, 30, 99]).access('s1-eth2', 99).trunk('s1-eth3', [10, 20, 30, 99])
     
     # Switch S2
-    s2.cmd('ovs-vsctl set port s2-eth1 vlan_mode=trunk trunk=10,20,30,99')
-    s2.cmd('ovs-vsctl set port s2-eth2 vlan_mode=trunk trunk=10')
-    s2.cmd('ovs-vsctl set port s2-eth3 vlan_mode=trunk trunk=20')
-    s2.cmd('ovs-vsctl set port s2-eth4 vlan_mode=trunk trunk=30')
-    s2.cmd('ovs-ofctl add-flow s2 priority=0,action=normal')
+    cfg['s2'].trunk('s2-eth1', [10, 20, 30, 99]).trunk('s2-eth2', 10).trunk('s2-eth3', 20).trunk('s2-eth4', 30)
     
     # Switch S3 (VLAN 10)
-    s3.cmd('ovs-vsctl set port s3-eth1 vlan_mode=trunk trunk=10')
-    s3.cmd('ovs-vsctl set port s3-eth2 tag=10')
-    s3.cmd('ovs-vsctl set port s3-eth3 tag=10')
-    s3.cmd('ovs-ofctl add-flow s3 priority=0,action=normal')
+    cfg['s3'].trunk('s3-eth1', 10).access('s3-eth2', 10).access('s3-eth3', 10)
     
     # Switch S4 (VLAN 20)
-    s4.cmd('ovs-vsctl set port s4-eth1 vlan_mode=trunk trunk=20')
-    s4.cmd('ovs-vsctl set port s4-eth2 tag=20')
-    s4.cmd('ovs-vsctl set port s4-eth3 tag=20')
-    s4.cmd('ovs-ofctl add-flow s4 priority=0,action=normal')
+    cfg['s4'].trunk('s4-eth1', 20).access('s4-eth2', 20).access('s4-eth3', 20)
     
     # Switch S5 (VLAN 30)
-    s5.cmd('ovs-vsctl set port s5-eth1 vlan_mode=trunk trunk=30')
-    s5.cmd('ovs-vsctl set port s5-eth2 tag=30')
-    s5.cmd('ovs-ofctl add-flow s5 priority=0,action=normal')
+    cfg['s5'].trunk('s5-eth1', 30).access('s5-eth2', 30)
+    
+    # Một giao dịch OVSDB cho mọi port + một lệnh replace-flows mỗi switch
+    report = ovsbatch.apply_all(cfg.values())
+    info('  ' + ovsbatch.format_report(report, cfg.values()))
     
     time.sleep(2)
     
@@ -334,21 +328,24 @@ def buildTopology():
     # === QoS TRÊN OVS SWITCHES ===
     info('*** Cấu hình QoS trên Switches\n')
     
+    qos = {sw.name: ovsbatch.SwitchConfig(sw) for sw in [s1, s2, s3, s4, s5]}
+    
     # VLAN 10 ports: max 50Mbps (giữ nguyên)
-    s2.cmd('ovs-vsctl set interface s2-eth2 ingress_policing_rate=50000')
-    s2.cmd('ovs-vsctl set interface s2-eth2 ingress_policing_burst=5000')
+    qos['s2'].policing('s2-eth2', 50000, 5000)
     
     # VLAN 20 ports: max 1Gbps (THAY ĐỔI)
-    s2.cmd('ovs-vsctl set interface s2-eth3 ingress_policing_rate=1000000')
-    s2.cmd('ovs-vsctl set interface s2-eth3 ingress_policing_burst=100000')
+    qos['s2'].policing('s2-eth3', 1000000, 100000)
     
     # VLAN 30 ports: max 100Mbps (giữ nguyên)
-    s2.cmd('ovs-vsctl set interface s2-eth4 ingress_policing_rate=100000')
-    s2.cmd('ovs-vsctl set interface s2-eth4 ingress_policing_burst=10000')
+    qos['s2'].policing('s2-eth4', 100000, 10000)
     
     # QoS queues trên OVS
-    for switch in [s1, s2, s3, s4, s5]:
-        switch.cmd(f'ovs-vsctl set port {switch.name}-eth1 qos=@newqos -- --id=@newqos create qos type=linux-htb other-config:max-rate=1000000000 queues=0=@q0,1=@q1,2=@q2 -- --id=@q0 create queue other-config:min-rate=500000000 other-config:max-rate=1000000000 -- --id=@q1 create queue other-config:min-rate=300000000 other-config:max-rate=800000000 -- --id=@q2 create queue other-config:min-rate=200000000 other-config:max-rate=500000000 2>/dev/null')
+    for name, c in qos.items():
+        c.htb(f'{name}-eth1', 1000000000, [(500000000, 1000000000),
+                                           (300000000, 800000000),
+                                           (200000000, 500000000)])
+    
+    info('  ' + ovsbatch.format_report(ovsbatch.apply_all(qos.values()), qos.values()))
     
     print('[QoS] Đã cấu hình QoS trên Switches')
     
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+CHẠY ĐỒNG LOẠT N CẶP iperf3 (FLEET) VÀ GOM KẾT QUẢ JSON
+- Server: mỗi cặp một tiến trình `iperf3 -s -1 -p <port>` riêng (một server host có thể phục vụ nhiều cặp),
+  khởi chạy đồng thời bằng node.popen() thay vì lần lượt host.cmd().
+- Client: mọi client cùng đợi tới một mốc thời gian chung rồi mới chạy `iperf3 -c ... -J`
+  → các luồng thật sự chạy song song, không lệch nhau theo thời gian gọi lệnh.
+- Kết quả JSON của từng luồng được gom thành bảng: Mbps, retransmit (TCP), jitter / loss (UDP),
+  kèm tổng, min/max và chỉ số công bằng Jain. Ghi CSV; to_numpy() trả về mảng NumPy có cấu trúc.
+Dùng: res = run_fleet([(admin1, lab1), (admin2, lab2)], duration=5, udp_bw='1M'); print(format_table(res))
+"""
+import os
+import sys
+import csv
+import time
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import netparse
+
+BASE_PORT = 5201
+START_DELAY = 1.5      # Giây – khoảng đệm để mọi client kịp khởi chạy trước mốc xuất phát chung
+READY_TIMEOUT = 5
+LOG_DIR = '/tmp/iperf_fleet'
+
+COLUMNS = ['flow', 'client', 'server', 'port', 'proto', 'mbps', 'retransmits', 'jitter_ms', 'lost_pct', 'error']
+
+def jain_index(values):
+    """Chỉ số công bằng Jain: (Σx)² / (n·Σx²), 1.0 = chia đều tuyệt đối, 1/n = một luồng chiếm hết."""
+    values = list(values)
+    sq = sum(v * v for v in values)
+    return (sum(values) ** 2) / (len(values) * sq) if values and sq > 0 else 0.0
+
+def parse_result(raw, udp=False):
+    """Trích (mbps, retransmits, jitter_ms, lost_pct, error) từ output `iperf3 -J` của client (netparse)."""
+    r = netparse.parse_iperf3_json(raw, udp)
+    return r.mbps, r.retransmits, r.jitter_ms, r.lost_pct, r.error
+
+def _wait_ready(server_ports, timeout):
+    """Chờ mọi cổng server LISTEN; mỗi server node kiểm tra trong một vòng shell riêng, chạy đồng thời."""
+    procs = []
+    for node, ports in server_ports.items():
+        checks = ' && '.join(f"ss -ltn | grep -q ':{p} '" for p in ports)
+        loop = f"i=0; until {checks}; do i=$((i+1)); [ $i -ge {int(timeout * 20)} ] && exit 1; sleep 0.05; done"
+        procs.append(node.popen(['sh', '-c', loop], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    return all(p.wait() == 0 for p in procs)
+
+def run_fleet(pairs, duration=5, udp_bw=None, streams=1, base_port=BASE_PORT,
+              start_delay=START_DELAY, name='fleet', csv_path=None):
+    """
+    Chạy đồng loạt các cặp (client_node, server_node).
+    udp_bw=None → TCP; udp_bw='1M' → UDP với băng thông mục tiêu đó. streams = -P của iperf3.
+    Trả về {'rows': [dict theo COLUMNS], 'summary': {...}, 'csv': đường dẫn CSV}.
+    """
+    udp = udp_bw is not None
+    servers, server_ports = [], {}
+    for i, (_, srv) in enumerate(pairs):
+        port = base_port + i
+        server_ports.setdefault(srv, []).append(port)
+        servers.append(srv.popen(['iperf3', '-s', '-1', '-p', str(port)],
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    ready = _wait_ready(server_ports, READY_TIMEOUT)
+
+    opts = f"-t {duration} -P {streams} -J" + (f" -u -b {udp_bw}" if udp else "")
+    t_start = time.time() + start_delay
+    clients = []
+    for i, (cli, srv) in enumerate(pairs):
+        delay = max(0.0, t_start - time.time())
+        cmd = f"sleep {delay:.3f}; exec iperf3 -c {srv.IP()} -p {base_port + i} {opts}"
+        clients.append(cli.popen(['sh', '-c', cmd], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True))
+
+    rows = []
+    deadline = t_start + duration + 15
+    for i, ((cli, srv), p) in enumerate(zip(pairs, clients)):
+        try:
+            out, _ = p.communicate(timeout=max(1.0, deadline - time.time()))
+        except subprocess.TimeoutExpired:
+            p.kill()
+            out = p.communicate()[0] or ''
+        mbps, retr, jitter, lost, err = parse_result(out, udp)
+        rows.append({'flow': i + 1, 'client': cli.name, 'server': srv.name, 'port': base_port + i,
+                     'proto': 'udp' if udp else 'tcp', 'mbps': round(mbps, 3), 'retransmits': retr,
+                     'jitter_ms': jitter, 'lost_pct': lost, 'error': err})
+    for s in servers:
+        if s.poll() is None:
+            s.kill()
+        s.wait()
+
+    result = {'rows': rows, 'summary': summarize(rows), 'csv': None}
+    result['summary']['servers_ready'] = ready
+    result['summary']['wall_s'] = round(time.time() - t_start, 2)   # ≈ duration nếu mọi luồng chạy song song
+    result['csv'] = write_csv(rows, csv_path or os.path.join(LOG_DIR, f'{name}.csv'))
+    return result
+
+def summarize(rows):
+    bw = [r['mbps'] for r in rows]
+    ok = [r for r in rows if not r['error']]
+    retr = [r['retransmits'] for r in rows if r['retransmits'] is not None]
+    jit = [r['jitter_ms'] for r in rows if r['jitter_ms'] is not None]
+    lost = [r['lost_pct'] for r in rows if r['lost_pct'] is not None]
+    return {
+        'flows': len(rows), 'ok': len(ok),
+        'total_mbps': round(sum(bw), 3),
+        'mean_mbps': round(sum(bw) / len(bw), 3) if bw else 0.0,
+        'min_mbps': round(min(bw), 3) if bw else 0.0,
+        'max_mbps': round(max(bw), 3) if bw else 0.0,
+        'jain': round(jain_index(bw), 4),
+        'retransmits': sum(retr) if retr else None,
+        'jitter_ms': round(sum(jit) / len(jit), 3) if jit else None,
+        'lost_pct': round(sum(lost) / len(lost), 2) if lost else None,
+    }
+
+def write_csv(rows, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=COLUMNS)
+        w.writeheader()
+        w.writerows(rows)
+    return path
+
+def to_numpy(rows):
+    """Bảng kết quả dạng mảng NumPy có cấu trúc (nạp numpy khi cần, NaN cho ô không áp dụng)."""
+    import numpy as np
+    nan = float('nan')
+    dtype = [('flow', 'i4'), ('client', 'U16'), ('server', 'U16'), ('port', 'i4'), ('proto', 'U3'),
+             ('mbps', 'f8'), ('retransmits', 'f8'), ('jitter_ms', 'f8'), ('lost_pct', 'f8')]
+    return np.array([(r['flow'], r['client'], r['server'], r['port'], r['proto'], r['mbps'],
+                      nan if r['retransmits'] is None else r['retransmits'],
+                      nan if r['jitter_ms'] is None else r['jitter_ms'],
+                      nan if r['lost_pct'] is None else r['lost_pct']) for r in rows], dtype=dtype)
+
+def format_table(result, max_rows=None):
+    """Bảng từng luồng + dòng tổng kết (Jain, tổng băng thông...)."""
+    fmt = lambda v, spec: '-' if v is None else format(v, spec)
+    lines = [f"{'#':>3} {'Client':<10}{'Server':<10}{'Mbps':>9}{'Retr':>7}{'Jitter':>9}{'Loss%':>7}  Lỗi"]
+    rows = result['rows'] if max_rows is None else result['rows'][:max_rows]
+    for r in rows:
+        lines.append(f"{r['flow']:>3} {r['client']:<10}{r['server']:<10}{r['mbps']:>9.2f}"
+                     f"{fmt(r['retransmits'], 'd'):>7}{fmt(r['jitter_ms'], '.3f'):>9}"
+                     f"{fmt(r['lost_pct'], '.2f'):>7}  {r['error'] or ''}")
+    if max_rows is not None and len(result['rows']) > max_rows:
+        lines.append(f"    ... ({len(result['rows']) - max_rows} luồng nữa trong {result['csv']})")
+    s = result['summary']
+    lines.append(f">>> {s['ok']}/{s['flows']} luồng OK | Tổng {s['total_mbps']:.2f} Mbps | "
+                 f"TB {s['mean_mbps']:.2f} (min {s['min_mbps']:.2f} / max {s['max_mbps']:.2f}) | "
+                 f"Jain = {s['jain']:.3f}")
+    extra = []
+    if s['retransmits'] is not None:
+        extra.append(f"Retransmit: {s['retransmits']}")
+    if s['jitter_ms'] is not None:
+        extra.append(f"Jitter TB: {s['jitter_ms']:.3f} ms")
+    if s['lost_pct'] is not None:
+        extra.append(f"Loss TB: {s['lost_pct']:.2f}%")
+    if extra:
+        lines.append(">>> " + " | ".join(extra))
+    if result['csv']:
+        lines.append(f">>> CSV: {result['csv']}")
+    return "\n".join(lines)
@@ -3,14 +3,17 @@ from mininet.node import Host
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info
 from mininet.link import TCLink
-import sys, re
+import os, sys
 import time
 import sys
-import re
 import time
 from mininet.cli import CLI
 from mininet.log import info
 
+import iperf_fleet
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import ovsbatch
+
 class LinuxRouter(Host):
     """Host với chức năng routing"""
     
@@ -113,19 +116,16 @@ class NetworkTester:
     def test4_concurrent_pairs(self):
         info('\n*** TEST 4: Concurrent Pairs\n')
         self.cleanup_iperf()
-        for i in range(5): self.lab_hosts[i].cmd('iperf3 -s -D')
-        for i in range(5): self.admin_hosts[i].cmd(f'iperf3 -c {self.lab_hosts[i].IP()} -t 3 -f m &')
-        time.sleep(4)
-        print("Done.")
+        res = iperf_fleet.run_fleet(list(zip(self.admin_hosts[:5], self.lab_hosts[:5])), duration=3, name='test4')
+        print(iperf_fleet.format_table(res))
 
     def test5_stress_test(self):
         info('\n*** TEST 5: Stress Test\n')
         self.cleanup_iperf()
-        for h in self.lab_hosts: h.cmd('iperf3 -s -D')
-        for i in range(50): 
-            self.admin_hosts[i].cmd(f'iperf3 -c {self.lab_hosts[i].IP()} -u -b 1M -t 5 &')
-        time.sleep(6)
-        print("Stress test completed.")
+        # 50 cặp UDP 1Mbps khởi chạy đồng thời, cùng mốc xuất phát, gom kết quả JSON của từng luồng
+        pairs = list(zip(self.admin_hosts, self.lab_hosts))
+        res = iperf_fleet.run_fleet(pairs, duration=5, udp_bw='1M', name='test5_stress')
+        print(iperf_fleet.format_table(res, max_rows=10))
 
     def test6_realtime_traffic(self):
         info('\n*** TEST 6: Traffic Monitor\n')
@@ -155,9 +155,7 @@ class NetworkTester:
 
         # Dùng 5 cặp máy để test TCP (TCP tốn CPU hơn UDP, dùng ít máy để kết quả chính xác)
         num_pairs = 5 
-        info(f'[INIT] Khởi động Server TCP trên {num_pairs} Lab hosts...\n')
-        for i in range(num_pairs): 
-            self.lab_hosts[i].cmd('iperf3 -s -D')
+        pairs = list(zip(self.admin_hosts[:num_pairs], self.lab_hosts[:num_pairs]))
         
         # --- PHẦN 1: GÂY NGHẼN ---
         print('\n' + '!'*60)
@@ -170,26 +168,10 @@ class NetworkTester:
         
         info('-> Đang chạy test TCP (Admin -> Lab)... vui lòng đợi 10s...\n')
         
-        # Chạy iperf3 TCP và lưu log
-        for i in range(num_pairs):
-            # KHÔNG dùng -u, mặc định là TCP
-            self.admin_hosts[i].cmd(f'iperf3 -c {self.lab_hosts[i].IP()} -t 8 -f m > /tmp/t8_cong_{i}.txt &')
-        
-        time.sleep(10)
-        
-        # Hiển thị log THỰC TẾ của máy đầu tiên
-        raw_log = self.admin_hosts[0].cmd('cat /tmp/t8_cong_0.txt')
-        self._print_raw("LOG MÁY ADMIN 1 (KHI NGHẼN)", raw_log)
-        
-        # Tính tổng
-        total_bw_cong = 0
-        for i in range(num_pairs):
-            out = self.admin_hosts[i].cmd(f'cat /tmp/t8_cong_{i}.txt')
-            # Lấy dòng cuối cùng (receiver)
-            match = re.findall(r'([\d\.]+) Mbits/sec', out)
-            if match: 
-                # Lấy số cuối cùng trong log (thường là summary)
-                total_bw_cong += float(match[-1])
+        # Chạy iperf3 TCP (KHÔNG dùng -u) đồng loạt, kết quả JSON từng luồng
+        cong = iperf_fleet.run_fleet(pairs, duration=8, name='t8_cong')
+        print(iperf_fleet.format_table(cong))
+        total_bw_cong = cong['summary']['total_mbps']
 
         print(f'>>> TỔNG BĂNG THÔNG THỰC TẾ (TCP): {total_bw_cong:.2f} Mbps')
         print(f'>>> Nhận xét: Tổng băng thông xấp xỉ 10Mbps (do bị giới hạn chia sẻ).')
@@ -205,21 +187,9 @@ class NetworkTester:
         time.sleep(5)
         
         info('-> Chạy lại test TCP... vui lòng đợi 10s...\n')
-        for i in range(num_pairs):
-            self.admin_hosts[i].cmd(f'iperf3 -c {self.lab_hosts[i].IP()} -t 8 -f m > /tmp/t8_opt_{i}.txt &')
-        
-        time.sleep(10)
-        
-        # Hiển thị log THỰC TẾ sau khi fix
-        raw_log_opt = self.admin_hosts[0].cmd('cat /tmp/t8_opt_0.txt')
-        self._print_raw("LOG MÁY ADMIN 1 (SAU TỐI ƯU)", raw_log_opt)
-        
-        total_bw_opt = 0
-        for i in range(num_pairs):
-            out = self.admin_hosts[i].cmd(f'cat /tmp/t8_opt_{i}.txt')
-            match = re.findall(r'([\d\.]+) Mbits/sec', out)
-            if match: 
-                total_bw_opt += float(match[-1])
+        opt = iperf_fleet.run_fleet(pairs, duration=8, name='t8_opt')
+        print(iperf_fleet.format_table(opt))
+        total_bw_opt = opt['summary']['total_mbps']
                 
         print(f'>>> TỔNG BĂNG THÔNG THỰC TẾ (TCP): {total_bw_opt:.2f} Mbps')
         
@@ -424,7 +394,11 @@ def buildTopology():
     # ═════════════════════════════════════════════════════════════
     # ENABLE STP (INCREASED TIME FOR 100 HOSTS)
     # ═════════════════════════════════════════════════════════════
-    info('*** Enable STP với Priority\n')
+    info('*** Enable STP + cấu hình OVS Switches (một giao dịch OVSDB)\n')
+    
+    ALL_VLANS = [10, 20, 30, 40, 50, 60, 90]
+    NORMAL = 'priority=0,action=normal'
+    cfg = {sw.name: ovsbatch.SwitchConfig(sw) for sw in [s100, s1, s2, s3, s4, s5, s6, s7]}
     
     stp_config = [
         (s1, 4096),   # Root Bridge
@@ -435,88 +409,46 @@ def buildTopology():
         (s6, 45056),
         (s7, 49152)
     ]
-    
     for switch, priority in stp_config:
-        switch.cmd(f'ovs-vsctl set Bridge {switch.name} stp_enable=true')
-        switch.cmd(f'ovs-vsctl set Bridge {switch.name} other_config:stp-priority={priority}')
+        cfg[switch.name].stp(priority)
     
-    time.sleep(3)
-    
-    # ═════════════════════════════════════════════════════════════
-    # CONFIGURE OVS SWITCHES - OPTIMIZED
-    # ═════════════════════════════════════════════════════════════
-    info('*** Cấu hình OVS Switches\n')
-    
-    for switch in [s100, s1, s2, s3, s4, s5, s6, s7]:
-        switch.cmd('ovs-ofctl del-flows ' + switch.name)
-    
-    # S100 (ISP)
-    s100.cmd('ovs-ofctl add-flow s100 priority=0,action=normal')
+    # Bảng flow mỗi switch chỉ còn flow normal (replace-flows = del-flows + add-flow trong một lệnh)
+    for c in cfg.values():
+        c.replace_flows(NORMAL)
     
     # S1 (Core 1 - Primary)
-    s1.cmd('ovs-vsctl set port s1-eth1 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s1.cmd('ovs-vsctl set port s1-eth2 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s1.cmd('ovs-vsctl set port s1-eth3 tag=90')
-    s1.cmd('ovs-vsctl set port s1-eth4 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s1.cmd('ovs-vsctl set port s1-eth5 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s1.cmd('ovs-ofctl add-flow s1 priority=0,action=normal')
+    (cfg['s1'].trunk('s1-eth1', ALL_VLANS).trunk('s1-eth2', ALL_VLANS).access('s1-eth3', 90)
+              .trunk('s1-eth4', ALL_VLANS).trunk('s1-eth5', ALL_VLANS))
     
     # S2 (Core 2 - Backup)
-    s2.cmd('ovs-vsctl set port s2-eth1 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s2.cmd('ovs-vsctl set port s2-eth2 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s2.cmd('ovs-vsctl set port s2-eth3 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s2.cmd('ovs-vsctl set port s2-eth4 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s2.cmd('ovs-ofctl add-flow s2 priority=0,action=normal')
-    
-    # S3 (Distribution 1)
-    s3.cmd('ovs-vsctl set port s3-eth1 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s3.cmd('ovs-vsctl set port s3-eth2 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s3.cmd('ovs-vsctl set port s3-eth3 vlan_mode=trunk trunk=10,60')
-    s3.cmd('ovs-vsctl set port s3-eth4 vlan_mode=trunk trunk=20,30')
-    s3.cmd('ovs-vsctl set port s3-eth5 vlan_mode=trunk trunk=40,50')
-    s3.cmd('ovs-ofctl add-flow s3 priority=0,action=normal')
-    
-    # S4 (Distribution 2)
-    s4.cmd('ovs-vsctl set port s4-eth1 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s4.cmd('ovs-vsctl set port s4-eth2 vlan_mode=trunk trunk=10,20,30,40,50,60,90')
-    s4.cmd('ovs-vsctl set port s4-eth3 vlan_mode=trunk trunk=10,60')
-    s4.cmd('ovs-vsctl set port s4-eth4 vlan_mode=trunk trunk=20,30')
-    s4.cmd('ovs-vsctl set port s4-eth5 vlan_mode=trunk trunk=40,50')
-    s4.cmd('ovs-ofctl add-flow s4 priority=0,action=normal')
-    
-    # S5 (Access - Admin + Camera) - OPTIMIZED WITH LOOP
-    s5.cmd('ovs-vsctl set port s5-eth1 vlan_mode=trunk trunk=10,60')
-    s5.cmd('ovs-vsctl set port s5-eth2 vlan_mode=trunk trunk=10,60')
-    s5.cmd('ovs-vsctl set port s5-eth5 tag=60')  # camera1
-    s5.cmd('ovs-vsctl set port s5-eth6 tag=60')  # camera2
-    
-    # Configure 50 admin ports (eth7-eth116) - LOOP
-    info('  Configuring s5: 50 admin ports (eth7-eth116)\n')
-    for i in range(51):
-        port_num = i + 7
-        s5.cmd(f'ovs-vsctl set port s5-eth{port_num} tag=10')
-    
-    s5.cmd('ovs-ofctl add-flow s5 priority=0,action=normal')
+    for p in range(1, 5):
+        cfg['s2'].trunk(f's2-eth{p}', ALL_VLANS)
     
-    # S6 (Access - Lab + Wifi) - OPTIMIZED WITH LOOP
-    s6.cmd('ovs-vsctl set port s6-eth1 vlan_mode=trunk trunk=20,30')
-    s6.cmd('ovs-vsctl set port s6-eth2 vlan_mode=trunk trunk=20,30')
-    s6.cmd('ovs-vsctl set port s6-eth5 tag=30')  # ap1
+    # S3, S4 (Distribution)
+    for d in ('s3', 's4'):
+        (cfg[d].trunk(f'{d}-eth1', ALL_VLANS).trunk(f'{d}-eth2', ALL_VLANS)
+               .trunk(f'{d}-eth3', [10, 60]).trunk(f'{d}-eth4', [20, 30]).trunk(f'{d}-eth5', [40, 50]))
     
-    # Configure 50 lab ports (eth7-eth116) - LOOP
-    info('  Configuring s6: 50 lab ports (eth7-eth116)\n')
+    # S5 (Access - Admin + Camera)
+    cfg['s5'].trunk('s5-eth1', [10, 60]).trunk('s5-eth2', [10, 60])
+    cfg['s5'].access('s5-eth5', 60).access('s5-eth6', 60)  # camera1, camera2
     for i in range(51):
-        port_num = i + 7
-        s6.cmd(f'ovs-vsctl set port s6-eth{port_num} tag=20')
+        cfg['s5'].access(f's5-eth{i + 7}', 10)              # 50 admin ports (eth7-eth57)
     
-    s6.cmd('ovs-ofctl add-flow s6 priority=0,action=normal')
+    # S6 (Access - Lab + Wifi)
+    cfg['s6'].trunk('s6-eth1', [20, 30]).trunk('s6-eth2', [20, 30])
+    cfg['s6'].access('s6-eth5', 30)                         # ap1
+    for i in range(51):
+        cfg['s6'].access(f's6-eth{i + 7}', 20)              # 50 lab ports (eth7-eth57)
     
     # S7 (Access - KTX + Guest)
-    s7.cmd('ovs-vsctl set port s7-eth1 vlan_mode=trunk trunk=40,50')
-    s7.cmd('ovs-vsctl set port s7-eth2 vlan_mode=trunk trunk=40,50')
-    s7.cmd('ovs-vsctl set port s7-eth3 tag=40')  # ap2
-    s7.cmd('ovs-vsctl set port s7-eth4 tag=50')  # ap3
-    s7.cmd('ovs-ofctl add-flow s7 priority=0,action=normal')
+    cfg['s7'].trunk('s7-eth1', [40, 50]).trunk('s7-eth2', [40, 50])
+    cfg['s7'].access('s7-eth3', 40).access('s7-eth4', 50)  # ap2, ap3
+    
+    report = ovsbatch.apply_all(cfg.values())
+    info('  ' + ovsbatch.format_report(report, cfg.values()))
+    for sw, step, out in ovsbatch.failures(report):
+        info(f'  ⚠ {sw} {step}: {out}\n')
     
     info('*** Đợi STP converge (30 giây cho 100 hosts)...\n')
     time.sleep(30)  # INCREASED from 15s to 30s for 100 hosts
@@ -26,6 +26,7 @@ class TrafficTester:
         print("6. 🎯 DEMO: So Sánh Trước/Sau Load Balancing")
         print("7. Dừng Test Traffic")
         print("8. Hiển Thị Thống Kê Traffic")
+        print("9. Đo Thời Gian Failover / Failback VRRP")
         print("0. Thoát Menu")
         print("="*60)
         
@@ -501,6 +502,13 @@ class TrafficTester:
                 print(f"\n{iface}:")
                 print(result.strip())
 
+    def measure_vrrp_failover(self):
+        """Hạ / bật trunk của R1 và đo thời gian R2 nhận / trả VIP"""
+        import vrrp_monitor
+        print("\n[VRRP] Hạ r1-eth0 + r1-eth1, giữ 2 giây rồi bật lại...")
+        result = vrrp_monitor.measure_failover(self.net)
+        print(vrrp_monitor.format_measurement(result))
+
 def run_test_menu(net):
     """Chạy menu test tương tác"""
     tester = TrafficTester(net)
@@ -530,6 +538,8 @@ def run_test_menu(net):
                 tester.stop_traffic()
             elif choice == '8':
                 tester.show_traffic_stats()
+            elif choice == '9':
+                tester.measure_vrrp_failover()
             else:
                 print("\n[ERROR] Lựa chọn không hợp lệ!")
                 
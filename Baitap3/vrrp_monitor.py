@@ -2,10 +2,19 @@
 """
 VRRP Failover Monitor
 Quản lý Virtual IPs (.254) và external host routing
+- Theo dõi R1 theo SỰ KIỆN: `ip -o monitor link` chạy trong namespace của r1 (đăng ký nhóm netlink
+  RTNLGRP_LINK) → phản ứng ngay khi r1-eth0 / r1-eth1 đổi trạng thái, không poll 2 giây qua r1.cmd().
+- Failover: một `ip -batch` trên r2 gắn mọi VIP + một `ip -batch` trên internet / serverq7 đổi default route
+  (chạy song song), rồi gửi gratuitous ARP (arping -U) cho từng VIP để host cập nhật MAC gateway ngay.
+- Failback: gỡ VIP khỏi r2 cũng bằng một batch, trả route về R1 và để R1 gửi gratuitous ARP cho VIP.
+- Mỗi lần chuyển trạng thái ghi lại thời gian xử lý; measure_failover() chủ động hạ / bật link r1
+  và đo failover / failback tính từ lúc hạ / bật link tới khi VIP + route đã chuyển xong.
 """
 
+import re
 import time
-import sys
+import threading
+import subprocess
 
 VRRP_VIPS = [
     ('192.168.10.254/24', '10'),
@@ -14,122 +23,222 @@ VRRP_VIPS = [
     ('192.168.99.254/24', '99')
 ]
 
+WATCH_INTFS = ('r1-eth0', 'r1-eth1')   # R1 coi như fail khi CẢ HAI trunk đều DOWN
+
+# Default route của host bên ngoài khi R2 làm MASTER / khi trả về R1
+EXT_ROUTES = {
+    'failover': [('internet', 'default via 8.8.8.2 dev internet-eth1'),
+                 ('serverq7', 'default via 1.1.1.253 dev serverq7-eth1')],
+    'failback': [('internet', 'default via 8.8.8.1 dev internet-eth0'),
+                 ('serverq7', 'default via 1.1.1.254 dev serverq7-eth0')],
+}
+
+# "3: r1-eth0@if42: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 ... state UP ..." (có thể có "Deleted " ở đầu)
+_LINK = re.compile(r'^(Deleted\s+)?\d+:\s+([^:@\s]+)(?:@\S+)?:\s+<([^>]*)>(.*)$')
+
+ACTIVE = None   # VrrpMonitor đang chạy (monitor_vrrp đặt) để test_menu đo failover trên chính monitor đó
+
+def parse_link_line(line):
+    """(tên interface, up) từ một dòng `ip -o link` / `ip -o monitor link`; None nếu không phải dòng link."""
+    m = _LINK.match(line.strip())
+    if not m:
+        return None
+    flags = m.group(3).split(',')
+    up = not m.group(1) and 'UP' in flags and 'LOWER_UP' in flags and 'state DOWN' not in m.group(4)
+    return m.group(2), up
+
+def link_states(node, intfs=WATCH_INTFS):
+    """{interface: up} đọc một lần bằng `ip -o link show` trong namespace của node (không qua shell node)."""
+    p = node.popen(['ip', '-o', 'link', 'show'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    out, _ = p.communicate()
+    states = {i: False for i in intfs}
+    for line in out.splitlines():
+        parsed = parse_link_line(line)
+        if parsed and parsed[0] in states:
+            states[parsed[0]] = parsed[1]
+    return states
+
 def check_r1_alive(net):
-    """Kiểm tra R1 còn hoạt động không"""
+    """Kiểm tra R1 còn hoạt động không (ít nhất một trunk UP)"""
     try:
-        r1 = net.get('r1')
-        # Check cả 2 trunk interfaces
-        result0 = r1.cmd('ip link show r1-eth0')
-        result1 = r1.cmd('ip link show r1-eth1')
-        
-        # Nếu cả 2 interfaces đều DOWN thì R1 coi như fail
-        if 'UP' not in result0 and 'UP' not in result1:
-            return False
-        
-        # Nếu ít nhất 1 interface UP thì R1 còn sống
-        if 'state UP' in result0 or 'state UP' in result1:
-            return True
-        
-        return False
-    except:
+        return any(link_states(net.get('r1')).values())
+    except Exception:
         return False
 
+def _ip_batch(node, lines):
+    """Popen `ip -force -batch -` trong namespace của node (chưa chờ)."""
+    p = node.popen(['ip', '-force', '-batch', '-'], stdin=subprocess.PIPE,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    p.stdin.write(''.join(l + '\n' for l in lines))
+    p.stdin.close()
+    return p
+
+def _garp(node, dev_prefix):
+    """Gratuitous ARP cho mọi VIP từ node (song song, một shell); trả về Popen."""
+    cmds = ' '.join(f'arping -U -c 1 -I {dev_prefix}.{vid} {vip.split("/")[0]} >/dev/null 2>&1 &'
+                    for vip, vid in VRRP_VIPS)
+    return node.popen(['sh', '-c', f'{cmds} wait'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def _switch(net, direction):
+    """Chuyển VIP + route theo direction ('failover' | 'failback'); trả về {'batch_ms', 'garp_ms', 'ok'}."""
+    t0 = time.perf_counter()
+    op = 'add' if direction == 'failover' else 'del'
+    procs = [_ip_batch(net.get('r2'), [f'addr {op} {vip} dev r2-eth0.{vid}' for vip, vid in VRRP_VIPS])]
+    for host, route in EXT_ROUTES[direction]:
+        procs.append(_ip_batch(net.get(host), [f'route replace {route}']))
+    errs = [p.stderr.read() for p in procs]
+    ok = all(p.wait() == 0 for p in procs)
+    t1 = time.perf_counter()
+    # Failover: R2 quảng bá VIP; failback: R1 (vẫn giữ VIP) quảng bá lại để host bỏ MAC của R2
+    garp = _garp(net.get('r2'), 'r2-eth0') if direction == 'failover' else _garp(net.get('r1'), 'r1-eth0')
+    garp.wait()
+    t2 = time.perf_counter()
+    return {'batch_ms': round((t1 - t0) * 1000, 2), 'garp_ms': round((t2 - t1) * 1000, 2), 'ok': ok,
+            'errors': [e.strip() for e in errs if e.strip()]}
+
 def add_vips_to_r2(net):
     """Thêm Virtual IPs vào R2 và update external routes"""
     print("\n[VRRP] *** R1 DOWN DETECTED! Promoting R2 to MASTER... ***")
-    r2 = net.get('r2')
-    internet = net.get('internet')
-    serverq7 = net.get('serverq7')
-    
-    # Add Virtual IPs to R2
-    for vip, vlan_id in VRRP_VIPS:
-        try:
-            r2.cmd(f'ip addr add {vip} dev r2-eth0.{vlan_id}')
-            print(f"[VRRP] + Added {vip} to R2")
-        except:
-            pass
-    
-    # Update external hosts' routes to point to R2 via eth1
-    try:
-        internet.cmd('ip route del default')
-        internet.cmd('ip route add default via 8.8.8.2 dev internet-eth1')
-        print("[VRRP] + Updated Internet default route to R2 (8.8.8.2 via eth1)")
-    except:
-        pass
-    
-    try:
-        serverq7.cmd('ip route del default')
-        serverq7.cmd('ip route add default via 1.1.1.253 dev serverq7-eth1')
-        print("[VRRP] + Updated ServerQ7 default route to R2 (1.1.1.253 via eth1)")
-    except:
-        pass
-    
-    print("[VRRP] *** R2 is now ACTIVE (MASTER) ***")
-    print("[VRRP] All routes updated successfully!\n")
+    res = _switch(net, 'failover')
+    print(f"[VRRP] + {len(VRRP_VIPS)} VIP → R2, Internet/ServerQ7 route → R2: {res['batch_ms']:.1f} ms"
+          f" (gratuitous ARP {res['garp_ms']:.1f} ms)")
+    for e in res['errors']:
+        print(f"[VRRP] ! {e}")
+    print("[VRRP] *** R2 is now ACTIVE (MASTER) ***\n")
+    return res
 
 def remove_vips_from_r2(net):
     """Xóa Virtual IPs khỏi R2 và restore external routes về R1"""
     print("\n[VRRP] *** R1 RECOVERED! Demoting R2 to BACKUP... ***")
-    r2 = net.get('r2')
-    internet = net.get('internet')
-    serverq7 = net.get('serverq7')
-    
-    # Remove Virtual IPs from R2
-    for vip, vlan_id in VRRP_VIPS:
-        try:
-            r2.cmd(f'ip addr del {vip} dev r2-eth0.{vlan_id}')
-            print(f"[VRRP] - Removed {vip} from R2")
-        except:
-            pass
-    
-    # Restore external hosts' routes to point back to R1 via eth0
-    try:
-        internet.cmd('ip route del default')
-        internet.cmd('ip route add default via 8.8.8.1 dev internet-eth0')
-        print("[VRRP] + Restored Internet default route to R1 (8.8.8.1 via eth0)")
-    except:
-        pass
-    
+    res = _switch(net, 'failback')
+    print(f"[VRRP] - {len(VRRP_VIPS)} VIP khỏi R2, route trả về R1: {res['batch_ms']:.1f} ms"
+          f" (gratuitous ARP từ R1 {res['garp_ms']:.1f} ms)")
+    for e in res['errors']:
+        print(f"[VRRP] ! {e}")
+    print("[VRRP] *** R2 is now BACKUP ***\n")
+    return res
+
+class VrrpMonitor:
+    """Nghe sự kiện link của r1 và tự động failover / failback."""
+    def __init__(self, net, intfs=WATCH_INTFS):
+        self.net = net
+        self.intfs = intfs
+        self.states = {}
+        self.r2_active = False
+        self.events = []    # [dict] mỗi lần failover / failback
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()   # start() và luồng sự kiện cùng có thể gọi _evaluate
+        self._proc = None
+        self._thread = None
+
+    def start(self):
+        # Đăng ký nghe TRƯỚC rồi mới chụp trạng thái → không lỡ sự kiện xảy ra giữa hai bước
+        self._proc = self.net.get('r1').popen(['ip', '-o', 'monitor', 'link'], stdout=subprocess.PIPE,
+                                               stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self.states = link_states(self.net.get('r1'), self.intfs)
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        self._evaluate('initial', time.perf_counter())
+        return self
+
+    def stop(self):
+        if self._proc and self._proc.poll() is None:
+            self._proc.terminate()
+            self._proc.wait()
+
+    def join(self):
+        if self._thread:
+            self._thread.join()
+
+    def _loop(self):
+        for line in self._proc.stdout:
+            t_event = time.perf_counter()
+            parsed = parse_link_line(line)
+            if parsed and parsed[0] in self.states and self.states[parsed[0]] != parsed[1]:
+                self.states[parsed[0]] = parsed[1]
+                self._evaluate(parsed[0], t_event)
+
+    def _evaluate(self, trigger, t_event):
+        with self._lock:
+            alive = any(self.states.values())
+            if alive == (not self.r2_active):
+                return
+            event = 'failback' if alive else 'failover'
+            res = remove_vips_from_r2(self.net) if alive else add_vips_to_r2(self.net)
+            self.r2_active = not alive
+        with self._cond:
+            self.events.append(dict(res, event=event, trigger=trigger, t_event=t_event,
+                                    t_done=time.perf_counter(), t=time.time(),
+                                    react_ms=round((time.perf_counter() - t_event) * 1000, 2)))
+            self._cond.notify_all()
+
+    def wait_for(self, event, after, timeout=5.0):
+        """Chờ sự kiện `event` xảy ra sau mốc perf_counter `after`; trả về bản ghi hoặc None nếu hết giờ."""
+        deadline = time.perf_counter() + timeout
+        with self._cond:
+            while True:
+                for ev in self.events:
+                    if ev['event'] == event and ev['t_event'] >= after:
+                        return ev
+                left = deadline - time.perf_counter()
+                if left <= 0:
+                    return None
+                self._cond.wait(left)
+
+def measure_failover(net, monitor=None, hold=2.0, timeout=5.0):
+    """
+    Hạ cả hai trunk của r1 → đo tới khi R2 nhận VIP (failover); giữ `hold` giây; bật lại → đo failback.
+    Trả về {'failover_ms', 'failback_ms', 'failover', 'failback'} (ms = từ lúc ra lệnh tới khi chuyển xong).
+    """
+    mon = monitor or ACTIVE
+    own = mon is None
+    if own:
+        mon = VrrpMonitor(net).start()
+    r1 = net.get('r1')
     try:
-        serverq7.cmd('ip route del default')
-        serverq7.cmd('ip route add default via 1.1.1.254 dev serverq7-eth0')
-        print("[VRRP] + Restored ServerQ7 default route to R1 (1.1.1.254 via eth0)")
-    except:
-        pass
-    
-    print("[VRRP] *** R2 is now BACKUP ***")
-    print("[VRRP] All routes restored to R1!\n")
+        result = {}
+        for event, state in (('failover', 'down'), ('failback', 'up')):
+            t0 = time.perf_counter()
+            _ip_batch(r1, [f'link set dev {i} {state}' for i in WATCH_INTFS]).wait()
+            ev = mon.wait_for(event, t0, timeout)
+            result[event] = ev
+            result[f'{event}_ms'] = round((ev['t_done'] - t0) * 1000, 2) if ev else None
+            if event == 'failover':
+                time.sleep(hold)
+        return result
+    finally:
+        if own:
+            mon.stop()
+
+def format_measurement(result):
+    fmt = lambda v: 'HẾT GIỜ' if v is None else f'{v:.1f} ms'
+    lines = [f"[VRRP] Failover: {fmt(result['failover_ms'])} | Failback: {fmt(result['failback_ms'])}"]
+    for event in ('failover', 'failback'):
+        ev = result.get(event)
+        if ev:
+            lines.append(f"[VRRP]   {event}: phát hiện→xong {ev['react_ms']:.1f} ms "
+                         f"(batch {ev['batch_ms']:.1f} ms, gARP {ev['garp_ms']:.1f} ms, do {ev['trigger']})")
+    return "\n".join(lines)
 
 def monitor_vrrp(net):
     """Monitor VRRP và tự động failover Virtual IPs + External Routes"""
+    global ACTIVE
     print("\n[VRRP] VRRP Failover Monitor started")
-    print("[VRRP] Monitoring R1 health (checking r1-eth0 and r1-eth1)...")
+    print("[VRRP] Listening for link events on r1-eth0 and r1-eth1 (ip monitor link in r1)...")
     print("[VRRP] Will auto-update:")
     print("[VRRP]   • Virtual IPs (.254) on VLANs")
     print("[VRRP]   • Internet and ServerQ7 default routes")
     print("[VRRP] Press Ctrl+D in CLI to stop\n")
-    
-    r2_is_active = False
-    
-    while True:
-        try:
-            r1_alive = check_r1_alive(net)
-            
-            if not r1_alive and not r2_is_active:
-                # R1 down và R2 chưa active -> failover
-                add_vips_to_r2(net)
-                r2_is_active = True
-            
-            elif r1_alive and r2_is_active:
-                # R1 up lại và R2 đang active -> failback
-                remove_vips_from_r2(net)
-                r2_is_active = False
-            
-            time.sleep(2)  # Check every 2 seconds
-        
-        except KeyboardInterrupt:
-            print("\n[VRRP] Monitor stopped")
-            break
-        except:
-            # Network stopped, exit gracefully
-            break
+
+    try:
+        ACTIVE = VrrpMonitor(net).start()
+        ACTIVE.join()   # Trả về khi `ip monitor` kết thúc (mạng dừng)
+    except KeyboardInterrupt:
+        print("\n[VRRP] Monitor stopped")
+    except Exception:
+        # Network stopped, exit gracefully
+        pass
+    finally:
+        if ACTIVE:
+            ACTIVE.stop()
+        ACTIVE = None
@@ -21,6 +21,11 @@ from mininet.log import setLogLevel, info
 from mininet.link import TCLink
 import os
 import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import ipbatch
+import teardown
+
 import networkx as nx
 import matplotlib
 matplotlib.use('Agg')
@@ -60,8 +65,8 @@ class FRRNode(Host):
         pass
         
     def terminate(self):
-        # Cleanup FRR processes
-        self.cmd('killall -9 zebra staticd bgpd ospfd 2> /dev/null')
+        # Daemon FRR (nếu có) chạy trong namespace của node → teardown dọn theo namespace,
+        # không killall để tránh giết FRR của người khác trên cùng máy
         super(FRRNode, self).terminate()
 
 
@@ -201,18 +206,21 @@ def configure_underlay(net):
     Cấu hình Underlay Network với redundant routes
     """
     info('\n*** Cấu hình Underlay Network\n')
+    # Khai báo toàn bộ cấu hình vào ipbatch.NodeConfig, cuối hàm biên dịch thành 1 script `ip -batch`
+    # mỗi node và áp dụng đồng thời (thay cho hàng trăm lần node.cmd()).
+    cfg = {n: ipbatch.NodeConfig(n) for n in ['s1', 's2', 's3', 's4', 's5', 's6', 's7']}
     
     # ===========================================
     # 1. CẤU HÌNH LOOPBACK INTERFACES
     # ===========================================
     info('*** Cấu hình Loopback addresses\n')
-    net['s1'].cmd('ip addr add 1.1.1.1/32 dev lo')
-    net['s2'].cmd('ip addr add 1.1.1.2/32 dev lo')
-    net['s3'].cmd('ip addr add 1.1.1.3/32 dev lo')
-    net['s4'].cmd('ip addr add 1.1.1.4/32 dev lo')
-    net['s5'].cmd('ip addr add 1.1.1.5/32 dev lo')
-    net['s6'].cmd('ip addr add 1.1.1.6/32 dev lo')
-    net['s7'].cmd('ip addr add 1.1.1.7/32 dev lo')
+    cfg['s1'].addr('lo', '1.1.1.1/32')
+    cfg['s2'].addr('lo', '1.1.1.2/32')
+    cfg['s3'].addr('lo', '1.1.1.3/32')
+    cfg['s4'].addr('lo', '1.1.1.4/32')
+    cfg['s5'].addr('lo', '1.1.1.5/32')
+    cfg['s6'].addr('lo', '1.1.1.6/32')
+    cfg['s7'].addr('lo', '1.1.1.7/32')
     
     # ===========================================
     # 2. CẤU HÌNH GATEWAY IPS
@@ -223,35 +231,35 @@ def configure_underlay(net):
     s3_links = net['s3'].connectionsTo(net['br-s3'])
     if s3_links:
         intf = s3_links[0][0]
-        net['s3'].cmd(f'ip addr add 192.168.10.1/24 dev {intf}')
+        cfg['s3'].addr(intf, '192.168.10.1/24')
         info(f'    s3 {intf}: 192.168.10.1/24\n')
     
     # s4 - Lab VLAN 20
     s4_links = net['s4'].connectionsTo(net['br-s4'])
     if s4_links:
         intf = s4_links[0][0]
-        net['s4'].cmd(f'ip addr add 192.168.20.1/24 dev {intf}')
+        cfg['s4'].addr(intf, '192.168.20.1/24')
         info(f'    s4 {intf}: 192.168.20.1/24\n')
     
     # s5 - KTX VLAN 30
     s5_links = net['s5'].connectionsTo(net['br-s5'])
     if s5_links:
         intf = s5_links[0][0]
-        net['s5'].cmd(f'ip addr add 192.168.30.1/24 dev {intf}')
+        cfg['s5'].addr(intf, '192.168.30.1/24')
         info(f'    s5 {intf}: 192.168.30.1/24\n')
     
     # s6 - Internet
     s6_links = net['s6'].connectionsTo(net['br-s6'])
     if s6_links:
         intf = s6_links[0][0]
-        net['s6'].cmd(f'ip addr add 203.0.113.1/30 dev {intf}')
+        cfg['s6'].addr(intf, '203.0.113.1/30')
         info(f'    s6 {intf}: 203.0.113.1/30\n')
     
     # s7 - ServerQ7
     s7_links = net['s7'].connectionsTo(net['br-s7'])
     if s7_links:
         intf = s7_links[0][0]
-        net['s7'].cmd(f'ip addr add 172.16.1.1/30 dev {intf}')
+        cfg['s7'].addr(intf, '172.16.1.1/30')
         info(f'    s7 {intf}: 172.16.1.1/30\n')
     
     # ===========================================
@@ -276,8 +284,8 @@ def configure_underlay(net):
         links = net[n1].connectionsTo(net[n2])
         if links:
             intf1, intf2 = links[0]
-            net[n1].cmd(f'ip addr add {ip1} dev {intf1}')
-            net[n2].cmd(f'ip addr add {ip2} dev {intf2}')
+            cfg[n1].addr(intf1, ip1)
+            cfg[n2].addr(intf2, ip2)
             info(f'    {n1} {intf1}: {ip1} <-> {n2} {intf2}: {ip2}\n')
     
     # ===========================================
@@ -287,55 +295,60 @@ def configure_underlay(net):
     info('*** Cấu hình static routes với redundancy\n')
     
     # s3 (Admin) - Primary via s1 (metric 100), Backup via s2 (metric 200)
-    net['s3'].cmd('ip route add 192.168.20.0/24 via 10.0.13.0 metric 100')
-    net['s3'].cmd('ip route add 192.168.20.0/24 via 10.0.23.0 metric 200')
-    net['s3'].cmd('ip route add 192.168.30.0/24 via 10.0.13.0 metric 100')
-    net['s3'].cmd('ip route add 192.168.30.0/24 via 10.0.23.0 metric 200')
-    net['s3'].cmd('ip route add 203.0.113.0/30 via 10.0.13.0 metric 100')
-    net['s3'].cmd('ip route add 172.16.1.0/30 via 10.0.13.0 metric 100')
+    cfg['s3'].route('192.168.20.0/24', via='10.0.13.0', metric=100)
+    cfg['s3'].route('192.168.20.0/24', via='10.0.23.0', metric=200)
+    cfg['s3'].route('192.168.30.0/24', via='10.0.13.0', metric=100)
+    cfg['s3'].route('192.168.30.0/24', via='10.0.23.0', metric=200)
+    cfg['s3'].route('203.0.113.0/30', via='10.0.13.0', metric=100)
+    cfg['s3'].route('172.16.1.0/30', via='10.0.13.0', metric=100)
     
     # s4 (Lab) - Primary via s1, Backup via s2
-    net['s4'].cmd('ip route add 192.168.10.0/24 via 10.0.14.0 metric 100')
-    net['s4'].cmd('ip route add 192.168.10.0/24 via 10.0.24.0 metric 200')
-    net['s4'].cmd('ip route add 192.168.30.0/24 via 10.0.14.0 metric 100')
-    net['s4'].cmd('ip route add 192.168.30.0/24 via 10.0.24.0 metric 200')
-    net['s4'].cmd('ip route add 203.0.113.0/30 via 10.0.14.0 metric 100')
-    net['s4'].cmd('ip route add 172.16.1.0/30 via 10.0.14.0 metric 100')
+    cfg['s4'].route('192.168.10.0/24', via='10.0.14.0', metric=100)
+    cfg['s4'].route('192.168.10.0/24', via='10.0.24.0', metric=200)
+    cfg['s4'].route('192.168.30.0/24', via='10.0.14.0', metric=100)
+    cfg['s4'].route('192.168.30.0/24', via='10.0.24.0', metric=200)
+    cfg['s4'].route('203.0.113.0/30', via='10.0.14.0', metric=100)
+    cfg['s4'].route('172.16.1.0/30', via='10.0.14.0', metric=100)
     
     # s5 (KTX) - Primary via s1, Backup via s2
-    net['s5'].cmd('ip route add 192.168.10.0/24 via 10.0.15.0 metric 100')
-    net['s5'].cmd('ip route add 192.168.10.0/24 via 10.0.25.0 metric 200')
-    net['s5'].cmd('ip route add 192.168.20.0/24 via 10.0.15.0 metric 100')
-    net['s5'].cmd('ip route add 192.168.20.0/24 via 10.0.25.0 metric 200')
-    net['s5'].cmd('ip route add 203.0.113.0/30 via 10.0.15.0 metric 100')
-    net['s5'].cmd('ip route add 172.16.1.0/30 via 10.0.15.0 metric 100')
+    cfg['s5'].route('192.168.10.0/24', via='10.0.15.0', metric=100)
+    cfg['s5'].route('192.168.10.0/24', via='10.0.25.0', metric=200)
+    cfg['s5'].route('192.168.20.0/24', via='10.0.15.0', metric=100)
+    cfg['s5'].route('192.168.20.0/24', via='10.0.25.0', metric=200)
+    cfg['s5'].route('203.0.113.0/30', via='10.0.15.0', metric=100)
+    cfg['s5'].route('172.16.1.0/30', via='10.0.15.0', metric=100)
     
     # s6 (Internet Border)
-    net['s6'].cmd('ip route add 192.168.10.0/24 via 10.0.16.0 metric 100')
-    net['s6'].cmd('ip route add 192.168.20.0/24 via 10.0.16.0 metric 100')
-    net['s6'].cmd('ip route add 192.168.30.0/24 via 10.0.16.0 metric 100')
-    net['s6'].cmd('ip route add 172.16.1.0/30 via 10.0.16.0 metric 100')
+    cfg['s6'].route('192.168.10.0/24', via='10.0.16.0', metric=100)
+    cfg['s6'].route('192.168.20.0/24', via='10.0.16.0', metric=100)
+    cfg['s6'].route('192.168.30.0/24', via='10.0.16.0', metric=100)
+    cfg['s6'].route('172.16.1.0/30', via='10.0.16.0', metric=100)
     
     # s7 (HCM Border)
-    net['s7'].cmd('ip route add 192.168.10.0/24 via 10.0.17.0 metric 100')
-    net['s7'].cmd('ip route add 192.168.20.0/24 via 10.0.17.0 metric 100')
-    net['s7'].cmd('ip route add 192.168.30.0/24 via 10.0.17.0 metric 100')
-    net['s7'].cmd('ip route add 203.0.113.0/30 via 10.0.17.0 metric 100')
+    cfg['s7'].route('192.168.10.0/24', via='10.0.17.0', metric=100)
+    cfg['s7'].route('192.168.20.0/24', via='10.0.17.0', metric=100)
+    cfg['s7'].route('192.168.30.0/24', via='10.0.17.0', metric=100)
+    cfg['s7'].route('203.0.113.0/30', via='10.0.17.0', metric=100)
     
     # Spine s1 routes
-    net['s1'].cmd('ip route add 192.168.10.0/24 via 10.0.13.1')
-    net['s1'].cmd('ip route add 192.168.20.0/24 via 10.0.14.1')
-    net['s1'].cmd('ip route add 192.168.30.0/24 via 10.0.15.1')
-    net['s1'].cmd('ip route add 203.0.113.0/30 via 10.0.16.1')
-    net['s1'].cmd('ip route add 172.16.1.0/30 via 10.0.17.1')
+    cfg['s1'].route('192.168.10.0/24', via='10.0.13.1')
+    cfg['s1'].route('192.168.20.0/24', via='10.0.14.1')
+    cfg['s1'].route('192.168.30.0/24', via='10.0.15.1')
+    cfg['s1'].route('203.0.113.0/30', via='10.0.16.1')
+    cfg['s1'].route('172.16.1.0/30', via='10.0.17.1')
     
     # Spine s2 routes (backup)
-    net['s2'].cmd('ip route add 192.168.10.0/24 via 10.0.23.1')
-    net['s2'].cmd('ip route add 192.168.20.0/24 via 10.0.24.1')
-    net['s2'].cmd('ip route add 192.168.30.0/24 via 10.0.25.1')
-    net['s2'].cmd('ip route add 203.0.113.0/30 via 10.0.26.1')
-    net['s2'].cmd('ip route add 172.16.1.0/30 via 10.0.27.1')
-    
+    cfg['s2'].route('192.168.10.0/24', via='10.0.23.1')
+    cfg['s2'].route('192.168.20.0/24', via='10.0.24.1')
+    cfg['s2'].route('192.168.30.0/24', via='10.0.25.1')
+    cfg['s2'].route('203.0.113.0/30', via='10.0.26.1')
+    cfg['s2'].route('172.16.1.0/30', via='10.0.27.1')
+    
+    results = ipbatch.apply_all(net, cfg.values())
+    for name, (rc, out) in results.items():
+        if rc != 0:
+            info(f'    ! {name}: {out.strip()}\n')
+    info(f'    -> {sum(len(c) for c in cfg.values())} lệnh áp dụng bằng ip -batch trên {len(results)} node\n')
     info('*** Underlay Network với redundant routes đã được cấu hình!\n')
 
 
@@ -497,12 +510,19 @@ def populate_arp_cache(net):
     info('*** ARP cache và MAC learning đã được populated comprehensively!\n')
 
 
-def cleanup():
+def cleanup(full=False):
     """
     Cleanup Mininet environment
+    - Mặc định: chỉ dọn tài nguyên lần chạy trước của topology này (registry teardown)
+    - full=True (tham số 'clean'): mn -c toàn cục như cũ
     """
     info('\n*** Đang cleanup Mininet...\n')
-    os.system('sudo mn -c')
+    if full:
+        teardown.full_cleanup()
+    else:
+        rep = teardown.cleanup_stale('baitap3_ver2')
+        if rep:
+            info('*** ' + teardown.format_report(rep))
     info('*** Cleanup hoàn tất!\n')
 
 
@@ -638,6 +658,8 @@ def run():
     
     info('\n*** Starting network...\n')
     net.start()
+    reg = teardown.Registry('baitap3_ver2').track_net(net)
+    reg.add_files(*[n.frr_dir for n in net.hosts if isinstance(n, FRRNode)]).save()
     
     # Cấu hình
     configure_underlay(net)
@@ -667,8 +689,7 @@ def run():
     CLI(net)
     
     info('\n*** Stopping network...\n')
-    net.stop()
-    cleanup()
+    info('*** ' + teardown.format_report(teardown.stop(net)))
 
 
 if __name__ == '__main__':
@@ -681,7 +702,7 @@ if __name__ == '__main__':
         if sys.argv[1] == 'visualize':
             visualize_topology()
         elif sys.argv[1] == 'clean':
-            cleanup()
+            cleanup(full=True)
         else:
             print("Tham số không hợp lệ!")
             print("Sử dụng:")
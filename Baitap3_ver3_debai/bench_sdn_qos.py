@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK QoS MÔ HÌNH 4: KHÔNG QoS vs POLICE tc TẠI r1 vs METER OPENFLOW 1.3 (+ LUỒNG CHỦ ĐỘNG)
+- Mỗi kịch bản: dựng cauhinh4 (proactive hoặc không), bật DynamicQoSMonitor với backend tương ứng,
+  mỗi backend đo ở cả hai chế độ luồng để so sánh packet-in / độ trễ không lẫn hai biến,
+  cho FLOOD_HOSTS dorm (chia đều hai leaf s6/s7) xả UDP → serverhcm, đồng thời admin1 ping serverhcm.
+- Ghi lại: tốc độ packet-in (gói khớp luồng CONTROLLER / giây), ping admin (loss / avg / mdev),
+  tải WAN (EWMA trung bình và cao nhất khi flood), thời gian phản ứng của vòng QoS (wan_sampler)
+  và thời gian tác động trung bình của backend (tc -batch hoặc mod-meter).
+- Kết quả in bảng + ghi CSV (và JSON nếu cần).
+Cần Ryu chạy trước (như test mô hình 4):  ryu-manager ryu.app.simple_switch_13 --ofp-tcp-listen-port 6653
+Chạy: sudo python3 bench_sdn_qos.py [--scenarios none,tc,meter,none+proactive,...] [--duration 20] [--csv out.csv] [--json out.json]
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import subprocess
+
+from mininet.log import setLogLevel
+
+import cauhinh4
+import sdn_qos
+import wan_sampler
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import teardown
+import netparse
+
+# Kịch bản: (luồng NORMAL chủ động, backend QoS hoặc None)
+SCENARIOS = {'none': (False, None), 'tc': (False, 'tc'), 'meter': (False, 'meter'),
+             'none+proactive': (True, None), 'tc+proactive': (True, 'tc'), 'meter+proactive': (True, 'meter')}
+FLOOD_HOSTS = 20           # 10 dorm mỗi leaf
+FLOOD_MBPS = 8             # 20 × 8 = 160 Mbps + nền → vượt 90% WAN 200 Mbps
+WAN_IP = '203.162.1.1'
+PORT = 9001
+KILL_IPERF = 'pkill --ns $$ --nslist net -x iperf 2>/dev/null'
+
+def flood_hosts(net):
+    half = FLOOD_HOSTS // 2
+    return [net.get(f'dorm{i}') for i in list(range(1, half + 1)) + list(range(21, 21 + FLOOD_HOSTS - half))]
+
+def run_scenario(name, duration):
+    proactive, backend = SCENARIOS[name]
+    net = cauhinh4.build_net(proactive=proactive)
+    row = {'scenario': name, 'proactive': proactive, 'backend': backend or '-'}
+    qos = sampler = None
+    try:
+        admin1, serverhcm = net.get('admin1'), net.get('serverhcm')
+        admin1.cmd(f'ping -c 3 -W 2 {WAN_IP} >/dev/null 2>&1')
+        if backend:
+            qos = cauhinh4.DynamicQoSMonitor(net, backend=backend)
+            qos.start()
+            sampler = qos.sampler
+            row['backend'] = qos.backend          # meter không được hỗ trợ → đã chuyển sang tc
+        else:
+            sampler = wan_sampler.WanSampler(net.get('r1'), capacity_mbps=cauhinh4.WAN_BW).start()
+
+        serverhcm.cmd(f'{KILL_IPERF}; iperf -s -u -D -p {PORT} >/dev/null 2>&1')
+        pin0, t0 = sdn_qos.packet_in_count(net.switches), time.monotonic()
+        for h in flood_hosts(net):
+            h.cmd(f'iperf -c {WAN_IP} -u -b {FLOOD_MBPS}M -t {duration} -p {PORT} >/dev/null 2>&1 &')
+        # Ping admin suốt thời gian flood (bỏ 2s đầu để flood kịp bão hoà)
+        time.sleep(2)
+        count = max(5, int((duration - 4) / 0.2))
+        raw_ping = admin1.cmd(f'ping -c {count} -i 0.2 -W 1 {WAN_IP} 2>/dev/null')
+        pin1, t1 = sdn_qos.packet_in_count(net.switches), time.monotonic()
+        ewmas = [e for t, _, e in sampler.samples if t0 <= t <= t1]
+
+        ping = netparse.parse_ping(raw_ping)
+        st = sampler.stats()
+        acts = [ev[3] for ev in (qos.policer.events if qos else []) if ev[1] != 'setup' and ev[4]]
+        row.update({
+            'packet_in_per_s': round((pin1 - pin0) / (t1 - t0), 1),
+            'admin_loss_pct': ping.loss_pct, 'admin_avg_ms': ping.rtt_avg, 'admin_mdev_ms': ping.rtt_mdev,
+            'wan_mean_mbps': round(sum(ewmas) / len(ewmas), 1) if ewmas else None,
+            'wan_peak_mbps': round(max(ewmas), 1) if ewmas else None,
+            'reaction_ms': st['react_congested_ms'], 'flaps': st['flaps'],
+            'actuation_ms': round(sum(acts) / len(acts), 2) if acts else None,
+            'actions': len(acts),
+        })
+        for h in flood_hosts(net):
+            h.cmd(KILL_IPERF)
+        serverhcm.cmd(KILL_IPERF)
+    finally:
+        if qos:
+            qos.stop()
+        elif sampler:
+            sampler.stop()
+        rep = teardown.stop(net)
+    row['teardown_s'] = rep['elapsed']
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh QoS mô hình 4: không QoS / tc tại r1 / meter OF1.3")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="Danh sách kịch bản, cách nhau dấu phẩy")
+    parser.add_argument('--duration', type=float, default=20, help="Thời gian flood mỗi kịch bản (s)")
+    parser.add_argument('--csv', default=os.path.join(os.getcwd(), "logs", "bench_sdn_qos.csv"))
+    parser.add_argument('--json', default=None)
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        print('Hãy chạy bằng quyền ROOT (sudo python3 bench_sdn_qos.py)')
+        return 1
+    if subprocess.run(['pgrep', '-f', 'ryu-manager'], capture_output=True).returncode != 0:
+        print('⚠ Ryu chưa chạy: switch ở chế độ standalone, packet-in luôn = 0 (số liệu QoS vẫn đo được)')
+    setLogLevel('warning')
+
+    rows = []
+    for name in args.scenarios.split(','):
+        print(f"*** Đang đo kịch bản {name} ...", flush=True)
+        rows.append(run_scenario(name, args.duration))
+        time.sleep(2)
+
+    cols = ['scenario', 'proactive', 'backend', 'packet_in_per_s', 'admin_loss_pct', 'admin_avg_ms', 'admin_mdev_ms',
+            'wan_mean_mbps', 'wan_peak_mbps', 'reaction_ms', 'actuation_ms', 'flaps']
+    print("".join(f"{c:>16}" for c in cols))
+    for row in rows:
+        print("".join(f"{str(row[c]):>16}" for c in cols))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.csv)), exist_ok=True)
+    with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else cols)
+        w.writeheader()
+        w.writerows(rows)
+    print(f"-> Đã lưu {args.csv}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
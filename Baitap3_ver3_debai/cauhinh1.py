@@ -6,16 +6,16 @@ s1 (Block A): admin1-5, lab1-20, r1-LAN, trunk  (27/48 port)
 s2 (Block B): dorm1-40, srv1-4, trunk            (45/48 port)
 """
 
-import os, sys, subprocess, time
-import matplotlib; matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import networkx as nx
-from mininet.net import Mininet
+import os, sys, time
 from mininet.node import Host, OVSSwitch
 from mininet.link import TCLink
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import teardown
+import isolation
+
 GRAPH_OUTPUT = 'level1_flat_topology.png'
 
 class LinuxRouter(Host):
@@ -27,10 +27,17 @@ class LinuxRouter(Host):
         super().terminate()
 
 def cleanup_mininet():
-    info('*** mn -c cleanup...\n')
-    subprocess.run(['sudo','mn','-c'], capture_output=True, timeout=30)
+    # Chỉ dọn tài nguyên lần chạy trước của chính mô hình này (registry teardown), mn -c chỉ là dự phòng
+    # và bị tắt khi chạy song song (có prefix): mn -c toàn cục sẽ xoá luôn các mô hình đang chạy cạnh bên
+    rep = teardown.cleanup_stale(isolation.tag('cauhinh1'), fallback=not isolation.prefix())
+    if rep:
+        info('*** Dọn mô hình 1 còn sót: ' + teardown.format_report(rep))
 
 def draw_topology_graph():
+    # Chỉ nạp matplotlib/networkx khi thật sự vẽ -> import cauhinh1 / build_net() khởi động nhanh
+    import matplotlib; matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import networkx as nx
     G = nx.Graph()
     nodes = {
         'r1':        ('router',  'r1\n10.0.0.254\n(GW+WAN)'),
@@ -73,7 +80,7 @@ def draw_topology_graph():
 def build_net():
     """Build + configure mạng phẳng, trả về net object (KHÔNG gọi CLI)."""
     cleanup_mininet()
-    net = Mininet(controller=None, link=TCLink, autoSetMacs=True)
+    net = isolation.make_net(controller=None, link=TCLink, autoSetMacs=True)
     r1 = net.addHost('r1', cls=LinuxRouter, ip='10.0.0.254/16')
     s1 = net.addSwitch('s1', cls=OVSSwitch, failMode='standalone')
     s2 = net.addSwitch('s2', cls=OVSSwitch, failMode='standalone')
@@ -95,6 +102,7 @@ def build_net():
     for i in range(1, 5):  net.addLink(net.get(f'srv{i}'),   s2, bw=1000)
     info('*** Starting network...\n')
     net.start()
+    teardown.Registry(isolation.tag('cauhinh1')).track_net(net).save()
     r1.cmd('ip link set r1-eth0 up; ip addr flush dev r1-eth0; ip addr add 10.0.0.254/16 dev r1-eth0')
     r1.cmd('ip link set r1-eth1 up; ip addr flush dev r1-eth1; ip addr add 203.162.1.254/24 dev r1-eth1')
     r1.cmd('sysctl -w net.ipv4.ip_forward=1')
@@ -116,8 +124,7 @@ def run():
     info(' GW: 10.0.0.254 | WAN: 200Mbps/10ms\n')
     info(' Test: pingall | admin1 ping 203.162.1.1\n')
     CLI(net)
-    net.stop()
-    cleanup_mininet()
+    info(teardown.format_report(teardown.stop(net, fallback=not isolation.prefix())))
 
 if __name__ == '__main__':
     setLogLevel('info')
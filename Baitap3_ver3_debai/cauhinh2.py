@@ -20,18 +20,19 @@ Dist switches dùng OVS Internal Port làm SVI (Switch Virtual Interface)
 STP: Lab access dual-home → d_a1(s2) + d_a2(s3) → STP block 1 uplink
 """
 
-import os, sys, subprocess, time
-import matplotlib; matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import networkx as nx
-from mininet.net import Mininet
+import os, sys
 from mininet.node import Host, OVSSwitch
 from mininet.link import TCLink
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info
 
+import stp_watch
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import teardown
+import isolation
+
 GRAPH_OUTPUT = 'level2_hierarchical_topology.png'
+STP_TIMEOUT = 60   # Giây – chờ STP tối đa (trả về ngay khi mọi port đã ổn định)
 
 class LinuxRouter(Host):
     def config(self, **params):
@@ -42,11 +43,19 @@ class LinuxRouter(Host):
         super().terminate()
 
 def cleanup_mininet():
-    info('*** mn -c...\n')
-    subprocess.run(['sudo','mn','-c'], capture_output=True, timeout=30)
+    # Chỉ dọn tài nguyên lần chạy trước của chính mô hình này (registry teardown), mn -c chỉ là dự phòng
+    # và bị tắt khi chạy song song (có prefix): mn -c toàn cục sẽ xoá luôn các mô hình đang chạy cạnh bên
+    rep = teardown.cleanup_stale(isolation.tag('cauhinh2'), fallback=not isolation.prefix())
+    if rep:
+        info('*** Dọn mô hình 2 còn sót: ' + teardown.format_report(rep))
 
 # ── Draw ──────────────────────────────────────────────────────────────────
 def draw_topology_graph():
+    # Chỉ nạp matplotlib/networkx khi thật sự vẽ -> import cauhinh2 / build_net() khởi động nhanh
+    import matplotlib; matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+    import networkx as nx
     G = nx.Graph()
     nodes = {
         'wan':('wan','serverhcm\n203.162.1.1'),
@@ -124,7 +133,7 @@ def draw_topology_graph():
 def build_net():
     """Build + configure mạng 3 lớp, trả về net object (KHÔNG gọi CLI)."""
     cleanup_mininet()
-    net = Mininet(controller=None, link=TCLink, autoSetMacs=True)
+    net = isolation.make_net(controller=None, link=TCLink, autoSetMacs=True)
     r1        = net.addHost('r1', cls=LinuxRouter, ip='127.0.0.1/8')
     serverhcm = net.addHost('serverhcm', ip='203.162.1.1/24')
     s1  = net.addSwitch('s1',  cls=OVSSwitch, failMode='standalone', stp=True)
@@ -176,10 +185,12 @@ def build_net():
     for i in range(1,5):   net.addLink(net.get(f'srv{i}'), s19, bw=1000)
     info('*** Starting network...\n')
     net.start()
-    s1.cmd('ovs-vsctl set Bridge s1 other_config:stp-priority=4096')
-    s20.cmd('ovs-vsctl set Bridge s20 other_config:stp-priority=8192')
-    info('*** Waiting STP convergence 15s...\n')
-    time.sleep(15)
+    teardown.Registry(isolation.tag('cauhinh2')).track_net(net).save()
+    s1.cmd(f'ovs-vsctl set Bridge {s1.name} other_config:stp-priority=4096')
+    s20.cmd(f'ovs-vsctl set Bridge {s20.name} other_config:stp-priority=8192')
+    info('*** Waiting STP convergence (stp/show trên mọi switch, tối đa %ds)...\n' % STP_TIMEOUT)
+    net.stp_report = stp_watch.wait_stp(net.switches, timeout=STP_TIMEOUT)
+    info(stp_watch.format_report(net.stp_report))
     r1.cmd('sysctl -w net.ipv4.ip_forward=1')
     r1.cmd('for f in /proc/sys/net/ipv4/conf/*/rp_filter; do echo 0 > $f; done')
     for eth, ip in [('r1-eth0','10.0.10.254/24'),('r1-eth2','10.0.20.254/24'),
@@ -203,8 +214,7 @@ def run():
     info('='*70 + '\n')
     info(' Test: pingall | admin1 ping srv1 | admin1 ping 203.162.1.1\n')
     CLI(net)
-    net.stop()
-    cleanup_mininet()
+    info(teardown.format_report(teardown.stop(net, fallback=not isolation.prefix())))
 
 if __name__ == '__main__':
     setLogLevel('info')
@@ -9,7 +9,9 @@ Topology: Giống Model 3 (Spine-Leaf + Border Leaf)
 
 KHÁC BIỆT so với Model 1-3:
   - SDN Controller (Ryu): RemoteController trên 127.0.0.1:6653
-  - Controller giám sát + đẩy QoS rules (Dynamic Rate-Limiting)
+  - Controller giám sát + đẩy QoS rules (Dynamic Rate-Limiting): meter OF1.3 trên leaf Dorm s6/s7 (sdn_qos.py)
+  - Chạy trực tiếp: luồng NORMAL chủ động trên mọi switch → gói dữ liệu không đi qua controller, Ryu chỉ nhận gói lạ
+    (build_net() mặc định KHÔNG cài, để test7 của testver2 – secure + tắt Ryu – vẫn chặn được luồng mới)
   - STP vẫn hoạt động để chống loop (Hybrid SDN)
   - Dynamic QoS: Giám sát WAN, rate-limit Dorm khi >90% tải
 
@@ -17,26 +19,37 @@ Cần chạy Ryu Controller TRƯỚC khi chạy file này:
   ryu-manager ryu.app.simple_switch_13 --ofp-tcp-listen-port 6653
 """
 
-import os, sys, subprocess, time, threading
-import matplotlib; matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import networkx as nx
-from mininet.net import Mininet
+import os, sys
 from mininet.node import Host, OVSSwitch, RemoteController
 from mininet.link import TCLink
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info
 
+import stp_watch
+import qos_actuator
+import wan_sampler
+import sdn_qos
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import teardown
+import isolation
+
 GRAPH_OUTPUT = 'level4_sdn_topology.png'
+STP_TIMEOUT = 60   # Giây – chờ STP tối đa (trả về ngay khi mọi port đã ổn định)
 CONTROLLER_IP = '127.0.0.1'
 CONTROLLER_PORT = 6653
 
 # ── Thông số QoS ──
 WAN_BW = 200          # Mbps
 QOS_THRESHOLD = 0.9   # 90% → trigger rate-limit
-QOS_DORM_LIMIT = 1    # Mbps khi bị phạt
-QOS_POLL_INTERVAL = 2 # Giây
+QOS_DORM_LIMIT = 1    # Mbps khi bị phạt (mỗi host)
+QOS_DORM_AGGREGATE = QOS_DORM_LIMIT * qos_actuator.DORM_HOSTS   # Mbps cho cả subnet Dorm
+QOS_BACKEND = 'meter'     # 'meter' = meter OF1.3 trên leaf Dorm (sdn_qos) | 'tc' = police ingress tại r1 (qos_actuator)
+PROACTIVE = False         # build_net() mặc định: không cài luồng NORMAL chủ động (giữ hành vi SDN reactive cho test)
+QOS_POLL_INTERVAL = 0.2   # Giây giữa hai mẫu tải WAN
+QOS_EWMA_ALPHA = 0.3      # Trọng số mẫu mới khi làm mượt
+QOS_RELIEF = 0.7          # < 70% → gỡ rate-limit
+QOS_HOLD_UP = 1.0         # Giây EWMA phải ≥ 90% trước khi bóp
+QOS_HOLD_DOWN = 3.0       # Giây EWMA phải < 70% trước khi gỡ
 
 class LinuxRouter(Host):
     def config(self, **params):
@@ -47,103 +60,105 @@ class LinuxRouter(Host):
         super().terminate()
 
 def cleanup_mininet():
-    info('*** Cleanup OVS bridges (preserving Ryu controller)...\n')
-    # Xoá tất cả OVS bridges mà không kill controller
-    try:
-        result = subprocess.run(['sudo','ovs-vsctl','list-br'],
-                                capture_output=True, text=True, timeout=10)
-        bridges = result.stdout.strip().split()
-        for br in bridges:
-            subprocess.run(['sudo','ovs-vsctl','del-br', br],
-                           capture_output=True, timeout=10)
-    except Exception:
-        pass
-    # Xoá namespace nếu còn sót
-    subprocess.run(['sudo','ip','-all','netns','delete'],
-                   capture_output=True, timeout=10)
+    # Chỉ dọn tài nguyên lần chạy trước của chính mô hình này (registry teardown), mn -c chỉ là dự phòng
+    # và bị tắt khi chạy song song (có prefix): mn -c toàn cục sẽ xoá luôn các mô hình đang chạy cạnh bên
+    rep = teardown.cleanup_stale(isolation.tag('cauhinh4'), fallback=not isolation.prefix())
+    if rep:
+        info('*** Dọn mô hình 4 còn sót: ' + teardown.format_report(rep))
 
 # ── Dynamic QoS Monitor ──────────────────────────────────────────────────
 class DynamicQoSMonitor:
     """
-    Giám sát WAN port trên Border Leaf (s8).
-    Nếu WAN > 90% tải → rate-limit Dorm (10.0.30.x) xuống 1Mbps.
-    Khi WAN giảm < 70% → gỡ rate-limit.
+    Giám sát WAN port (r1-eth4) sau Border Leaf (s8) bằng wan_sampler (EWMA + hold timer).
+    Nếu WAN ≥ 90% tải liên tục QOS_HOLD_UP giây → rate-limit Dorm (10.0.30.x) tại r1.
+    Khi WAN < 70% liên tục QOS_HOLD_DOWN giây → gỡ rate-limit.
     """
-    def __init__(self, net, border_leaf_name='s8', wan_intf=None):
+    def __init__(self, net, border_leaf_name='s8', wan_intf=None, backend=QOS_BACKEND):
         self.net = net
         self.border_leaf = net.get(border_leaf_name)
         self.r1 = net.get('r1')
         self.running = False
         self.dorm_limited = False
-        self.prev_bytes = 0
-        self.prev_time = 0
-        self.wan_intf = 'r1-eth4'
+        self.wan_intf = wan_intf or 'r1-eth4'
+        self.backend = backend
+        if backend == 'meter':
+            self.policer = sdn_qos.MeterQoS(net, QOS_DORM_AGGREGATE)
+        else:
+            self.policer = qos_actuator.DormPolicer(self.r1, QOS_DORM_AGGREGATE)
+        # Vòng điều khiển do sampler riêng điều khiển: đọc /proc/<pid r1>/net/dev, EWMA + hold timer
+        self.sampler = wan_sampler.WanSampler(
+            self.r1, intf=self.wan_intf, capacity_mbps=WAN_BW, interval=QOS_POLL_INTERVAL,
+            alpha=QOS_EWMA_ALPHA, high=QOS_THRESHOLD, low=QOS_RELIEF,
+            hold_up=QOS_HOLD_UP, hold_down=QOS_HOLD_DOWN,
+            on_high=self.apply_rate_limit, on_low=self.remove_rate_limit,
+            on_sample=self.policer.on_sample if backend == 'meter' else None)
 
     def get_wan_bps(self):
-        """Đọc TX bytes trên WAN interface của r1."""
-        try:
-            out = self.r1.cmd(f'cat /sys/class/net/{self.wan_intf}/statistics/tx_bytes')
-            curr_bytes = int(out.strip())
-            curr_time = time.time()
-            if self.prev_time > 0:
-                dt = curr_time - self.prev_time
-                db = curr_bytes - self.prev_bytes
-                bps = (db * 8) / dt / 1_000_000  # Mbps
-            else:
-                bps = 0
-            self.prev_bytes = curr_bytes
-            self.prev_time = curr_time
-            return bps
-        except:
-            return 0
+        """Tải WAN (Mbps) đã làm mượt EWMA theo sampler."""
+        return self.sampler.ewma or 0.0
 
     def apply_rate_limit(self):
-        """Rate-limit Dorm traffic (10.0.30.x) qua OVS QoS."""
+        """Rate-limit Dorm traffic (10.0.30.x): meter trên s6/s7 hoặc police ingress r1-eth2 (theo backend).
+        Trả về True nếu Dorm đang bị giới hạn (sampler chỉ chuyển trạng thái khi thành công)."""
         if self.dorm_limited:
-            return
-        info('\n*** [QoS] ⚠ WAN > 90%! Rate-limiting Dorm (VLAN30) → 1Mbps\n')
-        for i in range(1, 41):
-            host = self.net.get(f'dorm{i}')
-            intf = host.defaultIntf().name
-            host.cmd(f'tc qdisc del dev {intf} root 2>/dev/null')
-            host.cmd(f'tc qdisc add dev {intf} root tbf rate {QOS_DORM_LIMIT}mbit burst 32kbit latency 50ms')
-        self.dorm_limited = True
-        info('*** [QoS] Dorm rate-limited to 1Mbps. Admin/Lab/Server unaffected.\n')
+            return True
+        info('\n*** [QoS] ⚠ WAN > 90%! Rate-limiting Dorm (VLAN30) → '
+             f'{QOS_DORM_AGGREGATE}Mbps tổng ({self.backend})\n')
+        ms = self.policer.apply()
+        self.dorm_limited = self.policer.active
+        if not self.dorm_limited:
+            info(f'*** [QoS] Rate-limit Dorm thất bại ({ms:.1f} ms), sẽ thử lại.\n')
+            return False
+        info(f'*** [QoS] Dorm rate-limited sau {ms:.1f} ms. Admin/Lab/Server unaffected.\n')
+        return True
 
     def remove_rate_limit(self):
-        """Gỡ rate-limit Dorm."""
+        """Gỡ rate-limit Dorm; trả về True nếu Dorm không còn bị giới hạn."""
         if not self.dorm_limited:
-            return
+            return True
         info('\n*** [QoS] ✓ WAN < 70%. Removing Dorm rate-limit.\n')
-        for i in range(1, 41):
-            host = self.net.get(f'dorm{i}')
-            intf = host.defaultIntf().name
-            host.cmd(f'tc qdisc del dev {intf} root 2>/dev/null')
-        self.dorm_limited = False
-        info('*** [QoS] Dorm bandwidth restored.\n')
-
-    def monitor_loop(self):
-        """Vòng lặp giám sát WAN."""
-        while self.running:
-            bps = self.get_wan_bps()
-            threshold_mbps = WAN_BW * QOS_THRESHOLD
-            if bps > threshold_mbps:
-                self.apply_rate_limit()
-            elif bps < WAN_BW * 0.7 and self.dorm_limited:
-                self.remove_rate_limit()
-            time.sleep(QOS_POLL_INTERVAL)
+        ms = self.policer.remove()
+        self.dorm_limited = self.policer.active
+        if self.dorm_limited:
+            info(f'*** [QoS] Gỡ rate-limit Dorm thất bại ({ms:.1f} ms), sẽ thử lại.\n')
+            return False
+        info(f'*** [QoS] Dorm bandwidth restored sau {ms:.1f} ms.\n')
+        return True
 
     def start(self):
+        self.policer.setup()
+        if self.backend == 'meter' and not self.policer.supported:
+            info('*** [QoS] Datapath OVS không hỗ trợ meter → dùng police tc tại r1\n')
+            self.backend = 'tc'
+            self.policer = qos_actuator.DormPolicer(self.r1, QOS_DORM_AGGREGATE).setup()
+            self.sampler.on_sample = None
+        if self.backend == 'tc' and not self.policer.arp_ok:
+            info('*** [QoS] ⚠ r1 chưa đặt arp_ignore=1 / arp_announce=2: Dorm có thể vượt police r1-eth2\n')
         self.running = True
-        self.thread = threading.Thread(target=self.monitor_loop, daemon=True)
-        self.thread.start()
-        info('*** [QoS] Dynamic QoS Monitor started (poll every %ds)\n' % QOS_POLL_INTERVAL)
+        self.sampler.start()
+        info('*** [QoS] Dynamic QoS Monitor started (sample every %.1fs, EWMA α=%.2f)\n'
+             % (QOS_POLL_INTERVAL, QOS_EWMA_ALPHA))
 
     def stop(self):
         self.running = False
+        self.sampler.stop()
+        self.remove_rate_limit()
+        info('*** [QoS] ' + self.sampler.format_stats() + '\n')
+        if self.sampler.decisions:
+            info(self.sampler.format_log() + '\n')
+        if any(ev[1] != 'setup' for ev in self.policer.events):
+            info(self.policer.format_events() + '\n')
+        # Gỡ hẳn backend (meter + luồng trên s6/s7 hoặc qdisc ingress r1-eth2): net còn dùng tiếp cho test khác
+        self.policer.uninstall()
+        self.dorm_limited = False
 
 # ── Draw ──────────────────────────────────────────────────────────────────
 def draw_topology_graph():
+    # Chỉ nạp matplotlib/networkx khi thật sự vẽ -> import cauhinh4 / build_net() khởi động nhanh
+    import matplotlib; matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+    import networkx as nx
     G = nx.Graph()
     nodes = {
         'ctrl':('ctrl','SDN Controller\n(Ryu)\n127.0.0.1:6653'),
@@ -211,10 +226,10 @@ def draw_topology_graph():
     info(f'*** Saved: {GRAPH_OUTPUT}\n')
 
 # ── BUILD NET: dùng bởi test.py (import cauhinh4; net = cauhinh4.build_net()) ──
-def build_net():
+def build_net(proactive=PROACTIVE):
     """Build + configure SDN Spine-Leaf, trả về net (KHÔNG gọi CLI, KHÔNG start QoS monitor)."""
     cleanup_mininet()
-    net = Mininet(link=TCLink, autoSetMacs=True)
+    net = isolation.make_net(link=TCLink, autoSetMacs=True)
     c0 = net.addController('c0', controller=RemoteController,
                            ip=CONTROLLER_IP, port=CONTROLLER_PORT)
     r1        = net.addHost('r1', cls=LinuxRouter, ip='127.0.0.1/8')
@@ -250,14 +265,22 @@ def build_net():
     for i in range(1,5):    net.addLink(net.get(f'srv{i}'),   s8, bw=1000)
     info('*** Starting network (waiting for Ryu Controller)...\n')
     net.start()
-    s1.cmd('ovs-vsctl set Bridge s1 other_config:stp-priority=4096')
-    info('*** Waiting STP convergence 15s...\n')
-    time.sleep(15)
+    teardown.Registry(isolation.tag('cauhinh4')).track_net(net).save()
+    s1.cmd(f'ovs-vsctl set Bridge {s1.name} other_config:stp-priority=4096')
+    info('*** Waiting STP convergence (stp/show trên mọi switch, tối đa %ds)...\n' % STP_TIMEOUT)
+    net.stp_report = stp_watch.wait_stp(net.switches, timeout=STP_TIMEOUT)
+    info(stp_watch.format_report(net.stp_report))
     for sw_name in ['s1','s2','s3','s4','s5','s6','s7','s8']:
         sw = net.get(sw_name)
-        sw.cmd(f'ovs-ofctl -O OpenFlow13 add-flow {sw_name} priority=0,actions=CONTROLLER:65535')
+        sw.cmd(f'ovs-ofctl -O OpenFlow13 add-flow {sw.name} priority=0,actions=CONTROLLER:65535')
+    if proactive:
+        ms, ok = sdn_qos.install_proactive(net.switches)
+        info('*** Proactive NORMAL flows: %s (%.0f ms)\n' % ('OK' if ok else 'LỖI', ms))
     r1.cmd('sysctl -w net.ipv4.ip_forward=1')
     r1.cmd('for f in /proc/sys/net/ipv4/conf/*/rp_filter; do echo 0 > $f; done')
+    # r1-eth0..3 cùng nằm trên s8 (không VLAN) → chỉ trả lời ARP trên đúng cổng có IP được hỏi,
+    # để Dorm luôn học MAC của r1-eth2 và đi qua điểm police duy nhất (qos_actuator.DormPolicer)
+    r1.cmd('sysctl -w net.ipv4.conf.all.arp_ignore=1 net.ipv4.conf.all.arp_announce=2')
     for eth, ip in [('r1-eth0','10.0.10.254/24'),('r1-eth1','10.0.20.254/24'),
                     ('r1-eth2','10.0.30.254/24'),('r1-eth3','10.0.99.254/24'),
                     ('r1-eth4','203.162.1.254/24')]:
@@ -273,7 +296,7 @@ def build_net():
 # ── RUN: chạy trực tiếp python3 cauhinh4.py → CLI + QoS ──
 def run():
     draw_topology_graph()
-    net = build_net()
+    net = build_net(proactive=True)
     qos = DynamicQoSMonitor(net)
     qos.start()
     info('\n' + '='*70 + '\n')
@@ -284,8 +307,7 @@ def run():
     info(' Test: pingall | admin1 ping srv1 | admin1 ping 203.162.1.1\n')
     CLI(net)
     qos.stop()
-    net.stop()
-    cleanup_mininet()
+    info(teardown.format_report(teardown.stop(net, fallback=not isolation.prefix())))
 
 if __name__ == '__main__':
     setLogLevel('info')
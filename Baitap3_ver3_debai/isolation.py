@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+CHẠY NHIỀU MÔ HÌNH cauhinhN ĐỒNG THỜI TRÊN CÙNG MÁY
+- Tài nguyên toàn cục duy nhất mà các mô hình tranh nhau là tên switch: bridge OVS và veth phía switch
+  nằm ở root namespace (host / router có namespace riêng nên trùng tên không sao).
+- PrefixedMininet đổi tên switch thành <prefix><tên> (VD: 'b' + 's1' = 'bs1') nhưng vẫn tra được bằng tên gốc
+  net.get('s1') / net['s1'] → code test và cauhinhN không phải sửa.
+- Prefix chỉ gồm chữ cái: Mininet suy ra DPID từ các chữ số trong tên switch.
+- Prefix truyền qua biến môi trường TKM_SW_PREFIX (tiến trình con của test.py --parallel tự đặt);
+  không đặt → hành vi y như Mininet gốc.
+- pin_cpus() ghim tiến trình (và mọi shell node Mininet sinh ra sau đó) vào một tập CPU riêng.
+"""
+import os
+
+from mininet.net import Mininet
+
+PREFIX_ENV = 'TKM_SW_PREFIX'
+
+def prefix():
+    p = os.environ.get(PREFIX_ENV, '')
+    if p and not p.isalpha():
+        raise ValueError(f'{PREFIX_ENV}={p!r}: prefix switch chỉ được gồm chữ cái (DPID lấy từ chữ số trong tên)')
+    return p
+
+def tag(base):
+    """Tên registry teardown riêng cho từng prefix (hai lần chạy song song không dọn nhầm của nhau)."""
+    p = prefix()
+    return f'{base}-{p}' if p else base
+
+class PrefixedMininet(Mininet):
+    """Mininet thêm prefix vào tên switch, tra cứu được bằng cả tên gốc lẫn tên thật."""
+    def __init__(self, *args, sw_prefix='', **kwargs):
+        self.sw_prefix = sw_prefix
+        self.aliases = {}
+        super().__init__(*args, **kwargs)
+
+    def addSwitch(self, name, cls=None, **params):
+        real = self.sw_prefix + name
+        if real != name:
+            self.aliases[name] = real
+        return super().addSwitch(real, cls=cls, **params)
+
+    def getNodeByName(self, *args):
+        return super().getNodeByName(*[self.aliases.get(a, a) for a in args])
+
+    def get(self, *args):
+        return self.getNodeByName(*args)
+
+    def __getitem__(self, key):
+        return super().__getitem__(self.aliases.get(key, key))
+
+    def __contains__(self, item):
+        return super().__contains__(self.aliases.get(item, item))
+
+def make_net(**kwargs):
+    """Thay cho Mininet(**kwargs) trong build_net(): tự áp prefix switch từ môi trường (nếu có)."""
+    return PrefixedMininet(sw_prefix=prefix(), **kwargs)
+
+def split_cpus(n_groups, cpus=None):
+    """Chia các CPU được phép dùng thành n_groups tập rời nhau (thiếu CPU → các nhóm dùng chung xoay vòng)."""
+    cpus = sorted(cpus if cpus is not None else os.sched_getaffinity(0))
+    if n_groups <= len(cpus):
+        size = len(cpus) // n_groups
+        return [cpus[i * size:(i + 1) * size] for i in range(n_groups)]
+    return [[cpus[i % len(cpus)]] for i in range(n_groups)]
+
+def pin_cpus(cpus):
+    """Ghim tiến trình hiện tại vào `cpus` (iterable số CPU); shell node Mininet tạo sau đó kế thừa affinity."""
+    os.sched_setaffinity(0, set(cpus))
+    return sorted(os.sched_getaffinity(0))
+
+def parse_cpus(spec):
+    """'0-3,6' → [0, 1, 2, 3, 6]"""
+    out = []
+    for part in spec.split(','):
+        if '-' in part:
+            a, b = part.split('-')
+            out.extend(range(int(a), int(b) + 1))
+        elif part:
+            out.append(int(part))
+    return out
+
+def format_cpus(cpus):
+    return ','.join(str(c) for c in cpus)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+RATE-LIMIT DORM TẠI MỘT ĐIỂM DUY NHẤT (THAY CHO 40 × 2 LỆNH tc TRÊN TỪNG HOST)
+- Mọi luồng Dorm (10.0.30.0/24) đi ra ngoài đều vào r1 qua cổng gateway r1-eth2
+  → một bộ police u32 trên ingress của r1-eth2 là đủ chặn tất cả, không cần chạm tới dorm1..dorm40.
+- Điều kiện: r1-eth0..3 cùng nằm trên bridge s8 phẳng, nên router phải đặt arp_ignore=1 / arp_announce=2
+  (cauhinh4.build_net làm việc này); nếu không, r1 trả lời ARP 10.0.30.254 từ mọi cổng và Dorm có thể vào
+  qua r1-eth0/1/3, vượt qua bộ police. setup() kiểm tra lại và cảnh báo qua .arp_ok.
+- Không đặt ở egress r1-eth4: TCLink (bw=200) đã chiếm root qdisc HTB của cổng WAN.
+- setup() tạo sẵn qdisc ingress; bật / đổi mức / gỡ giới hạn = MỘT lệnh `tc -batch -` chạy qua node.popen()
+  (không qua pty của host.cmd()), thời gian tác động đo bằng mili-giây và lưu vào .events.
+- Mức giới hạn là TỔNG cho cả subnet: mặc định = mức cũ mỗi host × số host Dorm (cùng ngân sách băng thông).
+- uninstall() gỡ hẳn qdisc ingress (kèm bộ lọc) khi dừng monitor → net dùng lại cho test khác không còn police sót.
+Dùng: pol = DormPolicer(net.get('r1'), rate_mbit=40).setup(); pol.apply(); ...; pol.remove(); pol.uninstall()
+"""
+import time
+import subprocess
+
+DORM_SUBNET = '10.0.30.0/24'
+DORM_GW_INTF = 'r1-eth2'
+DORM_HOSTS = 40
+PRIO = 10              # prio riêng của bộ lọc → gỡ đúng bộ lọc này, không đụng rule khác trên cổng
+BURST = '64k'
+
+class DormPolicer:
+    """Police u32 trên ingress cổng gateway của subnet Dorm trên router."""
+    def __init__(self, router, rate_mbit, intf=DORM_GW_INTF, subnet=DORM_SUBNET, burst=BURST, prio=PRIO):
+        self.router = router
+        self.rate_mbit = rate_mbit
+        self.intf = intf
+        self.subnet = subnet
+        self.burst = burst
+        self.prio = prio
+        self.active = False
+        self.arp_ok = None   # r1 có arp_ignore / arp_announce đúng để r1-eth2 là điểm vào duy nhất của Dorm
+        self.events = []   # [(thời điểm, hành động, mbit hoặc None, latency_ms, thành công)]
+
+    def setup(self):
+        """Tạo qdisc ingress một lần (lúc khởi động monitor) để lúc nghẽn chỉ còn thao tác bộ lọc."""
+        # Xoá qdisc cũ (kèm bộ lọc police còn sót của lần chạy trước trên cùng net) rồi tạo mới
+        self.router.cmd(f'tc qdisc del dev {self.intf} ingress 2>/dev/null; '
+                        f'tc qdisc add dev {self.intf} handle ffff: ingress')
+        self.active = False
+        out = self.router.cmd('sysctl -n net.ipv4.conf.all.arp_ignore net.ipv4.conf.all.arp_announce').split()
+        self.arp_ok = len(out) == 2 and out[0] == '1' and out[1] == '2'
+        return self
+
+    def _batch(self, lines):
+        """Chạy các dòng lệnh tc trong MỘT tiến trình `tc -batch` ở namespace của router; trả về (ms, ok)."""
+        t0 = time.perf_counter()
+        p = self.router.popen(['tc', '-batch', '-'], stdin=subprocess.PIPE,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, text=True)
+        p.communicate(''.join(l + '\n' for l in lines))
+        return (time.perf_counter() - t0) * 1000, p.returncode == 0
+
+    def _del_filter(self):
+        return f'filter del dev {self.intf} parent ffff: protocol ip prio {self.prio}'
+
+    def apply(self, rate_mbit=None):
+        """Bật (hoặc đổi mức) giới hạn; trả về thời gian tác động (ms)."""
+        if rate_mbit is not None:
+            self.rate_mbit = rate_mbit
+        lines = [self._del_filter()] if self.active else []
+        lines.append(f'filter add dev {self.intf} parent ffff: protocol ip prio {self.prio} u32 '
+                     f'match ip src {self.subnet} '
+                     f'police rate {self.rate_mbit}mbit burst {self.burst} conform-exceed drop flowid :1')
+        ms, ok = self._batch(lines)
+        self.active = ok
+        self.events.append((time.time(), 'limit', self.rate_mbit, round(ms, 2), ok))
+        return ms
+
+    def remove(self):
+        """Gỡ giới hạn (chỉ xoá bộ lọc của mình, giữ qdisc ingress); trả về thời gian tác động (ms)."""
+        if not self.active:
+            return 0.0
+        ms, ok = self._batch([self._del_filter()])
+        self.active = not ok
+        self.events.append((time.time(), 'restore', None, round(ms, 2), ok))
+        return ms
+
+    def uninstall(self):
+        """Gỡ qdisc ingress cùng mọi bộ lọc của nó (khi dừng monitor); trả về thời gian tác động (ms)."""
+        ms, ok = self._batch([f'qdisc del dev {self.intf} ingress'])
+        self.active = False
+        return ms
+
+    def stats(self):
+        """Số gói bị police loại bỏ (đọc từ `tc -s filter show`); None nếu chưa bật."""
+        out = self.router.cmd(f'tc -s filter show dev {self.intf} parent ffff: prio {self.prio}')
+        for line in out.splitlines():
+            if 'dropped' in line:
+                # "(Sent 1234 bytes 10 pkts, dropped 5, overlimits 5 ...)"
+                try:
+                    return int(line.split('dropped')[1].split(',')[0])
+                except (IndexError, ValueError):
+                    return None
+        return None
+
+    def format_events(self):
+        return format_events(self.events)
+
+def format_events(events):
+    """Bảng các lần tác động [(thời điểm, hành động, mbit, ms, ok)] – dùng chung cho DormPolicer và sdn_qos.MeterQoS."""
+    lines = [f"{'Hành động':<10}{'Mức':>10}{'Tác động':>12}  OK"]
+    for _, action, mbit, ms, ok in events:
+        rate = '-' if mbit is None else f'{mbit:g}Mbit'
+        lines.append(f"{action:<10}{rate:>10}{ms:>10.2f}ms  {'✓' if ok else '✗'}")
+    return "\n".join(lines)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+QoS PHÍA SDN CHO MÔ HÌNH 4: METER OPENFLOW 1.3 TRÊN LEAF DORM + LUỒNG CHỦ ĐỘNG (PROACTIVE)
+- install_proactive(): đặt sẵn luồng `priority=10,actions=NORMAL` trên mọi switch → gói dữ liệu được OVS
+  chuyển tiếp ngay (vẫn tôn trọng STP), không còn đi qua table-miss CONTROLLER → Ryu chỉ còn nhận gói lạ.
+- MeterQoS: trên leaf Dorm (s6, s7) tạo meter 1 (kbps, band drop) và luồng
+  `priority=100,ip,nw_src=10.0.30.0/24 → meter:1,NORMAL`. Bình thường meter mở ở tốc độ cổng uplink;
+  nghẽn → mod-meter xuống ngân sách Dorm (chia đều cho các leaf), MỘT lệnh ovs-ofctl mỗi leaf, chạy song song.
+- Điều chỉnh liên tục theo wan_sampler (on_sample): khi đang giới hạn, mỗi STEP giây
+  EWMA còn ≥ ngưỡng cao → giảm tốc độ meter (× DECREASE, không dưới FLOOR); EWMA < ngưỡng thấp → nới (× INCREASE).
+- Giao diện giống qos_actuator.DormPolicer (setup / apply / remove / uninstall / active / events) → DynamicQoSMonitor đổi backend
+  chỉ bằng tham số. Meter cần datapath OVS hỗ trợ (OVS ≥ 2.10, kernel ≥ 4.15); không hỗ trợ → supported=False.
+- Lệnh ovs-ofctl đi thẳng qua socket quản lý của bridge nên chạy được dù có Ryu (ryu.app.simple_switch_13) hay không.
+- packet_in_count(): tổng n_packets của các luồng gửi lên CONTROLLER (đo tốc độ packet-in khi benchmark).
+"""
+import re
+import time
+import subprocess
+
+import qos_actuator
+
+COOKIE = '0x7173'          # Đánh dấu luồng do module này cài (dễ lọc / xoá)
+PROACTIVE_PRIO = 10
+METER_PRIO = 100
+METER_ID = 1
+DORM_LEAVES = ('s6', 's7')
+OPEN_RATE_MBPS = 1000      # Tốc độ uplink leaf → meter "mở" không giới hạn thực tế
+FLOOR_MBPS = 1             # Tốc độ meter thấp nhất mỗi leaf
+STEP = 1.0                 # Giây giữa hai lần điều chỉnh meter khi đang giới hạn
+DECREASE = 0.5
+INCREASE = 1.25
+
+def ofctl(*args, stdin=None, timeout=10):
+    """Chạy `ovs-ofctl -O OpenFlow13 ...` ở root namespace; trả về (mã thoát, stdout)."""
+    try:
+        p = subprocess.run(['ovs-ofctl', '-O', 'OpenFlow13', *args], input=stdin,
+                           capture_output=True, text=True, timeout=timeout)
+        return p.returncode, p.stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return -1, ''
+
+def _parallel(cmds):
+    """Chạy đồng thời các lệnh ovs-ofctl (mỗi phần tử: list tham số); trả về (ms, tất cả thành công)."""
+    t0 = time.perf_counter()
+    procs = [subprocess.Popen(['ovs-ofctl', '-O', 'OpenFlow13', *c], stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL) for c in cmds]
+    ok = all(p.wait() == 0 for p in procs)
+    return (time.perf_counter() - t0) * 1000, ok
+
+def install_proactive(switches):
+    """Luồng NORMAL chủ động trên mọi switch (song song); trả về (ms, ok)."""
+    flow = f'cookie={COOKIE},priority={PROACTIVE_PRIO},actions=NORMAL'
+    return _parallel([['add-flow', getattr(sw, 'name', sw), flow] for sw in switches])
+
+def clear_meter(switches, subnet=qos_actuator.DORM_SUBNET):
+    """Xoá luồng Dorm → meter (cookie + match riêng, luồng proactive cùng cookie giữ nguyên) và meter METER_ID
+    trên các switch (song song); switch chưa từng có meter chỉ báo lỗi bị bỏ qua. Trả về ms."""
+    names = [getattr(sw, 'name', sw) for sw in switches]
+    ms, _ = _parallel([['del-flows', n, f'cookie={COOKIE}/-1,ip,nw_src={subnet}'] for n in names])
+    ms2, _ = _parallel([['del-meter', n, f'meter={METER_ID}'] for n in names])
+    return ms + ms2
+
+def packet_in_count(switches):
+    """Tổng số gói đã khớp các luồng có action CONTROLLER (≈ số packet-in đã gửi lên controller)."""
+    total = 0
+    for sw in switches:
+        _, out = ofctl('dump-flows', getattr(sw, 'name', sw))
+        for line in out.splitlines():
+            if 'CONTROLLER' in line:
+                m = re.search(r'n_packets=(\d+)', line)
+                total += int(m.group(1)) if m else 0
+    return total
+
+def meter_stats(switch):
+    """{'packets', 'bytes', 'dropped'} của meter METER_ID trên một switch; None nếu không đọc được."""
+    rc, out = ofctl('meter-stats', getattr(switch, 'name', switch), f'meter={METER_ID}')
+    m_in = re.search(r'packet_in_count:(\d+)\s+byte_in_count:(\d+)', out)
+    if rc != 0 or not m_in:
+        return None
+    band = re.search(r'0:\s*packet_count:(\d+)', out)
+    return {'packets': int(m_in.group(1)), 'bytes': int(m_in.group(2)),
+            'dropped': int(band.group(1)) if band else 0}
+
+class MeterQoS:
+    """Meter OF1.3 cho subnet Dorm trên các leaf Dorm; rate_mbit là ngân sách TỔNG, chia đều cho các leaf."""
+    def __init__(self, net, rate_mbit, leaves=DORM_LEAVES, subnet=qos_actuator.DORM_SUBNET,
+                 open_mbps=OPEN_RATE_MBPS, floor_mbps=FLOOR_MBPS, step=STEP):
+        self.leaves = [net.get(n).name for n in leaves]   # tên thật (có prefix khi chạy song song)
+        self.rate_mbit = rate_mbit
+        self.subnet = subnet
+        self.open_mbps = open_mbps
+        self.floor_mbps = floor_mbps
+        self.step = step
+        self.leaf_mbps = open_mbps
+        self.active = False
+        self.supported = None
+        self.events = []   # [(thời điểm, hành động, mbit tổng hoặc None, latency_ms, thành công)]
+        self._last_step = 0.0
+
+    @staticmethod
+    def _meter(mbps):
+        kbps = max(1, int(mbps * 1000))
+        return f'meter={METER_ID},kbps,burst,stats,band=type=drop,rate={kbps},burst_size={max(64, kbps // 10)}'
+
+    def uninstall(self):
+        """Xoá luồng Dorm → meter (chỉ luồng có cookie + match của module này, luồng proactive giữ nguyên) rồi xoá meter;
+        trả về thời gian tác động (ms)."""
+        ms = clear_meter(self.leaves, self.subnet)
+        self.leaf_mbps = self.open_mbps
+        self.active = False
+        return ms
+
+    def setup(self):
+        """Tạo meter (mở) + luồng Dorm → meter trên mọi leaf Dorm; supported=False nếu datapath không có meter."""
+        # Dựng lại từ đầu: net dùng lại (testver2: test4 rồi test6) còn meter cũ → add-meter báo METER_EXISTS
+        self.uninstall()
+        ms, ok = _parallel([['add-meter', leaf, self._meter(self.open_mbps)] for leaf in self.leaves])
+        if ok:
+            flow = (f'cookie={COOKIE},priority={METER_PRIO},ip,nw_src={self.subnet},'
+                    f'actions=meter:{METER_ID},NORMAL')
+            ms2, ok = _parallel([['add-flow', leaf, flow] for leaf in self.leaves])
+            ms += ms2
+        self.supported = ok
+        self.events.append((time.time(), 'setup', None, round(ms, 2), ok))
+        return self
+
+    def _set_leaf_rate(self, mbps, action):
+        ms, ok = _parallel([['mod-meter', leaf, self._meter(mbps)] for leaf in self.leaves])
+        if ok:
+            self.leaf_mbps = mbps
+        total = None if mbps >= self.open_mbps else round(mbps * len(self.leaves), 2)
+        self.events.append((time.time(), action, total, round(ms, 2), ok))
+        return ms, ok
+
+    def apply(self, rate_mbit=None):
+        """Giới hạn Dorm ở ngân sách tổng rate_mbit; trả về thời gian tác động (ms)."""
+        if rate_mbit is not None:
+            self.rate_mbit = rate_mbit
+        ms, ok = self._set_leaf_rate(max(self.floor_mbps, self.rate_mbit / len(self.leaves)), 'limit')
+        self.active = self.active or ok
+        self._last_step = time.monotonic()
+        return ms
+
+    def remove(self):
+        """Mở meter về tốc độ uplink (giữ meter + luồng để lần sau chỉ cần mod-meter)."""
+        if not self.active:
+            return 0.0
+        ms, ok = self._set_leaf_rate(self.open_mbps, 'restore')
+        self.active = not ok
+        return ms
+
+    def on_sample(self, sampler):
+        """Gắn vào WanSampler.on_sample: khi đang giới hạn, siết / nới meter theo EWMA mỗi `step` giây."""
+        if not self.active or sampler.ewma is None or time.monotonic() - self._last_step < self.step:
+            return
+        if sampler.ewma >= sampler.high_mbps:
+            target = max(self.floor_mbps, self.leaf_mbps * DECREASE)
+        elif sampler.ewma < sampler.low_mbps:
+            target = min(self.rate_mbit / len(self.leaves), self.leaf_mbps * INCREASE)
+        else:
+            return
+        self._last_step = time.monotonic()
+        if abs(target - self.leaf_mbps) > 1e-3:
+            self._set_leaf_rate(target, 'adjust')
+
+    def stats(self):
+        """Tổng packets / bytes / dropped của meter trên các leaf Dorm."""
+        total = {'packets': 0, 'bytes': 0, 'dropped': 0}
+        for leaf in self.leaves:
+            st = meter_stats(leaf) or {}
+            for k in total:
+                total[k] += st.get(k, 0)
+        return total
+
+    def format_events(self):
+        return qos_actuator.format_events(self.events)
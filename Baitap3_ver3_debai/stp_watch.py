@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+THEO DÕI HỘI TỤ STP TRÊN OVS (THAY CHO time.sleep(15) CỐ ĐỊNH)
+- Mỗi vòng hỏi `ovs-appctl stp/show <bridge>` cho TẤT CẢ switch đồng thời (một luồng / switch).
+- Bridge ổn định khi mọi port đã ở trạng thái bền (forwarding / blocking / disabled),
+  có ít nhất một port forwarding, và trạng thái không đổi trong HOLD giây.
+  (Lúc mới bật, port có thể đang blocking hết → điều kiện "có forwarding" tránh báo hội tụ sớm.)
+- Trả về ngay khi toàn fabric ổn định, kèm thời gian hội tụ của từng bridge.
+  Không thấy bridge STP nào → converged=False (không coi "không có gì" là đã hội tụ).
+- Đo TÁI hội tụ sau sự cố: chụp snapshot() trước khi gây lỗi rồi truyền baseline=...; chỉ báo hội tụ khi
+  đã thấy ít nhất một port đổi trạng thái so với baseline (bỏ qua các port của chính link bị cắt, `ignore`)
+  → trạng thái cũ trước sự cố không thể "giữ đủ HOLD" và cho ra thời gian tái hội tụ ngắn giả.
+
+Dùng trong cauhinh2/3/4.build_net(), test.py warmup() và testver2 test4 (đo tái hội tụ khi cắt link).
+"""
+import re
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_TIMEOUT = 60
+POLL_INTERVAL = 0.25
+HOLD = 1.0
+
+STATES = ('disabled', 'listening', 'learning', 'forwarding', 'blocking')
+STEADY = ('disabled', 'forwarding', 'blocking')
+
+_OLD_FMT = re.compile(r'port\s+(\S+):\s+STP state=(\w+)')
+
+def parse_stp_show(out):
+    """Trả về {port: trạng thái} từ output `ovs-appctl stp/show` (hỗ trợ cả định dạng bảng mới và cũ)."""
+    ports = {}
+    for line in out.splitlines():
+        m = _OLD_FMT.search(line)
+        if m:
+            ports[m.group(1)] = m.group(2)
+            continue
+        # Định dạng bảng: "s1-eth1  designated forwarding  19  128.1"
+        tok = line.split()
+        state = next((t for t in tok[1:4] if t in STATES), None)
+        if state:
+            ports[tok[0]] = state
+    return ports
+
+def stp_state(bridge):
+    """{port: trạng thái} của một bridge; None nếu bridge không bật STP / không tồn tại."""
+    try:
+        out = subprocess.run(['ovs-appctl', 'stp/show', bridge], capture_output=True,
+                             text=True, timeout=5).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return parse_stp_show(out) or None
+
+def is_steady(ports):
+    return bool(ports) and all(s in STEADY for s in ports.values()) \
+        and any(s == 'forwarding' for s in ports.values())
+
+def snapshot(switches):
+    """{bridge: {port: trạng thái}} hiện tại của các switch bật STP (dùng làm baseline cho wait_stp)."""
+    names = [getattr(s, 'name', s) for s in switches]
+    with ThreadPoolExecutor(max_workers=max(1, len(names))) as pool:
+        snap = dict(zip(names, pool.map(stp_state, names)))
+    return {b: p for b, p in snap.items() if p is not None}
+
+def _changed(snap, baseline, ignore):
+    """Có port nào (ngoài `ignore`) đổi trạng thái so với baseline không."""
+    strip = lambda ports: {p: st for p, st in (ports or {}).items() if p not in ignore}
+    return any(strip(ports) != strip(baseline.get(b)) for b, ports in snap.items())
+
+def wait_stp(switches, timeout=DEFAULT_TIMEOUT, interval=POLL_INTERVAL, hold=HOLD, baseline=None, ignore=()):
+    """
+    Chờ STP ổn định trên danh sách switch (tên hoặc node Mininet).
+    Trả về {'converged': bool, 'elapsed': s, 'changed': bool,
+            'bridges': {tên: {'converged_s', 'forwarding', 'blocking', 'ports'}}};
+    converged_s = thời điểm bridge đạt trạng thái bền cuối cùng (tính từ lúc gọi hàm).
+    Bridge không bật STP bị bỏ qua; không còn bridge nào → converged=False.
+    baseline (từ snapshot() trước sự cố): chỉ hội tụ sau khi đã thấy thay đổi so với baseline,
+    không tính các port trong `ignore` (VD: hai đầu link vừa cắt, đổi trạng thái ngay lập tức).
+    """
+    names = [getattr(s, 'name', s) for s in switches]
+    ignore = set(ignore)
+    changed = baseline is None
+    t0 = time.monotonic()
+    deadline = t0 + timeout
+    since = {}   # bridge -> (chữ ký trạng thái, thời điểm bắt đầu giữ nguyên)
+    last = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(names))) as pool:
+        while True:
+            now = time.monotonic() - t0
+            snap = dict(zip(names, pool.map(stp_state, names)))
+            snap = {b: p for b, p in snap.items() if p is not None}
+            last = snap
+            changed = changed or _changed(snap, baseline, ignore)
+            stable = bool(snap) and changed
+            for b, ports in snap.items():
+                sig = tuple(sorted(ports.items())) if is_steady(ports) else None
+                if since.get(b, (None,))[0] != sig:
+                    since[b] = (sig, now)
+                if sig is None or now - since[b][1] < hold:
+                    stable = False
+            if stable or time.monotonic() >= deadline:
+                break
+            time.sleep(interval)
+    bridges = {}
+    for b, ports in last.items():
+        sig, t_sig = since.get(b, (None, None))
+        bridges[b] = {'converged_s': round(t_sig, 2) if sig is not None else None,
+                      'forwarding': sum(1 for s in ports.values() if s == 'forwarding'),
+                      'blocking': sum(1 for s in ports.values() if s == 'blocking'),
+                      'ports': ports}
+    return {'converged': stable, 'changed': changed,
+            'elapsed': round(time.monotonic() - t0, 2), 'bridges': bridges}
+
+def format_report(report):
+    """Bảng tóm tắt thời gian hội tụ STP theo bridge."""
+    lines = [f"{'Bridge':<8}{'Fwd':>5}{'Blk':>5}{'Hội tụ (s)':>12}"]
+    for b, r in sorted(report['bridges'].items(), key=lambda x: int(re.sub(r'\D', '', x[0]) or 0)):
+        conv = '-' if r['converged_s'] is None else f"{r['converged_s']:.2f}"
+        lines.append(f"{b:<8}{r['forwarding']:>5}{r['blocking']:>5}{conv:>12}")
+    state = "ỔN ĐỊNH" if report['converged'] else "CHƯA ỔN ĐỊNH (hết thời gian chờ)"
+    lines.append(f"=> STP {state} sau {report['elapsed']:.2f}s")
+    return "\n".join(lines) + "\n"
@@ -9,6 +9,7 @@ Cách dùng:
   sudo python3 test.py                  # Test cả 4 mô hình lần lượt
   sudo python3 test.py --cauhinh 1      # Test riêng mô hình 1
   sudo python3 test.py --cauhinh 4      # Test riêng mô hình 4 (cần Ryu)
+  sudo python3 test.py --parallel       # Chạy các mô hình ĐỒNG THỜI, mỗi mô hình một tập CPU riêng
 
 3 BÀI TEST:
   Test 1 – Elephant Flow:  20 Lab iperf TCP → serverhcm + admin1 ping
@@ -16,9 +17,15 @@ Cách dùng:
   Test 3 – Dynamic QoS:    40 Dorm iperf UDP → WAN + admin1 ping
 """
 
-import os, sys, re, time, argparse, subprocess, importlib
+import os, sys, time, json, string, argparse, subprocess, importlib
 from mininet.log import setLogLevel, info
 
+import stp_watch
+import isolation
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import teardown
+import netparse
+
 # ── Màu terminal ────────────────────────────────────────────────
 R='\033[91m'; G='\033[92m'; Y='\033[93m'; C='\033[96m'
 B='\033[1m';  E='\033[0m';  SEP='━'*72
@@ -38,15 +45,24 @@ def raw_out(text):
         sys.stdout.flush()
 
 def parse_ping(raw):
-    """Trích loss% và avg-ms từ ping output thô."""
-    lm  = re.search(r'(\d+)%\s+packet\s+loss', raw)
-    rtm = re.search(r'rtt .* = [\d.]+/([\d.]+)/', raw)
-    loss = int(lm.group(1))    if lm  else 100
-    avg  = float(rtm.group(1)) if rtm else 9999.0
-    return loss, avg
+    """Trích loss% và avg-ms từ ping output thô (netparse); output sai định dạng → cảnh báo, không im lặng."""
+    r = netparse.parse_ping(raw)
+    if not r.ok:
+        warn(f'Không đọc được kết quả ping ({r.error}) → coi như mất 100%')
+        return 100, 9999.0
+    return int(round(r.loss_pct)), r.rtt_avg if r.rtt_avg is not None else 9999.0
 
 def cleanup():
-    subprocess.run(['sudo','mn','-c'], capture_output=True, timeout=30)
+    # Chỉ dùng khi build_net() hỏng giữa chừng (chưa kịp ghi registry) → dọn toàn cục bằng mn -c.
+    # Khi chạy song song (có prefix) KHÔNG mn -c: sẽ xoá luôn mạng của các mô hình đang chạy cạnh bên.
+    # Cùng lý do, mọi teardown.stop()/cleanup_stale() dưới prefix đều gọi với fallback=False.
+    if isolation.prefix():
+        return
+    teardown.full_cleanup()
+
+# Chỉ giết iperf trong network namespace của node ($$ = shell của node): các host Mininet dùng chung
+# PID namespace, `pkill iperf` trần sẽ giết cả iperf của mô hình khác khi chạy --parallel
+KILL_IPERF = 'pkill --ns $$ --nslist net -x iperf 2>/dev/null'
 
 # ── Lưu thống kê ───────────────────────────────────────────────
 ALL_STATS = []
@@ -87,8 +103,9 @@ def warmup(net, n):
         note(f'Warm-up OK: admin1 → {wan_ip} reachable')
     else:
         warn(f'Warm-up: admin1 → {wan_ip} chưa thông! (có thể do STP chưa hội tụ)')
-        note('Đợi thêm 10s...')
-        time.sleep(10)
+        note('Chờ STP ổn định (tối đa 10s)...')
+        rep = stp_watch.wait_stp(net.switches, timeout=10)
+        note(f'STP {"ổn định" if rep["converged"] else "vẫn chưa ổn định"} sau {rep["elapsed"]:.1f}s')
         admin.cmd(f'ping -c 2 -W 2 {wan_ip} 2>/dev/null')
 
 # ════════════════════════════════════════════════════════════════
@@ -100,7 +117,7 @@ def test1_wan_flood(net, n):
     wan    = net.get('serverhcm')
     admin  = net.get('admin1')
 
-    wan.cmd('pkill iperf 2>/dev/null; iperf -s -D -p 5001 2>/dev/null')
+    wan.cmd(f'{KILL_IPERF}; iperf -s -D -p 5001 2>/dev/null')
     time.sleep(0.5)
 
     note('Kích hoạt 20 lab hosts iperf TCP → serverhcm (15s)...')
@@ -118,7 +135,7 @@ def test1_wan_flood(net, n):
     note(f'→ Thống kê: Packet Loss = {loss}% | Avg Latency = {avg:.1f} ms')
 
     for i in range(1, 21): net.get(f'lab{i}').cmd('kill %iperf 2>/dev/null')
-    wan.cmd('pkill iperf 2>/dev/null')
+    wan.cmd(KILL_IPERF)
     time.sleep(1)
     return loss, avg
 
@@ -181,7 +198,7 @@ def test3_dynamic_qos(net, n):
     else:
         note(f'Mô hình {n}: Không QoS động – Admin cạnh tranh BW với 40 Dorm')
 
-    wan.cmd('pkill iperf 2>/dev/null; iperf -s -u -D -p 5002 2>/dev/null')
+    wan.cmd(f'{KILL_IPERF}; iperf -s -u -D -p 5002 2>/dev/null')
     time.sleep(0.5)
 
     note('Kích hoạt 40 Dorm iperf UDP 5Mbps/host = 200Mbps → WAN...')
@@ -201,7 +218,7 @@ def test3_dynamic_qos(net, n):
     note(f'→ Thống kê: Packet Loss = {loss}% | Avg Latency = {avg:.1f} ms')
 
     for i in range(1, 41): net.get(f'dorm{i}').cmd('kill %iperf 2>/dev/null')
-    wan.cmd('pkill iperf 2>/dev/null')
+    wan.cmd(KILL_IPERF)
     time.sleep(1)
     return loss, avg
 
@@ -297,18 +314,65 @@ def run_model(n):
         if qos:
             qos.stop()
         print(f'\n{B}→ Dừng mạng mô hình {n}...{E}', flush=True)
-        net.stop()
-        cleanup()
+        note(teardown.format_report(teardown.stop(net, fallback=not isolation.prefix())).strip())
         note(f'Mô hình {n} đã dừng.\n')
 
     ALL_STATS.append(stats)
 
+# ════════════════════════════════════════════════════════════════
+# CHẠY SONG SONG: mỗi mô hình một tiến trình con, prefix switch + CPU riêng
+# ════════════════════════════════════════════════════════════════
+PARALLEL_DIR = '/tmp/test_parallel'
+
+def run_child(n, prefix, cpus, json_path):
+    """Tiến trình con của --parallel: đặt prefix switch, ghim CPU, chạy một mô hình rồi ghi thống kê ra JSON."""
+    os.environ[isolation.PREFIX_ENV] = prefix
+    if cpus:
+        note(f'Mô hình {n}: prefix switch "{prefix}", CPU {isolation.format_cpus(isolation.pin_cpus(cpus))}')
+    run_model(n)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(ALL_STATS, f, ensure_ascii=False)
+
+def run_parallel(selected):
+    """Khởi chạy đồng thời mọi mô hình đã chọn, chờ xong rồi ghép ALL_STATS theo đúng thứ tự mô hình."""
+    os.makedirs(PARALLEL_DIR, exist_ok=True)
+    groups = isolation.split_cpus(len(selected))
+    if len(selected) > len(os.sched_getaffinity(0)):
+        warn('Số CPU ít hơn số mô hình → các mô hình phải dùng chung CPU, số đo có thể ảnh hưởng nhau')
+    t0 = time.time()
+    procs = {}
+    for idx, n in enumerate(selected):
+        prefix = string.ascii_lowercase[idx]
+        log_path = os.path.join(PARALLEL_DIR, f'model{n}.log')
+        json_path = os.path.join(PARALLEL_DIR, f'model{n}.json')
+        if os.path.exists(json_path):
+            os.remove(json_path)
+        cmd = [sys.executable, os.path.abspath(__file__), '--cauhinh', n, '--prefix', prefix,
+               '--cpus', isolation.format_cpus(groups[idx]), '--json', json_path]
+        log = open(log_path, 'w')
+        procs[n] = (subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT), log, log_path, json_path)
+        note(f'{LABELS[n]}: prefix "{prefix}" | CPU {isolation.format_cpus(groups[idx])} | log {log_path}')
+
+    for n, (p, log, log_path, json_path) in procs.items():
+        rc = p.wait()
+        log.close()
+        try:
+            with open(json_path, encoding='utf-8') as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            fail(f'Mô hình {n} không có kết quả (mã thoát {rc}) – xem {log_path}')
+            continue
+        ALL_STATS.extend(stats)
+        for st in stats:
+            print_model_summary(st['label'], st)
+    note(f'Chạy song song {len(selected)} mô hình xong sau {time.time() - t0:.1f}s')
+
 # ════════════════════════════════════════════════════════════════
 # MAIN
 # ════════════════════════════════════════════════════════════════
 def main():
     if os.geteuid() != 0:
-        print('Cần sudo: sudo python3 test.py [--cauhinh 1|2|3|4]')
+        print('Cần sudo: sudo python3 test.py [--cauhinh 1|2|3|4] [--parallel]')
         sys.exit(1)
 
     parser = argparse.ArgumentParser(
@@ -318,10 +382,20 @@ def main():
         '--cauhinh', default='all',
         choices=['1','2','3','4','all'],
         help='1=Flat | 2=3-Layer | 3=Spine-Leaf | 4=SDN | all=cả 4')
+    parser.add_argument('--parallel', action='store_true',
+                        help='Chạy các mô hình đồng thời (switch đổi tên theo prefix, CPU tách riêng)')
+    # Tham số nội bộ cho tiến trình con của --parallel
+    parser.add_argument('--prefix', default='', help=argparse.SUPPRESS)
+    parser.add_argument('--cpus', default='', help=argparse.SUPPRESS)
+    parser.add_argument('--json', default=None, help=argparse.SUPPRESS)
     args = parser.parse_args()
 
     setLogLevel('warning')
 
+    if args.json:
+        run_child(args.cauhinh, args.prefix, isolation.parse_cpus(args.cpus), args.json)
+        return
+
     banner('FRAMEWORK KIỂM THỬ 4 MÔ HÌNH MẠNG – test.py')
     print('  Mỗi mô hình: import cauhinhN.py → build_net() → chạy 3 test')
     print('  Test 1: Elephant Flow   – 20 Lab TCP → WAN + admin1 ping')
@@ -335,11 +409,14 @@ def main():
 
     selected = ['1','2','3','4'] if args.cauhinh == 'all' else [args.cauhinh]
 
-    for n in selected:
-        run_model(n)
-        if args.cauhinh == 'all' and n != '4':
-            print('\n  → Chờ 3 giây trước mô hình tiếp theo...\n')
-            time.sleep(3)
+    if args.parallel:
+        run_parallel(selected)
+    else:
+        for n in selected:
+            run_model(n)
+            if args.cauhinh == 'all' and n != '4':
+                print('\n  → Chờ 3 giây trước mô hình tiếp theo...\n')
+                time.sleep(3)
 
     print_final_table()
     banner('HOÀN THÀNH – Xem RAW ping và bảng thống kê phía trên')
@@ -11,7 +11,7 @@ Kịch bản:
   4. PHASE 2 – FLOOD (không QoS): 40 Dorm xả UDP 10Mbps → serverhcm
      → WAN bị nghẽn → Admin ping bị ảnh hưởng
      → Giám sát WAN, phát cảnh báo khi ≥ 90%
-  5. PHASE 3 – SDN CAN THIỆP: Controller đẩy tc rate-limit xuống Dorm
+  5. PHASE 3 – SDN CAN THIỆP: Controller police Dorm tại r1 (một lệnh tc -batch, đo ms)
      → WAN giải phóng → Admin ping phục hồi
   6. PHASE 4 – RESTORE: gỡ rate-limit, traffic trả về bình thường
 
@@ -19,8 +19,13 @@ Yêu cầu:
   sudo ryu-manager ryu.app.simple_switch_13 --ofp-tcp-listen-port 6653
 """
 
-import os, sys, time, re, threading, subprocess
+import os, sys, time, subprocess
 sys.path.insert(0, '/home/mn/tkm_final')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import netparse
+import qos_actuator
+import wan_sampler
+import teardown
 
 # ── ANSI Colors ──────────────────────────────────────────────────────────────
 R = '\033[91m'; G = '\033[92m'; Y = '\033[93m'
@@ -31,9 +36,12 @@ WAN_BW_MBPS      = 200       # WAN link = 200Mbps (r1-eth4)
 CONGESTION_THR   = 0.90      # 90% → báo nghẽn
 RELIEF_THR       = 0.70      # 70% → gỡ giới hạn
 DORM_FLOOD_MBPS  = 8         # Mỗi dorm xả 8Mbps UDP (40 dorm = 320Mbps > WAN)
-DORM_LIMIT_MBPS  = 1         # Bóp Dorm xuống 1Mbps khi nghẽn
+DORM_LIMIT_MBPS  = 1         # Bóp Dorm xuống 1Mbps/host khi nghẽn
+DORM_AGGREGATE_MBPS = DORM_LIMIT_MBPS * qos_actuator.DORM_HOSTS  # Tổng cho subnet Dorm, police tại r1
 FLOOD_HOSTS      = 20        # Dùng 20 dorm để flood (đủ vượt 90% WAN)
-POLL_INTERVAL    = 1         # Giây giữa các lần kiểm tra WAN
+POLL_INTERVAL    = 0.2       # Giây giữa hai mẫu tải WAN (wan_sampler)
+EWMA_ALPHA       = 0.3       # Trọng số mẫu mới khi làm mượt
+HOLD_UP, HOLD_DOWN = 1.0, 3.0  # Giây EWMA phải vượt ngưỡng liên tục trước khi bóp / gỡ
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
 def banner(msg):
@@ -59,108 +67,74 @@ def raw_out(txt):
         print(f'  {line}', flush=True)
 
 def parse_ping(raw):
-    """Trả về (loss%, avg_ms, mdev_ms)."""
-    loss = 100.0; avg = 9999.0; mdev = 0.0
-    m = re.search(r'(\d+(?:\.\d+)?)%\s+packet loss', raw)
-    if m: loss = float(m.group(1))
-    m = re.search(r'rtt[^=]+=\s*[\d.]+/([\d.]+)/([\d.]+)/([\d.]+)', raw)
-    if m:
-        avg  = float(m.group(1))
-        mdev = float(m.group(3))
-    return loss, avg, mdev
-
-def get_wan_mbps(r1):
-    """Đọc tốc độ TX trên WAN interface r1-eth4 (2 lần đo)."""
-    def read_bytes():
-        try:
-            out = r1.cmd('cat /sys/class/net/r1-eth4/statistics/tx_bytes 2>/dev/null').strip()
-            return int(out)
-        except:
-            return 0
-    b1 = read_bytes(); t1 = time.time()
-    time.sleep(1)
-    b2 = read_bytes(); t2 = time.time()
-    dt = t2 - t1
-    if dt <= 0: return 0.0
-    return (b2 - b1) * 8 / dt / 1_000_000  # Mbps
+    """Trả về (loss%, avg_ms, mdev_ms) qua netparse; output sai định dạng → cảnh báo thay vì im lặng."""
+    r = netparse.parse_ping(raw)
+    if not r.ok:
+        warn(f'Không đọc được kết quả ping ({r.error})')
+        return 100.0, 9999.0, 0.0
+    return (r.loss_pct, r.rtt_avg if r.rtt_avg is not None else 9999.0,
+            r.rtt_mdev if r.rtt_mdev is not None else 0.0)
+
+def get_wan_mbps(sampler, window=3.0):
+    """Tải WAN r1-eth4 (Mbps) trung bình `window` giây gần nhất theo sampler – không chặn, không qua shell r1."""
+    return sampler.window_mbps(window)
 
 def check_ryu():
     """Kiểm tra Ryu Controller đang chạy."""
     result = subprocess.run(['pgrep', '-f', 'ryu-manager'], capture_output=True)
     return result.returncode == 0
 
-# ── QoS Controller (tc rate-limit trên Dorm hosts) ──────────────────────────
+# ── QoS Controller (police Dorm tại r1, một lệnh tc -batch) ───────────────────
 class QoSController:
     """Giả lập vai trò SDN Controller: phát hiện nghẽn → bóp/mở luồng Dorm."""
 
     def __init__(self, net, wan_threshold=CONGESTION_THR, relief_threshold=RELIEF_THR):
         self.net = net
         self.r1  = net.get('r1')
-        self.wan_thr   = wan_threshold * WAN_BW_MBPS
-        self.relief_thr = relief_threshold * WAN_BW_MBPS
         self.limited   = False
-        self.running   = False
-        self.log       = []         # [(time, mbps, action)]
         self.alert_time = None
+        self.policer    = qos_actuator.DormPolicer(self.r1, DORM_AGGREGATE_MBPS).setup()
+        if not self.policer.arp_ok:
+            warn('[CONTROLLER] r1 chưa đặt arp_ignore=1 / arp_announce=2: Dorm có thể vượt police r1-eth2')
+        # Sampler chạy ngay từ đầu ở chế độ thụ động (chỉ ghi cảnh báo); start() mới gắn hành động bóp / gỡ
+        self.sampler    = wan_sampler.WanSampler(
+            self.r1, intf='r1-eth4', capacity_mbps=WAN_BW_MBPS, interval=POLL_INTERVAL, alpha=EWMA_ALPHA,
+            high=wan_threshold, low=relief_threshold, hold_up=HOLD_UP, hold_down=HOLD_DOWN).start()
 
     def _apply_limit(self):
-        """Bóp Dorm → 1Mbps qua tc TBF."""
+        """Bóp Dorm tại một điểm: police ingress r1-eth2 cho 10.0.30.0/24; trả về True nếu đã giới hạn."""
         if self.limited:
-            return
+            return True
         self.alert_time = time.time()
-        warn(f'{R}[CONTROLLER] WAN ≥ 90% → ÁP DỤNG RATE-LIMIT Dorm → {DORM_LIMIT_MBPS}Mbps{E}')
-        for i in range(1, 41):
-            try:
-                h = self.net.get(f'dorm{i}')
-                intf = h.defaultIntf().name
-                h.cmd(f'tc qdisc del dev {intf} root 2>/dev/null')
-                h.cmd(
-                    f'tc qdisc add dev {intf} root tbf '
-                    f'rate {DORM_LIMIT_MBPS}mbit burst 16kbit latency 50ms')
-            except Exception:
-                pass
-        self.limited = True
-        ok('[CONTROLLER] Rate-limit áp dụng xong. Admin/Lab/Srv KHÔNG bị ảnh hưởng.')
+        warn(f'{R}[CONTROLLER] WAN ≥ 90% → ÁP DỤNG RATE-LIMIT Dorm → {DORM_AGGREGATE_MBPS}Mbps tổng{E}')
+        ms = self.policer.apply()
+        self.limited = self.policer.active
+        if self.limited:
+            ok(f'[CONTROLLER] Rate-limit áp dụng xong sau {ms:.1f} ms. Admin/Lab/Srv KHÔNG bị ảnh hưởng.')
+        else:
+            fail('[CONTROLLER] tc -batch thất bại, Dorm chưa bị giới hạn.')
+        return self.limited
 
     def _remove_limit(self):
-        """Gỡ giới hạn Dorm."""
+        """Gỡ giới hạn Dorm; trả về True nếu đã gỡ."""
         if not self.limited:
-            return
-        ok(f'[CONTROLLER] WAN < 70% → GỠ RATE-LIMIT Dorm.')
-        for i in range(1, 41):
-            try:
-                h = self.net.get(f'dorm{i}')
-                intf = h.defaultIntf().name
-                h.cmd(f'tc qdisc del dev {intf} root 2>/dev/null')
-            except Exception:
-                pass
-        self.limited = False
-
-    def _monitor(self):
-        while self.running:
-            mbps = get_wan_mbps(self.r1)
-            pct  = mbps / WAN_BW_MBPS * 100
-            action = ''
-            if mbps >= self.wan_thr and not self.limited:
-                self._apply_limit()
-                action = 'LIMIT'
-            elif mbps < self.relief_thr and self.limited:
-                self._remove_limit()
-                action = 'RESTORE'
-            self.log.append((time.time(), mbps, pct, action))
-            print(f'  {C}[WAN Monitor]{E} {mbps:6.1f} Mbps = {pct:5.1f}%'
-                  + (f'  {R}⚡ NGHẼN!{E}' if mbps >= self.wan_thr else '')
-                  + (f'  {G}● bình thường{E}' if mbps < self.relief_thr and not self.limited else ''),
-                  flush=True)
-            time.sleep(POLL_INTERVAL)
+            return True
+        ms = self.policer.remove()
+        self.limited = self.policer.active
+        if self.limited:
+            fail('[CONTROLLER] tc -batch thất bại, Dorm vẫn đang bị giới hạn.')
+            return False
+        ok(f'[CONTROLLER] WAN < 70% → GỠ RATE-LIMIT Dorm ({ms:.1f} ms).')
+        return True
 
     def start(self):
-        self.running = True
-        self._t = threading.Thread(target=self._monitor, daemon=True)
-        self._t.start()
+        """Bật chế độ tự động: sampler vượt ngưỡng (sau EWMA + hold) → bóp / gỡ Dorm."""
+        self.sampler.on_high = self._apply_limit
+        self.sampler.on_low  = self._remove_limit
 
     def stop(self):
-        self.running = False
+        self.sampler.on_high = self.sampler.on_low = None
+        self.sampler.stop()
 
     def force_limit(self):
         self._apply_limit()
@@ -211,7 +185,6 @@ def run_test():
         if '0 received' in chk and 'received' in chk:
             fail('Admin không ping được serverhcm. Kiểm tra routing.')
             raw_out(chk)
-            net.stop()
             return
         ok('admin1 → serverhcm: THÔNG')
 
@@ -255,15 +228,11 @@ def run_test():
         note(f'→ Flood (no QoS): loss={loss_fn:.0f}%  avg={avg_fn:.2f}ms')
 
         # Đọc WAN usage
-        note('Đọc mức độ tải WAN (đo 3 lần):')
-        wan_readings = []
-        for i in range(3):
-            mbps = get_wan_mbps(r1)
-            pct  = mbps / WAN_BW_MBPS * 100
-            wan_readings.append(mbps)
-            status = f'{R}⚡ NGHẼN!{E}' if pct >= 90 else ''
-            print(f'    đo {i+1}: {mbps:.1f} Mbps = {pct:.1f}% {status}', flush=True)
-        avg_wan = sum(wan_readings) / len(wan_readings)
+        note('Mức tải WAN theo sampler (3s gần nhất):')
+        avg_wan = get_wan_mbps(qos.sampler)
+        status = f'{R}⚡ NGHẼN!{E}' if qos.sampler.congested else ''
+        print(f'    thô: {avg_wan:.1f} Mbps = {qos.sampler.pct(avg_wan):.1f}% | '
+              f'EWMA: {qos.sampler.ewma or 0:.1f} Mbps {status}', flush=True)
         avg_pct = avg_wan / WAN_BW_MBPS * 100
         if avg_pct >= 90:
             warn(f'{R}[CẢNH BÁO] WAN ≥ 90% ({avg_wan:.1f}/{WAN_BW_MBPS} Mbps)! Controller cần can thiệp!{E}')
@@ -272,21 +241,17 @@ def run_test():
 
         # ── PHASE 3: SDN CAN THIỆP ───────────────────────────────────────
         section('PHASE 3 – SDN CONTROLLER CAN THIỆP: Rate-limit Dorm')
-        note('Controller phát hiện nghẽn → áp dụng tc TBF rate-limit Dorm → 1Mbps...')
+        note(f'Controller phát hiện nghẽn → police Dorm tại r1 → {DORM_AGGREGATE_MBPS}Mbps tổng...')
         print('─'*60, flush=True)
         qos.force_limit()
         note('Đợi 5s cho traffic ổn định sau rate-limit...')
         time.sleep(5)
 
         # Đo WAN sau can thiệp
-        note('Đọc mức tải WAN sau can thiệp:')
-        after_readings = []
-        for i in range(3):
-            mbps = get_wan_mbps(r1)
-            pct  = mbps / WAN_BW_MBPS * 100
-            after_readings.append(mbps)
-            print(f'    đo {i+1}: {mbps:.1f} Mbps = {pct:.1f}%', flush=True)
-        avg_after = sum(after_readings) / len(after_readings)
+        note('Mức tải WAN sau can thiệp (sampler, 3s gần nhất):')
+        avg_after = get_wan_mbps(qos.sampler)
+        print(f'    thô: {avg_after:.1f} Mbps = {qos.sampler.pct(avg_after):.1f}% | '
+              f'EWMA: {qos.sampler.ewma or 0:.1f} Mbps', flush=True)
 
         # Ping Admin SAU khi QoS can thiệp
         note('Ping Admin → serverhcm SAU KHI Controller can thiệp:')
@@ -305,6 +270,11 @@ def run_test():
             net.get(f'dorm{i}').cmd('kill %iperf 2>/dev/null; pkill iperf 2>/dev/null')
         qos.force_restore()
         note('Đã dừng flood + gỡ rate-limit.')
+        print(qos.policer.format_events(), flush=True)
+        qos.stop()
+        note(qos.sampler.format_stats())
+        if qos.sampler.decisions:
+            print(qos.sampler.format_log(), flush=True)
         time.sleep(3)
 
         # Ping baseline cuối
@@ -363,9 +333,10 @@ def run_test():
         except Exception: pass
         try: srv_proc.terminate()
         except Exception: pass
-        net.stop()
-        note('Mạng đã dừng.')
-        subprocess.run(['sudo','mn','-c'], capture_output=True, timeout=30)
+        try: qos.stop()
+        except Exception: pass
+        # Dọn đúng tài nguyên của mô hình 4 (registry cauhinh4) thay cho net.stop() + mn -c toàn máy
+        note('Mạng đã dừng. ' + teardown.format_report(teardown.stop(net)).strip())
 
 
 if __name__ == '__main__':
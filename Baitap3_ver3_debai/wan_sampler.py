@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+BỘ LẤY MẪU TẢI WAN RIÊNG CHO VÒNG ĐIỀU KHIỂN QoS (THAY CHO r1.cmd('cat .../tx_bytes'))
+- Đọc bộ đếm byte thẳng từ /proc/<pid r1>/net/dev (bảng interface của namespace r1) trong một luồng riêng
+  → không dùng chung shell Mininet của r1 với lệnh test, không sinh tiến trình, không chặn 1 giây mỗi lần đo.
+- Nhịp lấy mẫu cố định (mặc định 0.2s, bám theo mốc thời gian tuyệt đối nên không trôi).
+- Làm mượt EWMA (alpha cấu hình được) + trễ (hysteresis): vượt ngưỡng cao liên tục HOLD_UP giây mới báo nghẽn,
+  dưới ngưỡng thấp liên tục HOLD_DOWN giây mới báo hết nghẽn → ngưỡng 90%/70% phản ứng theo tải thật chứ không theo nhiễu.
+- Trạng thái chỉ đổi khi hành động on_high / on_low thành công (không ném lỗi và không trả về False);
+  thất bại → giữ nguyên trạng thái, ghi lỗi và đếm lại hold timer từ đầu để thử lại.
+- Mọi quyết định được ghi kèm thời điểm; stats() trả về độ giật nhịp lấy mẫu, số lần chuyển trạng thái,
+  số lần "flap" (đảo trạng thái trong FLAP_WINDOW giây) và thời gian phản ứng (từ lúc tải thật vượt ngưỡng
+  tới lúc hành động xong).
+Dùng: s = WanSampler(r1, on_high=pol.apply, on_low=pol.remove).start(); ...; s.stop(); print(s.format_stats())
+"""
+import time
+import threading
+
+INTERVAL = 0.2       # Giây giữa hai mẫu
+ALPHA = 0.3          # Trọng số mẫu mới trong EWMA
+HIGH = 0.90          # Ngưỡng nghẽn (tỉ lệ dung lượng WAN)
+LOW = 0.70           # Ngưỡng hết nghẽn
+HOLD_UP = 1.0        # Giây EWMA phải ở trên HIGH trước khi báo nghẽn
+HOLD_DOWN = 3.0      # Giây EWMA phải ở dưới LOW trước khi gỡ
+FLAP_WINDOW = 10.0   # Đảo trạng thái trong khoảng này sau lần đổi trước = một lần flap
+MAX_SAMPLES = 3000   # Số mẫu giữ lại (≈ 10 phút ở 0.2s)
+
+def read_counter(pid, intf, field='tx'):
+    """Bộ đếm byte của `intf` trong namespace của tiến trình `pid` (đọc /proc/<pid>/net/dev); None nếu không có."""
+    col = 8 if field == 'tx' else 0
+    try:
+        with open(f'/proc/{pid}/net/dev') as f:
+            for line in f:
+                name, sep, rest = line.partition(':')
+                if sep and name.strip() == intf:
+                    return int(rest.split()[col])
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+class WanSampler:
+    """Luồng lấy mẫu tải một interface của node Mininet, làm mượt EWMA và ra quyết định có trễ."""
+    def __init__(self, node, intf='r1-eth4', capacity_mbps=200, field='tx', interval=INTERVAL, alpha=ALPHA,
+                 high=HIGH, low=LOW, hold_up=HOLD_UP, hold_down=HOLD_DOWN, on_high=None, on_low=None,
+                 on_sample=None, flap_window=FLAP_WINDOW):
+        self.pid = node.pid
+        self.intf = intf
+        self.field = field
+        self.capacity = capacity_mbps
+        self.interval = interval
+        self.alpha = alpha
+        self.high_mbps = high * capacity_mbps
+        self.low_mbps = low * capacity_mbps
+        self.hold_up = hold_up
+        self.hold_down = hold_down
+        self.on_high = on_high
+        self.on_low = on_low
+        self.on_sample = on_sample   # gọi sau MỖI mẫu với (sampler) – dùng cho điều chỉnh liên tục (VD: tốc độ meter)
+        self.flap_window = flap_window
+
+        self.samples = []        # [(t_monotonic, raw_mbps, ewma_mbps)]
+        self.decisions = []      # [dict] mỗi lần đổi trạng thái
+        self.congested = False
+        self.raw = 0.0
+        self.ewma = None
+        self._onset = None       # lúc mẫu thô bắt đầu vượt ngưỡng (của lần chuyển trạng thái sắp tới)
+        self._since = None       # lúc EWMA bắt đầu vượt ngưỡng liên tục
+        self._running = False
+        self._thread = None
+
+    # ----- Luồng lấy mẫu -----
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2 * self.interval + 1)
+        return self
+
+    def _loop(self):
+        prev = read_counter(self.pid, self.intf, self.field)
+        prev_t = time.monotonic()
+        next_t = prev_t + self.interval
+        while self._running:
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_t += self.interval
+            now = time.monotonic()
+            if next_t < now:            # trễ quá một nhịp (máy bận) → bắt lại nhịp, không dồn mẫu
+                next_t = now + self.interval
+            cur = read_counter(self.pid, self.intf, self.field)
+            if cur is None or prev is None:
+                prev, prev_t = cur, now
+                continue
+            raw = max(0, cur - prev) * 8 / (now - prev_t) / 1_000_000
+            prev, prev_t = cur, now
+            self._update(now, raw)
+            if self.on_sample:
+                try:
+                    self.on_sample(self)
+                except Exception as e:
+                    self.decisions.append({'t': time.time(), 'event': 'error', 'error': str(e)})
+
+    # ----- Làm mượt + quyết định -----
+    def _update(self, now, raw):
+        self.raw = raw
+        self.ewma = raw if self.ewma is None else self.alpha * raw + (1 - self.alpha) * self.ewma
+        self.samples.append((now, raw, self.ewma))
+        if len(self.samples) > MAX_SAMPLES:
+            del self.samples[:len(self.samples) - MAX_SAMPLES]
+
+        # Mẫu thô: mốc "tải thật bắt đầu đổi" để tính thời gian phản ứng
+        crossing = raw >= self.high_mbps if not self.congested else raw < self.low_mbps
+        if crossing and self._onset is None:
+            self._onset = now
+        elif not crossing:
+            self._onset = None
+
+        # EWMA + hold timer: chỉ đổi trạng thái khi EWMA vượt ngưỡng liên tục đủ lâu
+        beyond = self.ewma >= self.high_mbps if not self.congested else self.ewma < self.low_mbps
+        if not beyond:
+            self._since = None
+            return
+        if self._since is None:
+            self._since = now
+        if now - self._since >= (self.hold_down if self.congested else self.hold_up):
+            self._transition(now)
+
+    def _transition(self, now):
+        target = not self.congested
+        action = self.on_high if target else self.on_low
+        onset = self._onset if self._onset is not None else self._since
+        t_act = time.monotonic()
+        if action:
+            try:
+                failed = action() is False and 'hành động không có hiệu lực'
+            except Exception as e:
+                failed = str(e)
+            if failed:
+                # Giữ trạng thái cũ (khớp với bộ giới hạn thật), chờ thêm một hold nữa rồi thử lại
+                self.decisions.append({'t': time.time(), 'event': 'error',
+                                       'error': f"{'congested' if target else 'relieved'}: {failed}"})
+                self._since = now
+                return
+        self.congested = target
+        t_done = time.monotonic()
+        prev = next((d for d in reversed(self.decisions) if 'rel' in d), None)
+        flap = bool(prev and now - prev['rel'] <= self.flap_window)
+        self.decisions.append({
+            't': time.time(), 'rel': now, 'event': 'congested' if self.congested else 'relieved',
+            'raw': round(self.raw, 1), 'ewma': round(self.ewma, 1),
+            'detect_ms': round((now - onset) * 1000, 1), 'act_ms': round((t_done - t_act) * 1000, 1),
+            'reaction_ms': round((now - onset + t_done - t_act) * 1000, 1), 'flap': flap})
+        self._onset = self._since = None
+
+    # ----- Đọc kết quả -----
+    def window_mbps(self, seconds=1.0):
+        """Trung bình tải thô trong `seconds` giây gần nhất (không chặn)."""
+        cutoff = time.monotonic() - seconds
+        recent = [raw for t, raw, _ in self.samples[-int(seconds / self.interval) - 2:] if t >= cutoff]
+        return sum(recent) / len(recent) if recent else self.raw
+
+    def pct(self, mbps=None):
+        v = self.ewma if mbps is None else mbps
+        return (v or 0.0) / self.capacity * 100
+
+    def stats(self):
+        ts = [t for t, _, _ in self.samples]
+        gaps = [(b - a) * 1000 for a, b in zip(ts, ts[1:])]
+        mean = sum(gaps) / len(gaps) if gaps else 0.0
+        jitter = (sum((g - mean) ** 2 for g in gaps) / len(gaps)) ** 0.5 if gaps else 0.0
+        moves = [d for d in self.decisions if 'reaction_ms' in d]
+        react = lambda ev: [d['reaction_ms'] for d in moves if d['event'] == ev]
+        avg = lambda v: round(sum(v) / len(v), 1) if v else None
+        return {'samples': len(self.samples), 'interval_ms': round(mean, 2), 'jitter_ms': round(jitter, 2),
+                'max_gap_ms': round(max(gaps), 2) if gaps else 0.0,
+                'transitions': len(moves), 'flaps': sum(1 for d in moves if d['flap']),
+                'react_congested_ms': avg(react('congested')), 'react_relieved_ms': avg(react('relieved')),
+                'errors': sum(1 for d in self.decisions if d['event'] == 'error')}
+
+    def format_log(self):
+        lines = [f"{'Thời điểm':<14}{'Sự kiện':<11}{'Thô':>8}{'EWMA':>8}{'Phát hiện':>11}{'Hành động':>11}{'Phản ứng':>10}"]
+        for d in self.decisions:
+            stamp = time.strftime('%H:%M:%S', time.localtime(d['t'])) + f".{int(d['t'] * 1000) % 1000:03d}"
+            if d['event'] == 'error':
+                lines.append(f"{stamp:<14}{'error':<11}{d['error']}")
+                continue
+            lines.append(f"{stamp:<14}{d['event']:<11}{d['raw']:>8.1f}{d['ewma']:>8.1f}"
+                         f"{d['detect_ms']:>9.0f}ms{d['act_ms']:>9.1f}ms{d['reaction_ms']:>8.0f}ms"
+                         + ('  (flap)' if d['flap'] else ''))
+        return "\n".join(lines)
+
+    def format_stats(self):
+        s = self.stats()
+        fmt = lambda v: '-' if v is None else f'{v:.0f} ms'
+        return (f"Sampler {self.intf}: {s['samples']} mẫu, nhịp {s['interval_ms']:.1f} ms "
+                f"(giật {s['jitter_ms']:.2f} ms, hở lớn nhất {s['max_gap_ms']:.1f} ms) | "
+                f"{s['transitions']} lần đổi trạng thái, {s['flaps']} flap | "
+                f"phản ứng nghẽn {fmt(s['react_congested_ms'])}, hết nghẽn {fmt(s['react_relieved_ms'])}")
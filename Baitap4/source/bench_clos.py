@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# source/bench_clos.py
+"""
+BENCHMARK MỞ RỘNG QUY MÔ FABRIC CLOS (clos.py)
+- Với mỗi kích thước Spine x Leaf x Host: dựng mạng, chờ OSPFv3 hội tụ, cấy overlay VXLAN, rồi dỡ bỏ.
+- Ghi lại: thời gian dựng từng giai đoạn, thời gian hội tụ (router chậm nhất), bộ nhớ hệ thống tiêu tốn
+  (MemAvailable trước/sau) và RSS của zebra + ospf6d, số adjacency / FDB entry để đối chiếu, thời gian teardown.
+- Kết quả in bảng + ghi CSV (và JSON nếu cần) vào thư mục log.
+Chạy: sudo python3 bench_clos.py --sizes 2x3x2,4x8x2,4x16x2 [--timeout 120] [--csv out.csv] [--json out.json]
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+
+from mininet.log import setLogLevel
+
+import clos
+import frr
+import teardown
+
+DEFAULT_SIZES = "2x3x2,4x8x2,4x16x2"
+
+def mem_available_mb():
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('MemAvailable:'):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+def frr_rss_mb(routers):
+    """Tổng RSS (MB) của các daemon FRR đọc theo file pid trong /tmp/<router>."""
+    total_kb = 0
+    for r in routers:
+        for daemon in frr.DAEMONS:
+            try:
+                pid = open(f"{frr.conf_dir(r)}/{daemon}.pid").read().strip()
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total_kb += int(line.split()[1])
+                            break
+            except (OSError, ValueError):
+                pass
+    return total_kb / 1024.0
+
+def parse_sizes(text):
+    sizes = []
+    for part in text.split(','):
+        s, l, h = (int(x) for x in part.lower().split('x'))
+        sizes.append((s, l, h))
+    return sizes
+
+def run_size(spines, leaves, hosts, timeout):
+    fabric = clos.ClosFabric(spines, leaves, hosts)
+    mem0 = mem_available_mb()
+    net = None
+    try:
+        net, t = clos.build(fabric, timeout=timeout)
+        slowest = max(((r, res['converged_s'] or timeout) for r, res in t['report']['routers'].items()),
+                      key=lambda x: x[1])
+        row = {
+            'size': fabric.label, 'spines': spines, 'leaves': leaves, 'hosts_per_leaf': hosts,
+            'nodes': len(fabric.routers) + leaves * hosts,
+            'adjacencies': spines * leaves,
+            'fdb_entries': leaves * (leaves - 1),
+            'start_s': round(t['start'], 2), 'underlay_s': round(t['underlay'], 2),
+            'frr_s': round(t['frr'], 2), 'convergence_s': t['convergence'],
+            'overlay_s': round(t['overlay'], 2), 'build_total_s': round(t['total'], 2),
+            'converged': t['converged'], 'slowest_router': slowest[0],
+            'mem_used_mb': round(mem0 - mem_available_mb(), 1),
+            'frr_rss_mb': round(frr_rss_mb(fabric.routers), 1),
+        }
+    finally:
+        rep = teardown.stop(net) if net else None
+    row['teardown_s'] = rep['elapsed']
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo thời gian dựng / hội tụ / bộ nhớ theo kích thước fabric Clos")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Danh sách SpinexLeafxHost, cách nhau dấu phẩy")
+    parser.add_argument('--timeout', type=float, default=120, help="Thời gian chờ hội tụ tối đa mỗi kích thước (s)")
+    parser.add_argument('--csv', default=os.path.join(os.getcwd(), "logs", "bench_clos.csv"))
+    parser.add_argument('--json', default=None)
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        print('Hãy chạy bằng quyền ROOT (sudo python3 bench_clos.py)')
+        return 1
+    setLogLevel('warning')
+    teardown.cleanup_stale(clos.TEARDOWN_TAG)
+
+    rows = []
+    for spines, leaves, hosts in parse_sizes(args.sizes):
+        print(f"*** Đang đo fabric {spines}x{leaves}x{hosts} ...", flush=True)
+        rows.append(run_size(spines, leaves, hosts, args.timeout))
+        time.sleep(1)
+
+    cols = ['size', 'nodes', 'build_total_s', 'frr_s', 'convergence_s', 'teardown_s', 'mem_used_mb', 'frr_rss_mb',
+            'converged']
+    print("".join(f"{c:>15}" for c in cols))
+    for row in rows:
+        print("".join(f"{str(row[c]):>15}" for c in cols))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.csv)), exist_ok=True)
+    with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else cols)
+        w.writeheader()
+        w.writerows(rows)
+    print(f"-> Đã lưu {args.csv}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0 if all(r['converged'] for r in rows) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# source/bench_import.py
+"""
+ĐO THỜI GIAN KHỞI ĐỘNG (IMPORT) - CHỐNG HỒI QUY
+- Mỗi module được import trong một tiến trình Python sạch (cold start), lặp vài lần lấy giá trị nhỏ nhất.
+- Kiểm tra import xong KHÔNG được kéo theo thư viện nặng (matplotlib / numpy / networkx):
+  các thư viện này chỉ được nạp khi thật sự vẽ biểu đồ hoặc đo.
+- Thoát với mã 1 nếu vượt ngân sách thời gian, lỡ nạp thư viện nặng hoặc import lỗi -> dùng được trong CI / cron.
+  Chỉ bỏ qua module khi máy thiếu mininet (ModuleNotFoundError của chính gói mininet); SyntaxError
+  hay lỗi import trong module của repo đều tính là lỗi.
+Chạy: python3 bench_import.py [--budget-ms 300] [--repeat 5]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BAITAP3 = os.path.normpath(os.path.join(HERE, '..', '..', 'Baitap3_ver3_debai'))
+
+HEAVY = ['matplotlib', 'numpy', 'networkx']
+OPTIONAL = 'mininet'   # Thiếu gói này (máy CI) → bỏ qua module, không tính là lỗi
+
+# (thư mục chứa module, tên module)
+TARGETS = [
+    (HERE, 'tool'),
+    (HERE, 'cli'),
+    (HERE, 'draw_topology'),
+    (BAITAP3, 'cauhinh1'),
+    (BAITAP3, 'cauhinh2'),
+    (BAITAP3, 'cauhinh3'),
+    (BAITAP3, 'cauhinh4'),
+]
+
+PROBE = r'''
+import sys, time, json
+sys.path.insert(0, sys.argv[1])
+t0 = time.perf_counter()
+skip = False
+try:
+    __import__(sys.argv[2])
+    err = None
+except Exception as e:
+    err = f"{type(e).__name__}: {e}"
+    skip = type(e) is ModuleNotFoundError and (e.name or '').split('.')[0] == sys.argv[4]
+ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({'ms': ms, 'error': err, 'skip': skip,
+                  'heavy': [m for m in sys.argv[3].split(',') if m in sys.modules]}))
+'''
+
+def measure(path, module, repeat):
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', PROBE, path, module, ','.join(HEAVY), OPTIONAL],
+                             capture_output=True, text=True, cwd=path)
+        try:
+            res = json.loads(out.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            return {'ms': None, 'error': out.stderr.strip()[-200:], 'skip': False, 'heavy': []}
+        if res['error']:
+            return res
+        if best is None or res['ms'] < best['ms']:
+            best = res
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo thời gian import cold-start của các module")
+    parser.add_argument('--budget-ms', type=float, default=300.0, help="Ngân sách thời gian import mỗi module")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'Module':<16}{'Import (ms)':>12}  Ghi chú")
+    for path, module in TARGETS:
+        res = measure(path, module, args.repeat)
+        if res['skip']:
+            # VD: máy CI không có mininet -> bỏ qua module Mininet, không tính là lỗi
+            print(f"{module:<16}{'-':>12}  BỎ QUA ({res['error']})")
+            continue
+        if res['error']:
+            print(f"{module:<16}{'-':>12}  LỖI IMPORT ({res['error']})")
+            failed = True
+            continue
+        notes = []
+        if res['heavy']:
+            notes.append("NẠP THƯ VIỆN NẶNG: " + ", ".join(res['heavy']))
+            failed = True
+        if res['ms'] > args.budget_ms:
+            notes.append(f"VƯỢT NGÂN SÁCH {args.budget_ms:.0f} ms")
+            failed = True
+        print(f"{module:<16}{res['ms']:>12.1f}  {'; '.join(notes) or 'OK'}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
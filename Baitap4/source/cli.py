@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# source/cli.py
+"""
+CHẠY CÁC CASE ĐO LƯỜNG CỦA tool.py KHÔNG CẦN GIAO DIỆN (HEADLESS / CI / SSH / CRON)
+- Không cần Tk; matplotlib chỉ được nạp khi thực sự vẽ ảnh (tắt hẳn bằng --no-plots).
+- Xuất kết quả từng Case ra JSON (stdout hoặc file) và bảng tóm tắt CSV.
+Ví dụ:
+    sudo python3 cli.py --cases 3,5 --src web_server1 --dst db_server1 --no-plots --json out.json
+    sudo python3 cli.py --cases all --csv summary.csv
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+
+import tool
+
+def parse_cases(text):
+    if text == 'all':
+        return list(range(len(tool.CASE_NAMES)))
+    idx = sorted({int(c) - 1 for c in text.split(',') if c.strip()})
+    bad = [i + 1 for i in idx if not 0 <= i < len(tool.CASE_NAMES)]
+    if bad:
+        raise argparse.ArgumentTypeError(f"Case không hợp lệ: {bad} (chỉ có 1-{len(tool.CASE_NAMES)})")
+    return idx
+
+def main():
+    parser = argparse.ArgumentParser(description="Chạy các Case đo lường IPv6 Spine-Leaf ở chế độ dòng lệnh")
+    parser.add_argument('--cases', type=parse_cases, default='all', help="VD: 1,3,5 hoặc all (mặc định)")
+    parser.add_argument('--src', default='web_server1', choices=tool.NODE_LIST, help="Nguồn cho Case 5")
+    parser.add_argument('--dst', default='db_server1', choices=tool.NODE_LIST, help="Đích cho Case 5")
+    parser.add_argument('--no-plots', action='store_true', help="Không vẽ ảnh PNG (không nạp matplotlib)")
+    parser.add_argument('--serial', action='store_true', help="Chạy tuần tự, không song song các Case độc lập")
+    parser.add_argument('--json', default='-', help="File JSON kết quả ('-' = stdout)")
+    parser.add_argument('--csv', help="File CSV tóm tắt thời gian / trạng thái từng Case")
+    parser.add_argument('--log-dir', help="Thư mục lưu CSV/PNG (mặc định như tool.py)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Không in log tiến trình ra stderr")
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        print("LƯU Ý: Không chạy dưới quyền ROOT, sẽ dùng sudo bên trong hệ thống.", file=sys.stderr)
+    if args.log_dir:
+        tool.set_log_dir(args.log_dir)
+    tool.PLOTS_ENABLED = not args.no_plots
+    # Log tiến trình ra stderr để stdout chỉ chứa JSON
+    tool.CONSOLE_ECHO = not args.quiet
+    timings = tool.run_cases(args.cases, None, args.src, args.dst, parallel=not args.serial)
+
+    report = {'log_dir': tool.LOG_DIR, 'cases': timings}
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.json == '-':
+        print(text)
+    else:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(['Case', 'Start_Seconds', 'End_Seconds', 'Duration_Seconds', 'Status', 'CSV', 'PNG'])
+            for tm in timings:
+                res = tm['result'] or {}
+                w.writerow([tm['name'], tm['start'], tm['end'], tm['duration'], tm['status'],
+                            res.get('csv', ''), res.get('png', '')])
+
+    return 0 if all(tm['status'] == 'ok' for tm in timings) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
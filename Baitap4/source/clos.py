@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# source/clos.py
+"""
+BỘ SINH TOPOLOGY CLOS (SPINE-LEAF) THAM SỐ HOÁ - DÙNG CHO THỬ NGHIỆM MỞ RỘNG QUY MÔ
+- Nhận số Spine / Leaf / Host mỗi Leaf, tự cấp phát toàn bộ địa chỉ:
+    P2P Spine i <-> Leaf j : fc00:<i>:<j>::1/126 (Spine) - ::2/126 (Leaf)
+    Loopback               : fc00:1111::1:<i> (Spine), fc00:1111::2:<j> (Leaf)
+    VTEP (vxlan100)        : fc00:100::<j>/64, nguồn đóng gói = loopback của Leaf
+    Tenant                 : fd00:<j>::/64 trên br0 của Leaf (gateway ::254), host k = fd00:<j>::<k>
+- Sinh plan OSPF6 (cùng định dạng convergence.OSPF_PLAN), kỳ vọng hội tụ cho convergence.wait_converged,
+  cấu hình ipbatch cho underlay và overlay (FDB mesh VXLAN + route tĩnh metric 10 như topology.py).
+- Chỉ dựng lõi 2 tầng Spine-Leaf (không có Core S7 / Border R1 / NAT64) để đo ECMP, OSPF, VXLAN theo kích thước.
+Dùng: fabric = ClosFabric(4, 16, 2); net, timings = build(fabric)
+"""
+import time
+
+from mininet.topo import Topo
+from mininet.net import Mininet
+from mininet.log import info
+
+import frr
+import ipbatch
+import teardown
+import convergence
+import topology
+
+VNI = 100
+TEARDOWN_TAG = 'clos'
+
+class ClosFabric:
+    """Mô tả một fabric Spine-Leaf: tên node, tên cổng, địa chỉ và plan OSPF."""
+    def __init__(self, spines=2, leaves=3, hosts_per_leaf=2):
+        # Leaf không có host thì không quảng bá prefix tenant → OSPF không bao giờ đủ route để hội tụ
+        if spines < 1 or leaves < 2 or hosts_per_leaf < 1:
+            raise ValueError("Cần ít nhất 1 Spine, 2 Leaf và 1 host mỗi Leaf")
+        self.n_spines = spines
+        self.n_leaves = leaves
+        self.n_hosts = hosts_per_leaf
+        self.spines = [f"sp{i}" for i in range(1, spines + 1)]
+        self.leaves = [f"lf{j}" for j in range(1, leaves + 1)]
+        self.hosts = {lf: [f"h{j}x{k}" for k in range(1, hosts_per_leaf + 1)]
+                      for j, lf in enumerate(self.leaves, 1)}
+
+    @property
+    def label(self):
+        return f"{self.n_spines}x{self.n_leaves}x{self.n_hosts}"
+
+    @property
+    def routers(self):
+        return self.spines + self.leaves
+
+    # ----- Cổng & địa chỉ -----
+    def links(self):
+        """[(spine, cổng spine, IP spine, leaf, cổng leaf, IP leaf)] cho mọi cặp Spine-Leaf."""
+        out = []
+        for i, sp in enumerate(self.spines, 1):
+            for j, lf in enumerate(self.leaves, 1):
+                out.append((sp, f"{sp}-eth{j - 1}", f"fc00:{i:x}:{j:x}::1/126",
+                            lf, f"{lf}-eth{i - 1}", f"fc00:{i:x}:{j:x}::2/126"))
+        return out
+
+    def host_ports(self, leaf):
+        """[(host, cổng leaf, cổng host, IP host)] của một Leaf; cổng leaf đánh số sau các cổng uplink."""
+        j = self.leaves.index(leaf) + 1
+        return [(h, f"{leaf}-eth{self.n_spines + k - 1}", f"{h}-eth0", f"fd00:{j:x}::{k:x}/64")
+                for k, h in enumerate(self.hosts[leaf], 1)]
+
+    def loopback(self, router):
+        if router in self.spines:
+            return f"fc00:1111::1:{self.spines.index(router) + 1:x}/128"
+        return f"fc00:1111::2:{self.leaves.index(router) + 1:x}/128"
+
+    def tenant(self, leaf):
+        return f"fd00:{self.leaves.index(leaf) + 1:x}::/64"
+
+    def gateway(self, leaf):
+        return f"fd00:{self.leaves.index(leaf) + 1:x}::254"
+
+    def vtep(self, leaf):
+        return f"fc00:100::{self.leaves.index(leaf) + 1:x}"
+
+    # ----- OSPF -----
+    def ospf_plan(self):
+        plan = {}
+        for i, sp in enumerate(self.spines, 1):
+            plan[sp] = (f"10.0.0.{i}", [f"{sp}-eth{j}" for j in range(self.n_leaves)] + ['lo'], "")
+        for j, lf in enumerate(self.leaves, 1):
+            rid = f"10.1.{j // 256}.{j % 256}"
+            plan[lf] = (rid, [f"{lf}-eth{i}" for i in range(self.n_spines)] + ['br0', 'lo'], "")
+        return plan
+
+    def specs(self):
+        return convergence.specs_for(self.ospf_plan(), {r: self.loopback(r) for r in self.routers},
+                                     {lf: self.tenant(lf) for lf in self.leaves})
+
+    # ----- Cấu hình ipbatch -----
+    def underlay(self):
+        cfg = {r: ipbatch.NodeConfig(r) for r in self.routers}
+        for hs in self.hosts.values():
+            cfg.update({h: ipbatch.NodeConfig(h) for h in hs})
+        for r in self.routers:
+            cfg[r].addr('lo', self.loopback(r))
+        for sp, sp_if, sp_ip, lf, lf_if, lf_ip in self.links():
+            cfg[sp].addr(sp_if, sp_ip)
+            cfg[lf].addr(lf_if, lf_ip)
+        for lf in self.leaves:
+            ports = self.host_ports(lf)
+            gw = self.gateway(lf)
+            for h, lf_if, h_if, h_ip in ports:
+                cfg[h].addr(h_if, h_ip).route('::/0', via=gw)
+                cfg[lf].flush(lf_if)
+            cfg[lf].bridge('br0', ports=[p[1] for p in ports], addrs=[f"{gw}/64"])
+        return cfg
+
+    def overlay(self):
+        """VTEP + FDB mesh (mỗi Leaf có L-1 đích flood) + route tĩnh tới tenant khác qua vxlan (metric 10)."""
+        cfg = {lf: ipbatch.NodeConfig(lf) for lf in self.leaves}
+        for lf in self.leaves:
+            local = self.loopback(lf).split('/')[0]
+            cfg[lf].link_add(f'vxlan{VNI}', 'vxlan', f'id {VNI} dstport 4789 local {local}')
+            cfg[lf].up(f'vxlan{VNI}').addr(f'vxlan{VNI}', f"{self.vtep(lf)}/64")
+            for peer in self.leaves:
+                if peer == lf:
+                    continue
+                cfg[lf].fdb('00:00:00:00:00:00', f'vxlan{VNI}', self.loopback(peer).split('/')[0])
+                cfg[lf].route(self.tenant(peer), via=self.vtep(peer), dev=f'vxlan{VNI}', metric=10)
+        return cfg
+
+class ClosTopo(Topo):
+    """Topo Mininet sinh từ ClosFabric (router dùng topology.FRRouter với plan OSPF riêng)."""
+    def build(self, fabric):
+        plan = fabric.ospf_plan()
+        for r in fabric.routers:
+            self.addHost(r, cls=topology.FRRouter, ip=None, ospf_plan=plan)
+        for sp, sp_if, _, lf, lf_if, _ in fabric.links():
+            self.addLink(sp, lf, intfName1=sp_if, intfName2=lf_if)
+        for lf in fabric.leaves:
+            for h, lf_if, h_if, _ in fabric.host_ports(lf):
+                self.addHost(h, ip=None)
+                self.addLink(lf, h, intfName1=lf_if, intfName2=h_if)
+
+def build(fabric, timeout=convergence.DEFAULT_TIMEOUT):
+    """
+    Dựng fabric và chờ hội tụ, trả về (net, timings) với timings (giây):
+    {'start', 'underlay', 'frr', 'convergence', 'overlay', 'total', 'converged', 'report'}.
+    Người gọi chịu trách nhiệm dọn mạng bằng teardown.stop(net) (registry đã ghi sẵn trong net.teardown).
+    Lỗi giữa chừng → tự dọn phần đã dựng rồi ném lại lỗi (người gọi không nhận được net để dọn).
+    """
+    timings = {}
+    t0 = time.time()
+    net = Mininet(topo=ClosTopo(fabric), controller=None)
+    try:
+        net.start()
+        teardown.Registry(TEARDOWN_TAG).track_net(net).add_files(*[frr.conf_dir(r) for r in fabric.routers]).save()
+        _configure(net, fabric, timeout, timings, t0)
+    except BaseException:
+        teardown.stop(net)
+        raise
+    return net, timings
+
+def _configure(net, fabric, timeout, timings, t0):
+    """Underlay → FRR → chờ hội tụ → overlay; ghi thời gian từng bước vào timings."""
+    timings['start'] = time.time() - t0
+
+    t = time.time()
+    topology.apply_batches(net, fabric.underlay().values())
+    timings['underlay'] = time.time() - t
+
+    t = time.time()
+    topology.start_frr(net, fabric.routers)
+    timings['frr'] = time.time() - t
+
+    info(f'*** [{fabric.label}] Chờ OSPFv3 hội tụ trên {len(fabric.routers)} router...\n')
+    report = convergence.wait_converged(fabric.specs(), exec_fn=lambda name, cmd: net[name].cmd(cmd),
+                                        timeout=timeout)
+    timings['convergence'] = report['elapsed']
+    timings['converged'] = report['converged']
+    timings['report'] = report
+
+    t = time.time()
+    topology.apply_batches(net, fabric.overlay().values())
+    timings['overlay'] = time.time() - t
+    timings['total'] = time.time() - t0
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# source/convergence.py
+"""
+THEO DÕI HỘI TỤ OSPFv3 THEO SỰ KIỆN (THAY CHO time.sleep CỐ ĐỊNH)
+- Mỗi router được hỏi song song (một luồng / router): trạng thái neighbor qua VTY của ospf6d
+  (TCP 127.0.0.1:2606 bên trong namespace) + bảng định tuyến IPv6 của kernel.
+- Router được coi là hội tụ khi đủ số adjacency ở trạng thái Full VÀ mọi prefix mong đợi đã nằm trong kernel.
+- Trả về ngay khi tất cả router hội tụ (hoặc hết timeout), kèm thời gian chi tiết của từng router.
+- OSPF_PLAN là nguồn dữ liệu chung: topology.py dùng để cấu hình, bộ theo dõi dùng để suy ra kỳ vọng.
+"""
+import re
+import time
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+
+import netns_exec
+
+POLL_INTERVAL = 0.2
+DEFAULT_TIMEOUT = 60
+
+# router -> (router-id, danh sách interface chạy OSPF, cấu hình thêm trong "router ospf6")
+OSPF_PLAN = {
+    's7': ('7.7.7.7', ['s7-eth0', 's7-eth1', 's7-eth2', 'lo'], ""),
+    's1': ('1.1.1.1', ['s1-eth0', 's1-eth1', 's1-eth2', 's1-eth3', 'lo'], ""),
+    's2': ('2.2.2.2', ['s2-eth0', 's2-eth1', 's2-eth2', 's2-eth3', 'lo'], ""),
+    's3': ('3.3.3.3', ['s3-eth0', 's3-eth1', 'br0', 'lo'], ""),
+    's4': ('4.4.4.4', ['s4-eth0', 's4-eth1', 'br0', 'lo'], ""),
+    's5': ('5.5.5.5', ['s5-eth0', 's5-eth1', 'br0', 'lo'], ""),
+    'r1': ('100.100.100.100', ['r1-eth0', 'lo'],
+           "redistribute static\nredistribute kernel\ndefault-information originate always"),
+}
+
+# Prefix do từng router quảng bá vào OSPF (ngoài loopback): dải Tenant trên br0 của các Leaf
+TENANT_PREFIXES = {'s3': 'fd00:10::/64', 's4': 'fd00:20::/64', 's5': 'fd00:30::/64'}
+# Router phát tuyến mặc định (default-information originate)
+DEFAULT_ORIGINATOR = 'r1'
+
+_VTY_CMD = "printf 'show ipv6 ospf6 neighbor\\nexit\\n' | nc -w 1 127.0.0.1 2606"
+_SEP = "__OSPF6_ROUTES__"
+_FULL_RE = re.compile(r'\bFull/')
+
+def loopback(router):
+    """Địa chỉ loopback /128 giống cách topology.py gán (s1 -> ::1, r1 -> ::91)."""
+    return "fc00:1111::%s/128" % (router.replace('s', '').replace('r', '9'))
+
+def _norm(prefix):
+    if prefix == 'default':
+        return '::/0'
+    try:
+        return str(ipaddress.ip_network(prefix, strict=False))
+    except ValueError:
+        return prefix
+
+def specs_for(plan, loopbacks, tenants=None, originator=None, routers=None):
+    """
+    Suy ra kỳ vọng hội tụ từ một plan OSPF bất kỳ (dùng chung cho topology cố định và clos.py):
+    {router: {'neighbors': số adjacency Full, 'prefixes': [prefix phải có trong kernel]}}
+    loopbacks: {router: prefix loopback}; tenants: {router: prefix quảng bá}; originator: router phát ::/0.
+    """
+    tenants = tenants or {}
+    specs = {}
+    for r in (routers or plan):
+        _, infts, _ = plan[r]
+        prefixes = [lo for o, lo in loopbacks.items() if o != r]
+        prefixes += [p for leaf, p in tenants.items() if leaf != r]
+        if originator and r != originator:
+            prefixes.append('::/0')
+        specs[r] = {'neighbors': sum(1 for i in infts if i not in ('lo', 'br0')),
+                    'prefixes': [_norm(p) for p in prefixes]}
+    return specs
+
+def default_specs(routers=None):
+    """Kỳ vọng hội tụ của topology Spine-Leaf cố định (OSPF_PLAN)."""
+    return specs_for(OSPF_PLAN, {r: loopback(r) for r in OSPF_PLAN}, TENANT_PREFIXES,
+                     DEFAULT_ORIGINATOR, routers)
+
+def poll_router(router, exec_fn=None):
+    """Một lượt hỏi: trả về (số neighbor Full, tập prefix IPv6 đang có trong kernel)."""
+    exec_fn = exec_fn or netns_exec.run
+    out = exec_fn(router, f"{_VTY_CMD} 2>/dev/null; echo {_SEP}; ip -6 route show 2>/dev/null") or ""
+    vty, _, routes = out.partition(_SEP)
+    full = len(_FULL_RE.findall(vty))
+    installed = set()
+    for line in routes.splitlines():
+        # Dòng nexthop của route ECMP bắt đầu bằng khoảng trắng -> bỏ qua
+        if line and not line[0].isspace():
+            installed.add(_norm(line.split()[0]))
+    return full, installed
+
+def _watch(router, spec, exec_fn, t0, deadline, interval):
+    res = {'adjacency_s': None, 'routes_s': None, 'converged_s': None,
+           'full': 0, 'missing': list(spec['prefixes']), 'polls': 0}
+    while True:
+        full, installed = poll_router(router, exec_fn)
+        now = time.monotonic() - t0
+        res['polls'] += 1
+        res['full'] = full
+        res['missing'] = [p for p in spec['prefixes'] if p not in installed]
+        adj_ok = full >= spec['neighbors']
+        routes_ok = not res['missing']
+        if adj_ok and res['adjacency_s'] is None:
+            res['adjacency_s'] = round(now, 2)
+        if routes_ok and res['routes_s'] is None:
+            res['routes_s'] = round(now, 2)
+        if adj_ok and routes_ok:
+            res['converged_s'] = round(now, 2)
+            return res
+        if time.monotonic() >= deadline:
+            return res
+        time.sleep(interval)
+
+def wait_converged(specs=None, exec_fn=None, timeout=DEFAULT_TIMEOUT, interval=POLL_INTERVAL, on_ready=None):
+    """
+    Chờ tới khi mọi router trong `specs` hội tụ (mặc định: toàn bộ OSPF_PLAN).
+    exec_fn(router, cmd) -> stdout; mặc định dùng netns_exec.run, topology.py truyền net[router].cmd.
+    on_ready(router, info) được gọi (từ luồng theo dõi) ngay khi từng router hội tụ.
+    Trả về {'converged': bool, 'elapsed': s, 'routers': {router: {'adjacency_s', 'routes_s',
+    'converged_s', 'full', 'missing', 'polls'}}}; các mốc thời gian tính từ lúc gọi hàm.
+    """
+    specs = specs or default_specs()
+    t0 = time.monotonic()
+    deadline = t0 + timeout
+
+    def job(router):
+        res = _watch(router, specs[router], exec_fn, t0, deadline, interval)
+        if on_ready and res['converged_s'] is not None:
+            on_ready(router, res)
+        return router, res
+
+    with ThreadPoolExecutor(max_workers=len(specs)) as pool:
+        routers = dict(pool.map(job, specs))
+    return {'converged': all(r['converged_s'] is not None for r in routers.values()),
+            'elapsed': round(time.monotonic() - t0, 2), 'routers': routers}
+
+def format_report(report):
+    """Bảng tóm tắt thời gian hội tụ theo router (dùng cho log Mininet / GUI)."""
+    lines = [f"{'Router':<8}{'Full':>6}{'Adj (s)':>10}{'Route (s)':>11}{'Xong (s)':>10}  Thiếu prefix"]
+    fmt = lambda v: '-' if v is None else f"{v:.2f}"
+    for r, res in report['routers'].items():
+        lines.append(f"{r:<8}{res['full']:>6}{fmt(res['adjacency_s']):>10}{fmt(res['routes_s']):>11}"
+                     f"{fmt(res['converged_s']):>10}  {', '.join(res['missing']) or '-'}")
+    state = "HỘI TỤ" if report['converged'] else "CHƯA HỘI TỤ (hết thời gian chờ)"
+    lines.append(f"=> {state} sau {report['elapsed']:.2f}s")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# source/counters.py
+"""
+BỘ LẤY MẪU BỘ ĐẾM INTERFACE (BULK COUNTER SAMPLER)
+- Đọc TOÀN BỘ rx/tx bytes của một namespace trong MỘT lần đọc /proc/net/dev.
+- Ưu tiên đọc thẳng /proc/<pid>/net/dev từ tiến trình hiện tại (pid lấy từ symlink
+  /var/run/netns/<node> do topology.py tạo) -> không có subprocess nào cả.
+- Nếu không xác định được pid thì dùng worker thường trực của netns_exec (`cat /proc/net/dev`).
+- snapshot() chụp nhiều node gần như cùng một thời điểm và gắn mốc thời gian,
+  nên phép tính Mbps giữa hai snapshot chính xác cả ở chu kỳ dưới 1 giây.
+"""
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import netns_exec
+
+NETNS_DIR = "/var/run/netns"
+
+def parse_proc_net_dev(text):
+    """Chuyển nội dung /proc/net/dev thành {intf: (rx_bytes, tx_bytes)}."""
+    res = {}
+    for line in text.splitlines()[2:]:
+        if ':' not in line:
+            continue
+        name, data = line.split(':', 1)
+        fields = data.split()
+        if len(fields) < 9:
+            continue
+        res[name.strip()] = (int(fields[0]), int(fields[8]))
+    return res
+
+def _netns_pid(node):
+    try:
+        m = re.match(r'/proc/(\d+)/ns/net$', os.readlink(os.path.join(NETNS_DIR, node)))
+        return m.group(1) if m else None
+    except OSError:
+        return None
+
+def read_counters(node):
+    """Đọc bộ đếm của mọi interface trong namespace `node` (một lần đọc duy nhất)."""
+    pid = _netns_pid(node)
+    if pid:
+        try:
+            with open(f"/proc/{pid}/net/dev") as f:
+                return parse_proc_net_dev(f.read())
+        except OSError:
+            pass
+    try:
+        return parse_proc_net_dev(netns_exec.run(node, "cat /proc/net/dev"))
+    except Exception:
+        return {}
+
+def snapshot(nodes):
+    """
+    Chụp bộ đếm của nhiều node cùng lúc.
+    Trả về {'time': mốc monotonic (giữa khoảng đọc), 'wall': epoch, 'nodes': {node: {intf: (rx, tx)}}}
+    """
+    nodes = list(nodes)
+    t0 = time.monotonic()
+    if all(_netns_pid(n) for n in nodes):
+        data = {n: read_counters(n) for n in nodes}
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, len(nodes))) as ex:
+            data = dict(zip(nodes, ex.map(read_counters, nodes)))
+    t1 = time.monotonic()
+    return {'time': (t0 + t1) / 2, 'wall': time.time(), 'nodes': data}
+
+def total_bytes(snap, node, intfs, direction='tx'):
+    """Tổng rx hoặc tx bytes của danh sách interface trên một node trong snapshot."""
+    idx = 0 if direction == 'rx' else 1
+    counters = snap['nodes'].get(node, {})
+    return sum(counters.get(i, (0, 0))[idx] for i in intfs)
+
+def rate_mbps(snap1, snap2, node, intfs, direction='tx'):
+    """Tốc độ trung bình (Mbps) giữa 2 snapshot cho nhóm interface."""
+    dt = snap2['time'] - snap1['time']
+    if dt <= 0:
+        return 0.0
+    delta = total_bytes(snap2, node, intfs, direction) - total_bytes(snap1, node, intfs, direction)
+    return max(0.0, delta * 8 / dt / 1000000.0)
@@ -5,13 +5,14 @@ Chạy: python3 draw_topology.py
 Kết quả: Xuất file topology_v3.png
 """
 
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import networkx as nx
-
 def draw_topology(save_path='topology_v3.png'):
+    # Nạp thư viện vẽ ngay trong hàm: import module này không tốn thời gian nạp matplotlib/networkx
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+    import networkx as nx
+
     G = nx.Graph()
 
     # Định nghĩa các node và thuộc tính
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# source/frr.py
+"""
+SINH CẤU HÌNH VÀ KHỞI CHẠY FRR (ZEBRA + OSPF6D) CHO CÁC ROUTER
+- ospf6d.conf được render sẵn từ convergence.OSPF_PLAN (router-id, interface/area, redistribute)
+  TRƯỚC khi daemon chạy, không còn bơm lệnh `conf t` qua cổng VTY 2606 bằng nc.
+- Mỗi router dùng socket zserv riêng trong /tmp/<router> để các zebra khởi động đồng thời
+  không giành nhau socket mặc định /var/run/frr/zserv.api.
+- Lệnh khởi chạy kèm vòng kiểm tra sẵn sàng: file pid đã có VÀ cổng VTY (2601/2606) đã LISTEN.
+"""
+from convergence import OSPF_PLAN
+
+FRR_BIN = '/usr/lib/frr'
+ZEBRA_VTY_PORT = 2601
+OSPF6_VTY_PORT = 2606
+READY_TIMEOUT = 10
+DAEMONS = ['zebra', 'ospf6d']
+
+def conf_dir(name):
+    return f'/tmp/{name}'
+
+def render_base(name):
+    # Khung file config FRR cơ bản (Base Configuration)
+    return (
+        f"hostname {name}\n"
+        "log stdout\n"
+        "service advanced-vty\n"
+        "!\n"
+    )
+
+def _render_vty():
+    return "line vty\n no login\n!\n"   # Không cần pass khi truy cập console CLI của Router
+
+def render_zebra(name):
+    return render_base(name) + _render_vty()
+
+def render_ospf6d(name, plan=OSPF_PLAN):
+    rid, infts, extra = plan[name]
+    out = render_base(name)
+    for i in infts:
+        out += f"interface {i}\n ipv6 ospf6 area 0\n"
+        if i not in ('lo', 'br0'):
+            # Cổng vật lý Spine-Leaf chạy P2P (Triệt tiêu độ trễ bầu DR/BDR)
+            out += " ipv6 ospf6 network point-to-point\n"
+        out += "!\n"
+    out += f"router ospf6\n ospf6 router-id {rid}\n"
+    for line in extra.splitlines():
+        out += f" {line}\n"
+    out += "!\n"
+    return out + _render_vty()
+
+def write_configs(name, plan=OSPF_PLAN):
+    """Ghi zebra.conf + ospf6d.conf vào /tmp/<name> (thư mục phải có sẵn)."""
+    d = conf_dir(name)
+    with open(f'{d}/zebra.conf', 'w') as f: f.write(render_zebra(name))
+    with open(f'{d}/ospf6d.conf', 'w') as f: f.write(render_ospf6d(name, plan))
+
+def launch_cmd(name, daemons=DAEMONS):
+    """Lệnh shell chạy daemon ở chế độ nền (-d), dùng chung cho topology.py và tool.py (Case 1)."""
+    d = conf_dir(name)
+    parts = []
+    for daemon in daemons:
+        parts.append(f"{FRR_BIN}/{daemon} -d -u frr -g frr -A 127.0.0.1 -z {d}/zserv.api "
+                     f"-f {d}/{daemon}.conf -i {d}/{daemon}.pid >/dev/null 2>&1")
+    return "; ".join(parts)
+
+def ready_cmd(name, daemons=DAEMONS, timeout=READY_TIMEOUT):
+    """
+    Lệnh shell chờ pid + VTY sẵn sàng; mã thoát 0 nếu kịp, 1 nếu quá `timeout` giây.
+    Chạy trong subshell ( ... ) nên `exit` không đóng shell gọi nó (VD: worker của netns_exec).
+    """
+    d = conf_dir(name)
+    ports = {'zebra': ZEBRA_VTY_PORT, 'ospf6d': OSPF6_VTY_PORT}
+    checks = []
+    for daemon in daemons:
+        checks.append(f"[ -s {d}/{daemon}.pid ]")
+        checks.append(f"ss -ltn | grep -q ':{ports[daemon]} '")
+    tries = int(timeout / 0.05)
+    return (f"( i=0; while [ $i -lt {tries} ]; do {' && '.join(checks)} && exit 0; "
+            f"i=$((i+1)); sleep 0.05; done; exit 1 )")
+
+def start_cmd(name, timeout=READY_TIMEOUT):
+    return f"{launch_cmd(name)}; {ready_cmd(name, timeout=timeout)}"
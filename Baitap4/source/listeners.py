@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# source/listeners.py
+"""
+DỊCH VỤ LẮNG NGHE PORT GỌN NHẸ (THAY CHO BẦY `nc -l -k`)
+- Một tiến trình Python duy nhất cho mỗi namespace, mở một socket cho mỗi port,
+  dùng selectors để accept() rồi đóng ngay (đủ cho bắt tay TCP của bộ quét).
+- Báo sẵn sàng tường minh: in "READY <port:ok|busy> ..." ngay khi mọi socket đã bind/listen,
+  nên bộ quét bắt đầu ngay lập tức thay vì time.sleep(1) đoán mò.
+- Tiến trình tự thoát khi stdin bị đóng (tool.py thoát/crash cũng không để lại tiến trình mồ côi),
+  không cần `fuser -k` dọn dẹp.
+Chạy agent: ip netns exec <node> python3 listeners.py --ports 80,3306,53 --family 6
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import selectors
+import subprocess
+
+READY_TIMEOUT = 5.0
+
+def serve(ports, family):
+    af = socket.AF_INET if family == 4 else socket.AF_INET6
+    sel = selectors.DefaultSelector()
+    status = []
+    for port in ports:
+        s = socket.socket(af, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind(('', port))
+            s.listen(128)
+        except OSError:
+            # Port đã có tiến trình khác giữ -> vẫn coi là "đang mở" đối với bộ quét
+            s.close()
+            status.append(f"{port}:busy")
+            continue
+        s.setblocking(False)
+        sel.register(s, selectors.EVENT_READ)
+        status.append(f"{port}:ok")
+    sel.register(sys.stdin, selectors.EVENT_READ)
+    print("READY " + " ".join(status), flush=True)
+
+    while True:
+        for key, _ in sel.select():
+            if key.fileobj is sys.stdin:
+                if not os.read(sys.stdin.fileno(), 1024):
+                    return
+                continue
+            try:
+                conn, _ = key.fileobj.accept()
+                conn.close()
+            except OSError:
+                pass
+
+class ListenerService:
+    """Một agent listeners.py đang chạy bên trong namespace `node`."""
+    def __init__(self, node, ports, family=6):
+        self.node = node
+        self.ports = list(ports)
+        self.family = family
+        self.proc = None
+        self.status = ""
+
+    def start(self):
+        sudo_pfx = [] if os.geteuid() == 0 else ['sudo', '-n']
+        cmd = sudo_pfx + ['ip', 'netns', 'exec', self.node, sys.executable, os.path.abspath(__file__),
+                          '--ports', ','.join(str(p) for p in self.ports), '--family', str(self.family)]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, text=True)
+        return self
+
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        """Chờ dòng READY; trả về True nếu agent đã bind xong trước timeout."""
+        sel = selectors.DefaultSelector()
+        sel.register(self.proc.stdout, selectors.EVENT_READ)
+        ok = bool(sel.select(timeout))
+        sel.close()
+        if ok:
+            self.status = self.proc.stdout.readline().strip()
+        return self.status.startswith("READY")
+
+    def stop(self):
+        if not self.proc:
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=1)
+        except Exception:
+            self.proc.kill()
+        self.proc = None
+
+class ListenerGroup:
+    """
+    Khởi động listener cho nhiều namespace cùng lúc rồi chờ tất cả READY.
+    families: {node: 4 hoặc 6}
+    Dùng: with ListenerGroup({...}, [80, 3306, 53]) as g: ...quét...  (hoặc start()/stop())
+    """
+    def __init__(self, families, ports, timeout=READY_TIMEOUT):
+        self.services = [ListenerService(n, ports, fam) for n, fam in families.items()]
+        self.timeout = timeout
+        self.not_ready = []
+
+    def start(self):
+        for s in self.services:
+            s.start()
+        deadline = time.monotonic() + self.timeout
+        for s in self.services:
+            if not s.wait_ready(max(0.0, deadline - time.monotonic())):
+                self.not_ready.append(s.node)
+        return self
+
+    def stop(self):
+        for s in self.services:
+            s.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent lắng nghe nhiều port TCP trong một tiến trình")
+    parser.add_argument('--ports', default='80,3306,53')
+    parser.add_argument('--family', type=int, choices=[4, 6], default=6)
+    args = parser.parse_args()
+    try:
+        serve([int(p) for p in args.ports.split(',') if p], args.family)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
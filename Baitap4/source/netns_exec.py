@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# source/netns_exec.py
+"""
+BỘ THỰC THI LỆNH NETNS DÙNG CHUNG (POOLED EXECUTOR)
+- Mỗi namespace giữ sẵn một tiến trình bash sống lâu dài, vào namespace đúng MỘT lần
+  (`ip netns exec <node> bash`), sau đó nhận lệnh qua pipe stdin.
+- Kết quả đọc lại tới dấu phân cách (marker) riêng của từng worker.
+- Nhờ vậy mỗi lần đọc counter chỉ tốn một lượt ghi/đọc pipe thay vì fork + sudo + exec.
+- Khi nhiều luồng cùng gọi vào một namespace (Case 3 đa luồng), pool tự nở thêm worker
+  tới tối đa MAX_WORKERS_PER_NS để không bị tuần tự hoá.
+- Worker mới phải trả lời một lượt bắt tay trước khi nhận lệnh: không lên được → WorkerStartError
+  (lệnh CHƯA chạy, người gọi được phép chạy lại bằng cách khác). Worker chết / quá DEFAULT_TIMEOUT
+  giữa chừng → EOFError / TimeoutError (lệnh có thể đã chạy một phần, KHÔNG được chạy lại).
+"""
+import os
+import time
+import atexit
+import select
+import threading
+import subprocess
+import uuid
+
+MAX_WORKERS_PER_NS = 4
+DEFAULT_TIMEOUT = 60     # Giây tối đa cho một lệnh (đọc tới marker)
+START_TIMEOUT = 5        # Giây tối đa cho lượt bắt tay khi tạo worker
+
+class WorkerStartError(RuntimeError):
+    """Không tạo được worker trong namespace (namespace chưa có, sudo đòi mật khẩu...): lệnh chưa hề chạy."""
+
+class NetnsWorker:
+    """Một tiến trình bash nằm thường trực bên trong network namespace `node`."""
+    def __init__(self, node):
+        self.node = node
+        sudo_pfx = [] if os.geteuid() == 0 else ['sudo', '-n']
+        # Dùng bash (không phải sh) để các lệnh kiểu `killall sh` trong kịch bản đo không giết nhầm worker
+        try:
+            self.proc = subprocess.Popen(sudo_pfx + ['ip', 'netns', 'exec', node, 'bash', '--noprofile', '--norc'],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL, bufsize=0)
+        except OSError as e:
+            raise WorkerStartError(f"Không khởi động được worker netns '{node}': {e}") from e
+        self.marker = f"__NETNS_DONE_{uuid.uuid4().hex}__"
+        self._end = ("\n" + self.marker + "\n").encode()
+        try:
+            self.run(':', timeout=START_TIMEOUT)
+        except (OSError, EOFError) as e:
+            self.close()
+            raise WorkerStartError(f"Không khởi động được worker netns '{node}': {e}") from e
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def run(self, cmd, timeout=DEFAULT_TIMEOUT):
+        # Ngắt stdin của lệnh khỏi pipe điều khiển (nc -l, iperf... sẽ không "nuốt" lệnh tiếp theo)
+        script = f"{{ {cmd}\n}} </dev/null 2>/dev/null\nprintf '\\n%s\\n' '{self.marker}'\n"
+        os.write(self.proc.stdin.fileno(), script.encode())
+        buf = bytearray()
+        fd = self.proc.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        while not buf.endswith(self._end):
+            left = deadline - time.monotonic()
+            if left <= 0 or not select.select([fd], [], [], left)[0]:
+                # Lệnh treo: worker không còn dùng được (pool sẽ đóng nó), lệnh KHÔNG được chạy lại
+                self.proc.kill()
+                raise TimeoutError(f"Lệnh trong netns '{self.node}' quá {timeout}s: {cmd}")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise EOFError(f"Worker netns '{self.node}' đã thoát")
+            buf += chunk
+        return buf[:-len(self._end)].decode('utf-8', 'replace')
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.proc.wait(timeout=1)
+        except Exception:
+            self.proc.kill()
+
+class NetnsPool:
+    """Quản lý các worker theo từng namespace, cấp phát an toàn giữa nhiều luồng."""
+    def __init__(self, max_per_ns=MAX_WORKERS_PER_NS):
+        self.max_per_ns = max_per_ns
+        self._cond = threading.Condition()
+        self._idle = {}    # node -> [worker rảnh]
+        self._count = {}   # node -> tổng số worker đang sống
+
+    def _acquire(self, node):
+        with self._cond:
+            while True:
+                idle = self._idle.setdefault(node, [])
+                while idle:
+                    w = idle.pop()
+                    if w.alive():
+                        return w
+                    self._count[node] -= 1
+                if self._count.get(node, 0) < self.max_per_ns:
+                    self._count[node] = self._count.get(node, 0) + 1
+                    break
+                self._cond.wait()
+        try:
+            return NetnsWorker(node)
+        except Exception:
+            with self._cond:
+                self._count[node] -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, w, ok):
+        with self._cond:
+            if ok and w.alive():
+                self._idle[w.node].append(w)
+            else:
+                w.close()
+                self._count[w.node] -= 1
+            self._cond.notify()
+
+    def run(self, node, cmd, timeout=DEFAULT_TIMEOUT):
+        w = self._acquire(node)
+        ok = False
+        try:
+            out = w.run(cmd, timeout)
+            ok = True
+            return out
+        finally:
+            self._release(w, ok)
+
+    def close(self):
+        with self._cond:
+            for workers in self._idle.values():
+                for w in workers:
+                    w.close()
+            self._idle.clear()
+            self._count.clear()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = NetnsPool()
+            atexit.register(_pool.close)
+        return _pool
+
+def run(node, cmd, timeout=DEFAULT_TIMEOUT):
+    """
+    Chạy `cmd` trong namespace `node` qua worker thường trực, trả về stdout dạng str.
+    WorkerStartError: lệnh chưa chạy; EOFError / TimeoutError: lệnh có thể đã chạy một phần.
+    """
+    return get_pool().run(node, cmd, timeout)
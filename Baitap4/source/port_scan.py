@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# source/port_scan.py
+"""
+BỘ QUÉT PORT TCP BẤT ĐỒNG BỘ (ASYNCIO) CHO MA TRẬN ACL
+- File này vừa là thư viện (scan_from) vừa là "agent" chạy bên trong namespace nguồn:
+      ip netns exec <src> python3 port_scan.py --timeout 1 --ports 80,3306,53 <ip> <ip> ...
+- Agent vào namespace đúng MỘT lần rồi bắn connect() không chặn tới mọi (đích, port) cùng lúc,
+  mỗi socket có deadline riêng -> port bị chặn (DROP) chỉ tốn đúng một timeout cho cả lượt quét.
+- Kết quả in ra stdout dạng JSON {ip: {port: true/false}}.
+"""
+import os
+import sys
+import json
+import shlex
+import asyncio
+import argparse
+
+DEFAULT_PORTS = [80, 3306, 53]
+DEFAULT_TIMEOUT = 1.0
+
+async def probe(ip, port, timeout):
+    """True nếu bắt tay TCP thành công trước deadline."""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+async def scan(ips, ports, timeout):
+    jobs = [(ip, port) for ip in ips for port in ports]
+    results = await asyncio.gather(*(probe(ip, port, timeout) for ip, port in jobs))
+    res = {ip: {} for ip in ips}
+    for (ip, port), ok in zip(jobs, results):
+        res[ip][port] = ok
+    return res
+
+def scan_from(src, ips, ports=DEFAULT_PORTS, timeout=DEFAULT_TIMEOUT, exec_fn=None):
+    """
+    Chạy agent trong namespace `src` và trả về {ip: {port: bool}}.
+    exec_fn(node, cmd) mặc định là worker thường trực của netns_exec.
+    """
+    if exec_fn is None:
+        import netns_exec
+        exec_fn = netns_exec.run
+    cmd = (f"{shlex.quote(sys.executable)} {shlex.quote(os.path.abspath(__file__))} "
+           f"--timeout {timeout} --ports {','.join(str(p) for p in ports)} "
+           + " ".join(shlex.quote(ip) for ip in ips))
+    out = exec_fn(src, cmd)
+    try:
+        data = json.loads(out.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        data = {}
+    return {ip: {p: bool(data.get(ip, {}).get(str(p), False)) for p in ports} for ip in ips}
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent quét port TCP song song (chạy bên trong netns nguồn)")
+    parser.add_argument('ips', nargs='+')
+    parser.add_argument('--ports', default=','.join(str(p) for p in DEFAULT_PORTS))
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    args = parser.parse_args()
+    ports = [int(p) for p in args.ports.split(',') if p]
+    res = asyncio.run(scan(args.ips, ports, args.timeout))
+    print(json.dumps(res))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# source/probe_matrix.py
+"""
+BỘ QUÉT MA TRẬN KẾT NỐI TOÀN MẠNG (ALL-PAIRS PING / LOSS / TRACEROUTE)
+- Mỗi namespace nguồn chỉ chạy MỘT lệnh fping bắn song song tới mọi đích (-C: đếm từng gói),
+  thay vì 7 lần ping tuần tự -c 3 / -c 5.
+- Nếu máy không có fping: chạy các tiến trình ping nền song song trong cùng một shell rồi `wait`.
+- Traceroute tới mọi đích cũng được chạy nền song song trong một shell của namespace nguồn.
+- Các namespace nguồn được quét đồng thời bằng một pool luồng có giới hạn,
+  nên cả ma trận 8x8 xong trong khoảng một lần timeout probe.
+- Kết quả: ma trận NumPy RTT (ms, -1 = không tới được), Loss (%) và bảng đường đi {(src, dst): path}.
+"""
+import os
+import sys
+import shlex
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import netns_exec
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import netparse
+
+MAX_PARALLEL_JOBS = 16
+PROBE_COUNT = 3
+PROBE_INTERVAL_MS = 20
+PROBE_TIMEOUT_MS = 1000
+TRACE_MAX_HOPS = 5
+
+V4_SOURCES = ['internet', 'serverhcm']
+
+def _norm(ip):
+    """fping in địa chỉ ở dạng chuẩn hoá (VD: 64:ff9b::203.162.1.1 -> 64:ff9b::cba2:101)."""
+    try:
+        return ipaddress.ip_address(ip).compressed
+    except ValueError:
+        return ip
+
+def _parse_fping(out):
+    """Dòng fping -C: '<ip> : 0.05 0.04 -' -> {ip: [rtt hoặc None]}"""
+    res = {}
+    for line in out.splitlines():
+        if ' : ' not in line:
+            continue
+        ip, samples = line.split(' : ', 1)
+        vals = []
+        for s in samples.split():
+            try:
+                vals.append(float(s))
+            except ValueError:
+                vals.append(None)
+        res[_norm(ip.strip())] = vals
+    return res
+
+def _parse_ping_batch(out):
+    """Dòng '@@<ip> <tóm tắt ping -q>' -> {ip: (rtt_avg hoặc None, loss%)}"""
+    return {_norm(ip): (r.rtt_avg, int(round(r.loss_pct)) if r.ok else 100)
+            for ip, r in netparse.parse_batch(out, 'ping').items()}
+
+def _ping_batch(src, ips, exec_fn, count):
+    """Trả về {ip: (rtt_avg_ms hoặc -1, loss%)} cho mọi ip, probe từ namespace src."""
+    targets = " ".join(shlex.quote(ip) for ip in ips)
+    out = exec_fn(src, f"fping -C {count} -q -p {PROBE_INTERVAL_MS} -t {PROBE_TIMEOUT_MS} {targets} 2>&1")
+    parsed = _parse_fping(out)
+    if parsed:
+        res = {}
+        for ip in ips:
+            vals = parsed.get(_norm(ip), [])
+            ok = [v for v in vals if v is not None]
+            loss = 100 if not vals else int(round(100 * (len(vals) - len(ok)) / len(vals)))
+            res[ip] = (round(sum(ok) / len(ok), 3) if ok else -1.0, loss)
+        return res
+
+    # Dự phòng không có fping: ping nền song song trong cùng một shell của namespace
+    ping = "ping" if src in V4_SOURCES else "ping6"
+    script = (f"for ip in {targets}; do "
+              f"( r=$({ping} -c {count} -i 0.2 -W 1 -q $ip 2>&1 | tr '\\n' ' '); echo \"@@$ip $r\" ) & "
+              f"done; wait")
+    parsed = _parse_ping_batch(exec_fn(src, script))
+    res = {}
+    for ip in ips:
+        rtt, loss = parsed.get(_norm(ip), (None, 100))
+        res[ip] = (rtt if rtt is not None else -1.0, loss)
+    return res
+
+def _trace_batch(src, ips, exec_fn, max_hops):
+    """Trả về {ip: [hop, ...]} - traceroute tới mọi đích chạy song song trong một shell."""
+    tr = "traceroute" if src in V4_SOURCES else "traceroute6"
+    targets = " ".join(shlex.quote(ip) for ip in ips)
+    # Mỗi đích in cả khối '@@<ip>\n<output traceroute>' bằng MỘT printf (không bị xen với đích khác),
+    # netparse tách và parse cả khối → bỏ hop timeout ('*')
+    script = (f"for ip in {targets}; do "
+              f"( r=$({tr} -n -q 1 -w 1 -m {max_hops} $ip 2>/dev/null); "
+              f"printf '@@%s\\n%s\\n' \"$ip\" \"$r\" ) & "
+              f"done; wait")
+    res = {ip: [] for ip in ips}
+    for ip, r in netparse.parse_batch(exec_fn(src, script), 'traceroute').items():
+        res[ip] = [hop_ip for _, hop_ip, _ in r.hops if hop_ip]
+    return res
+
+def format_path(src, dst, hops):
+    """Định dạng giống measure_path() trong tool.py."""
+    if hops:
+        return f"{src} -> " + " -> ".join(hops) + f" -> {dst}"
+    return "TIMEOUT / KHÔNG THỂ ROUTING"
+
+def sweep(nodes, target_fn, exec_fn=netns_exec.run, paths=True, count=PROBE_COUNT,
+          max_parallel=MAX_PARALLEL_JOBS, max_hops=TRACE_MAX_HOPS):
+    """
+    Quét mọi cặp src/dst trong `nodes`.
+    target_fn(src, dst) -> IP đích nhìn từ src (VD: tool.get_target_ip).
+    exec_fn(node, cmd) -> stdout (mặc định dùng worker thường trực của netns_exec).
+    Trả về {'nodes', 'rtt': ndarray (N,N) ms, 'loss': ndarray (N,N) %, 'path': {(src, dst): str}}.
+    """
+    nodes = list(nodes)
+    n = len(nodes)
+    rtt = np.full((n, n), -1.0)
+    loss = np.full((n, n), 100, dtype=int)
+    np.fill_diagonal(rtt, 0.0)
+    np.fill_diagonal(loss, 0)
+    path_table = {}
+
+    targets = {src: {dst: target_fn(src, dst) for dst in nodes if dst != src} for src in nodes}
+
+    def probe_src(src):
+        ips = sorted(set(targets[src].values()))
+        return src, _ping_batch(src, ips, exec_fn, count)
+
+    def trace_src(src):
+        ips = sorted(set(targets[src].values()))
+        return src, _trace_batch(src, ips, exec_fn, max_hops)
+
+    jobs = n * 2 if paths else n
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, jobs))) as ex:
+        ping_futs = [ex.submit(probe_src, s) for s in nodes]
+        trace_futs = [ex.submit(trace_src, s) for s in nodes] if paths else []
+
+        for fut in ping_futs:
+            src, res = fut.result()
+            i = nodes.index(src)
+            for dst, ip in targets[src].items():
+                j = nodes.index(dst)
+                rtt[i, j], loss[i, j] = res.get(ip, (-1.0, 100))
+
+        for fut in trace_futs:
+            src, res = fut.result()
+            for dst, ip in targets[src].items():
+                path_table[(src, dst)] = format_path(src, dst, res.get(ip, []))
+
+    return {'nodes': nodes, 'rtt': rtt, 'loss': loss, 'path': path_table}
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# source/recorder.py
+"""
+BỘ GHI CHUỖI THỜI GIAN LƯU LƯỢNG TẦN SỐ CAO (RING BUFFER)
+- Luồng nền lấy mẫu bộ đếm interface ở tần số cấu hình được (10-100 Hz) bằng counters.snapshot().
+- Dữ liệu ghi vào bộ đệm vòng NumPy cấp phát sẵn -> không cấp phát bộ nhớ trong lúc đo.
+- Cho phép cắm mốc sự kiện ("ospf6d killed", "link down"...) và tự tính thời gian hội tụ:
+  khoảng cách từ mốc sự cố tới lúc thông lượng hồi phục về N% mức nền (baseline).
+"""
+import time
+import threading
+
+import numpy as np
+
+import counters
+
+class TrafficRecorder:
+    """
+    Ghi thông lượng của một hoặc nhiều kênh. Mỗi kênh = tổng bytes của nhóm interface trên một node.
+    channels: {node: [intf, ...]}
+    """
+    def __init__(self, channels, rate_hz=20, duration=120, direction='tx'):
+        if rate_hz <= 0:
+            raise ValueError("rate_hz phải > 0")
+        self.channels = list(channels.items())
+        self.nodes = [n for n, _ in self.channels]
+        self.rate_hz = rate_hz
+        self.direction = direction
+        self.capacity = int(rate_hz * duration) + 1
+        self._t = np.zeros(self.capacity)
+        self._bytes = np.zeros((self.capacity, len(self.channels)), dtype=np.int64)
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.t0 = None
+        self.markers = []  # [(thời điểm tương đối, nhãn)]
+
+    # ---------- Vòng đời ----------
+    def start(self):
+        self.t0 = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def elapsed(self):
+        return time.monotonic() - self.t0
+
+    def sleep_until(self, t_rel):
+        """Ngủ tới mốc t_rel (giây) tính từ lúc start() -> lịch sự kiện không bị trôi theo thời gian xử lý."""
+        delay = t_rel - self.elapsed()
+        if delay > 0:
+            time.sleep(delay)
+
+    def mark(self, label):
+        t_rel = self.elapsed()
+        with self._lock:
+            self.markers.append((t_rel, label))
+        return t_rel
+
+    def _loop(self):
+        period = 1.0 / self.rate_hz
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            snap = counters.snapshot(self.nodes)
+            row = [counters.total_bytes(snap, n, intfs, self.direction) for n, intfs in self.channels]
+            with self._lock:
+                i = self._count % self.capacity
+                self._t[i] = snap['time'] - self.t0
+                self._bytes[i] = row
+                self._count += 1
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_tick = time.monotonic()  # Trễ nhịp (máy quá tải) -> bắt nhịp lại, không dồn mẫu
+
+    # ---------- Truy xuất dữ liệu ----------
+    def series(self):
+        """Trả về (t, bytes) theo đúng thứ tự thời gian; bytes có shape (N, số kênh)."""
+        with self._lock:
+            n = min(self._count, self.capacity)
+            if self._count <= self.capacity:
+                return self._t[:n].copy(), self._bytes[:n].copy()
+            start = self._count % self.capacity
+            order = np.r_[start:self.capacity, 0:start]
+            return self._t[order], self._bytes[order]
+
+    def throughput(self, channel=0, smooth=0.0):
+        """
+        Thông lượng (Mbps) tại từng mẫu của một kênh. Mẫu đầu tiên = 0.
+        smooth: độ rộng cửa sổ trung bình trượt (giây), 0 = không làm mượt.
+        """
+        t, b = self.series()
+        mbps = np.zeros(len(t))
+        if len(t) > 1:
+            dt = np.diff(t)
+            dt[dt <= 0] = np.nan
+            mbps[1:] = np.nan_to_num(np.diff(b[:, channel]) * 8 / dt / 1000000.0)
+            mbps = np.clip(mbps, 0, None)
+        win = int(round(smooth * self.rate_hz))
+        if win > 1 and len(mbps) >= win:
+            mbps = np.convolve(mbps, np.ones(win) / win, mode='same')
+        return t, mbps
+
+    def marker_time(self, label):
+        for t_rel, lbl in self.markers:
+            if lbl == label:
+                return t_rel
+        return None
+
+    def convergence_time(self, fail_label, pct=0.9, after_label=None, channel=0,
+                         baseline_window=3.0, smooth=0.25, hold=0.5):
+        """
+        Thời gian hội tụ (giây) = từ mốc `fail_label` tới khi thông lượng trở lại >= pct * baseline
+        và giữ được ít nhất `hold` giây. Baseline = trung bình `baseline_window` giây trước mốc sự cố.
+        after_label: chỉ bắt đầu tìm hồi phục sau mốc này (VD: "ospf6d restarted").
+        Trả về None nếu chưa hồi phục trong dữ liệu đã ghi.
+        """
+        t_fail = self.marker_time(fail_label)
+        if t_fail is None:
+            return None
+        t, mbps = self.throughput(channel, smooth)
+        base_mask = (t >= t_fail - baseline_window) & (t < t_fail)
+        if not base_mask.any():
+            return None
+        baseline = float(mbps[base_mask].mean())
+        if baseline <= 0:
+            return None
+        t_search = self.marker_time(after_label) if after_label else t_fail
+        if t_search is None:
+            return None
+        ok = (mbps >= pct * baseline) & (t > t_search)
+        hold_n = max(1, int(round(hold * self.rate_hz)))
+        run = 0
+        for i in np.flatnonzero(t > t_search):
+            run = run + 1 if ok[i] else 0
+            if run >= hold_n:
+                return float(t[i - hold_n + 1] - t_fail)
+        return None
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# source/scheduler.py
+"""
+BỘ LẬP LỊCH CHẠY SONG SONG CÁC KỊCH BẢN THEO "DẤU CHÂN" TÀI NGUYÊN
+- Mỗi job khai báo tài nguyên nó LÀM THAY ĐỔI (mutates: link, daemon, port đang chiếm, tải trên fabric...)
+  và tài nguyên nó chỉ ĐỌC/PHỤ THUỘC (uses).
+- Hai job xung đột nếu job này thay đổi thứ mà job kia thay đổi hoặc đang dùng.
+- Job không xung đột chạy song song; job xung đột chạy tuần tự theo thứ tự người dùng chọn,
+  riêng job phía sau được "chen lên" (backfill) nếu job xung đột đứng trước nó đang bị chặn bởi job khác.
+- IdleGate: chốt ngắn hạn BÊN TRONG job cho pha cần fabric "yên tĩnh" (đo RTT) so với pha bơm tải (iperf),
+  để 2 job chỉ đụng nhau ở vài giây đo đó thay vì bị xếp tuần tự cả job.
+- Ghi lại thời gian bắt đầu/kết thúc/thời lượng của từng job để đưa vào báo cáo.
+"""
+import time
+import threading
+import contextlib
+
+class Job:
+    def __init__(self, name, fn, mutates=(), uses=()):
+        self.name = name
+        self.fn = fn
+        self.mutates = set(mutates)
+        self.uses = set(uses)
+
+    def conflicts(self, other):
+        return bool(self.mutates & (other.mutates | other.uses) or other.mutates & self.uses)
+
+class IdleGate:
+    """
+    busy(): pha bơm tải, nhiều pha busy được chạy cùng lúc.
+    idle(): pha cần fabric không có tải, chờ mọi pha busy xong và chặn pha busy mới cho tới khi đo xong.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._busy = 0
+        self._idle = False
+        self._waiting_idle = 0
+
+    @contextlib.contextmanager
+    def busy(self):
+        with self._cond:
+            # Ưu tiên pha idle đang chờ để nó không bị các pha tải nối đuôi nhau bỏ đói
+            while self._idle or self._waiting_idle:
+                self._cond.wait()
+            self._busy += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def idle(self):
+        with self._cond:
+            self._waiting_idle += 1
+            while self._busy or self._idle:
+                self._cond.wait()
+            self._waiting_idle -= 1
+            self._idle = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._idle = False
+                self._cond.notify_all()
+
+def run_jobs(jobs, on_event=None):
+    """
+    Chạy danh sách job (giữ thứ tự ưu tiên), trả về list timing:
+    [{'name', 'start', 'end', 'duration', 'status', 'result'}] với start/end tính bằng giây từ lúc bắt đầu,
+    result = giá trị trả về của job.fn().
+    on_event(job, 'start'|'done'|'error', info) được gọi từ luồng worker (nếu có).
+    """
+    jobs = list(jobs)
+    pending = list(jobs)
+    running = set()
+    timings = {}
+    cond = threading.Condition()
+    t0 = time.monotonic()
+
+    def blocked(job):
+        return any(job.conflicts(r) for r in running)
+
+    def can_start(job):
+        if blocked(job):
+            return False
+        # Chỉ vượt mặt job xung đột đứng trước nếu job đó đang bị chặn (không làm nó chờ thêm ngay lúc này)
+        for p in pending:
+            if p is job:
+                return True
+            if job.conflicts(p) and not blocked(p):
+                return False
+        return True
+
+    def worker(job):
+        start = time.monotonic() - t0
+        status = 'ok'
+        result = None
+        if on_event:
+            on_event(job, 'start', start)
+        try:
+            result = job.fn()
+        except Exception as e:
+            status = f"error: {e}"
+            if on_event:
+                on_event(job, 'error', e)
+        end = time.monotonic() - t0
+        with cond:
+            timings[job.name] = {'name': job.name, 'start': round(start, 2), 'end': round(end, 2),
+                                 'duration': round(end - start, 2), 'status': status, 'result': result}
+            running.discard(job)
+            cond.notify_all()
+        if on_event:
+            on_event(job, 'done', end - start)
+
+    threads = []
+    with cond:
+        while pending:
+            for j in list(pending):
+                if not can_start(j):
+                    continue
+                pending.remove(j)
+                running.add(j)
+                th = threading.Thread(target=worker, args=(j,), daemon=True)
+                threads.append(th)
+                th.start()
+            if pending:
+                cond.wait()
+    for th in threads:
+        th.join()
+    return [timings[j.name] for j in jobs]
@@ -3,17 +3,26 @@
 import sys
 import os
 import time
-import re
 import threading
 import datetime
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import matplotlib
-
-# Lưu file tĩnh, không cần hiển thị pop-up matplotlib (X11) vì đã có GUI Tkinter
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import numpy as np
+import subprocess
+try:
+    import tkinter as tk
+    from tkinter import ttk, scrolledtext, messagebox
+except ImportError:
+    # Máy headless (CI / SSH) không có Tk: các hàm đo vẫn dùng được qua cli.py
+    tk = None
+
+import netns_exec
+import counters
+import listeners
+import ui_events
+import scheduler
+import convergence
+import frr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import netparse
 
 # Cấu hình Thư mục Lưu Kết Quả
 try:
@@ -25,6 +34,33 @@ except Exception:
 
 LOG_FILE = os.path.join(LOG_DIR, "system_report.log")
 
+# Chế độ chạy không giao diện (cli.py): tắt vẽ ảnh để khởi động/chạy nhanh, in log ra stderr
+PLOTS_ENABLED = True
+CONSOLE_ECHO = False
+
+def _figure(figsize):
+    """
+    (fig, ax) vẽ thẳng lên canvas Agg, không qua pyplot: các Case chạy song song ở luồng worker
+    mà trạng thái toàn cục của pyplot (figure hiện hành, plt.close) không an toàn đa luồng.
+    Chỉ nạp matplotlib khi thực sự vẽ (tiết kiệm thời gian khởi động của cli.py).
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+_log_writer = ui_events.LogWriter(LOG_FILE)
+
+def set_log_dir(path):
+    """Đổi thư mục kết quả lúc chạy (cli.py --log-dir): LOG_DIR, LOG_FILE và luồng ghi system_report.log."""
+    global LOG_DIR, LOG_FILE, _log_writer
+    os.makedirs(path, exist_ok=True)
+    LOG_DIR = path
+    LOG_FILE = os.path.join(LOG_DIR, "system_report.log")
+    old, _log_writer = _log_writer, ui_events.LogWriter(LOG_FILE)
+    old.close()
+
 # Danh sách Hosts Topology
 NODE_LIST = ['web_server1', 'web_server2', 'dns_server1', 'dns_server2', 'db_server1', 'db_server2', 'internet', 'serverhcm']
 IP_MAP = {
@@ -35,16 +71,30 @@ IP_MAP = {
 }
 
 def log_to_file(msg):
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n")
+    # Ghi qua luồng nền có bộ đệm (ui_events.LogWriter), không mở/đóng file cho từng dòng
+    _log_writer.write(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n")
 
 # ================= HỆ THỐNG ĐO LƯỜNG LÕI =================
 def exec_netns(node, cmd):
-    """Chạy lệnh bảo mật ROOT qua NetNS trong Mininet"""
+    """Chạy lệnh bảo mật ROOT qua NetNS trong Mininet (qua worker thường trực của netns_exec)"""
+    try:
+        return netns_exec.run(node, cmd)
+    except netns_exec.WorkerStartError:
+        pass
+    except (EOFError, OSError) as e:
+        # Worker chết / quá giờ giữa chừng: lệnh có thể đã chạy một phần (killall, iperf -D, link down...)
+        # → KHÔNG chạy lại, chỉ ghi log và trả về rỗng như lệnh không có output
+        log_to_file(f"[netns] {node}: {e}")
+        return ""
+    # Dự phòng: chưa tạo được worker (namespace chưa sẵn sàng / sudo đòi mật khẩu) -> fork từng lệnh
     # Nếu đang không chạy bằng root, cần map sudo
     sudo_pfx = "" if os.geteuid() == 0 else "sudo "
-    out = os.popen(f"{sudo_pfx}ip netns exec {node} {cmd} 2>/dev/null").read()
-    return out
+    try:
+        return subprocess.run(f"{sudo_pfx}ip netns exec {node} {cmd} 2>/dev/null", shell=True, stdout=subprocess.PIPE,
+                              text=True, errors='replace', timeout=netns_exec.DEFAULT_TIMEOUT).stdout
+    except subprocess.TimeoutExpired as e:
+        log_to_file(f"[netns] {node}: quá {e.timeout}s: {cmd}")
+        return ""
 
 def get_target_ip(src, dst):
     if src in ['internet', 'serverhcm']:
@@ -58,26 +108,29 @@ def get_target_ip(src, dst):
 def measure_rtt(src, dst):
     ip = get_target_ip(src, dst)
     cmd = "ping" if src in ['internet', 'serverhcm'] else "ping6"
-    out = exec_netns(src, f"{cmd} -c 3 -W 1 -q {ip}")
-    m = re.search(r'min/avg/max/[^=]+=\s*[\d\.]+/([\d\.]+)/', out)
-    return float(m.group(1)) if m else -1.0
+    r = netparse.parse_ping(exec_netns(src, f"{cmd} -c 3 -W 1 -q {ip}"))
+    return r.rtt_avg if r.ok and r.rtt_avg is not None else -1.0
 
 def measure_loss(src, dst):
     ip = get_target_ip(src, dst)
     cmd = "ping" if src in ['internet', 'serverhcm'] else "ping6"
-    out = exec_netns(src, f"{cmd} -c 5 -W 1 -q {ip}")
-    m = re.search(r'(\d+)% packet loss', out)
-    return int(m.group(1)) if m else 100
+    r = netparse.parse_ping(exec_netns(src, f"{cmd} -c 5 -W 1 -q {ip}"))
+    return int(round(r.loss_pct)) if r.ok else 100
 
 def measure_path(src, dst):
     ip = get_target_ip(src, dst)
     cmd = "traceroute" if src in ['internet', 'serverhcm'] else "traceroute6"
-    out = exec_netns(src, f"{cmd} -n -q 1 -w 1 -m 5 {ip} | tail -n +2 | awk '{{print $2}}'")
-    hops = [p for p in out.strip().split('\n') if p and '*' not in p]
+    tr = netparse.parse_traceroute(exec_netns(src, f"{cmd} -n -q 1 -w 1 -m 5 {ip}"))
+    hops = [hop_ip for _, hop_ip, _ in tr.hops if hop_ip]
     if hops:
         return f"{src} -> " + " -> ".join(hops) + f" -> {dst}"
     return "TIMEOUT / KHÔNG THỂ ROUTING"
 
+def measure_matrix(nodes=None, paths=True):
+    """Quét song song RTT/Loss (và traceroute) cho mọi cặp host -> dict ma trận của probe_matrix.sweep()"""
+    import probe_matrix
+    return probe_matrix.sweep(nodes or NODE_LIST, get_target_ip, paths=paths)
+
 def measure_throughput(src, dst):
     if dst in ['internet', 'serverhcm'] or src in ['internet', 'serverhcm']: return "N/A (Chặn NAT/Chưa hỗ trợ Mở Port External)"
     ip = get_target_ip(src, dst)
@@ -85,18 +138,25 @@ def measure_throughput(src, dst):
     exec_netns(src, "killall -9 iperf")
     exec_netns(dst, "iperf -s -p 3306 -V -D")
     out = exec_netns(src, f"iperf -c {ip} -p 3306 -V -t 3 -f m")
-    m = re.search(r'([\d\.]+)\s*Mbits/sec', out)
+    r = netparse.parse_iperf_text(out)
     exec_netns(dst, "killall -9 iperf")
-    return f"{m.group(1)} Mbps" if m else "0.0 Mbps (Firewall Blocked?)"
+    return f"{r.mbps:.2f} Mbps" if r.ok else f"0.0 Mbps (Firewall Blocked? {r.error})"
 
 def get_rx_tx_bytes(node, intf):
     try:
-        rx = int(exec_netns(node, f"cat /sys/class/net/{intf}/statistics/rx_bytes").strip() or 0)
-        tx = int(exec_netns(node, f"cat /sys/class/net/{intf}/statistics/tx_bytes").strip() or 0)
-        return rx, tx
+        return counters.read_counters(node).get(intf, (0, 0))
     except:
         return 0, 0
 
+# Bộ ghi lưu lượng tần số cao cho Case 1/2 (Hz, tổng thời gian đo, ngưỡng hồi phục % baseline)
+RECORD_HZ = 20
+CASE_DURATION = 80
+CONVERGENCE_PCT = 0.9
+
+SPINE_INTFS = {'s1': ['s1-eth1', 's1-eth2', 's1-eth3'], 's2': ['s2-eth1', 's2-eth2', 's2-eth3']}
+# Pha bơm iperf (Case 4/5) giữ FABRIC.busy(), pha đo RTT của Case 3 giữ FABRIC.idle()
+FABRIC = scheduler.IdleGate()
+
 # ================= KỊCH BẢN XUẤT BIỂU ĐỒ (5 TRƯỜNG HỢP GHE GỚM) =================
 
 def restore_s2_links():
@@ -112,9 +172,12 @@ def restore_s1_links():
     exec_netns("s1", "ip -6 addr add fc00:1::9/126 dev s1-eth3 2>/dev/null")
 
 def log_ui(txt_wid, msg):
-    txt_wid.insert(tk.END, msg + "\n")
-    txt_wid.see(tk.END)
-    txt_wid.update()
+    # An toàn đa luồng: chỉ đẩy sự kiện vào hàng đợi, mainloop Tk tự rút theo lô (ui_events.pump)
+    # txt_wid = None -> chạy không giao diện, chỉ ghi file
+    if txt_wid is not None:
+        ui_events.post_log(txt_wid, msg)
+    elif CONSOLE_ECHO:
+        print(msg, file=sys.stderr, flush=True)
     log_to_file(msg)
 
 def case1_ospf_startup(txt_wid):
@@ -128,19 +191,14 @@ def case1_ospf_startup(txt_wid):
     exec_netns("web_server1", "touch /tmp/ping_run")
     exec_netns("web_server1", "nohup sh -c 'while [ -f /tmp/ping_run ]; do ping6 -i 0.005 -s 1400 fd00:30::1; sleep 0.05; done' >/dev/null 2>&1 &")
     
-    tl = []
-    tp = []
-    raw_tx_list = []
-    last_tx = sum([get_rx_tx_bytes('s1', f's1-eth{i}')[1] for i in [1, 2, 3]])
-    
-    for t in range(80):
-        time.sleep(1)
-        curr_tx = sum([get_rx_tx_bytes('s1', f's1-eth{i}')[1] for i in [1, 2, 3]])
-        mbps = ((curr_tx - last_tx) * 8) / 1000000.0
-        last_tx = curr_tx
-        tl.append(t)
-        tp.append(max(0, mbps))
-        raw_tx_list.append(curr_tx)
+    # Luồng nền ghi bộ đếm S1 ở RECORD_HZ vào ring buffer, vòng lặp chính chỉ lo bắn sự kiện đúng giờ
+    import recorder
+    rec = recorder.TrafficRecorder({'s1': SPINE_INTFS['s1']}, rate_hz=RECORD_HZ, duration=CASE_DURATION + 5)
+    rec.start()
+    ctrl, watcher = {}, None   # Kết quả đo hội tụ mặt phẳng điều khiển + luồng đo (tạo ở t=15s)
+    
+    for t in range(1, CASE_DURATION + 1):
+        rec.sleep_until(t)
         
         if t == 5:
              # Giây thứ 5: Giết não OSPF của S1 trực tiếp từ PIDs và Reset bộ nhớ định tuyến Kernel
@@ -151,54 +209,94 @@ def case1_ospf_startup(txt_wid):
                      os.system(f"sudo rm -f /tmp/s1/{f}.pid")
              except: pass
              exec_netns("s1", "ip -6 route flush target fd00::/8 2>/dev/null") # Gây sập mạng vật lý ngay lập tức
+             rec.mark("ospf6d killed")
              log_ui(txt_wid, "  -> Đã NGẮT tiến trình FRR OSPF6D tại t=5s. Băng thông sẽ tuột dốc...")
              
         elif t == 15:
              # Giây thứ 15: Bật lại bộ não OSPF. Đợi nó tìm đường (Hội tụ)
-             exec_netns("s1", "/usr/lib/frr/zebra -d -u frr -g frr -A 127.0.0.1 -f /tmp/s1/zebra.conf -i /tmp/s1/zebra.pid >/dev/null 2>&1")
-             exec_netns("s1", "/usr/lib/frr/ospf6d -d -u frr -g frr -A 127.0.0.1 -f /tmp/s1/ospf6d.conf -i /tmp/s1/ospf6d.pid >/dev/null 2>&1")
+             # Cùng lệnh khởi chạy với topology.py (socket zserv riêng, ospf6d.conf đã render sẵn cấu hình OSPF6)
+             exec_netns("s1", frr.launch_cmd("s1"))
+             rec.mark("ospf6d restarted")
              log_ui(txt_wid, "  -> KHỞI ĐỘNG LẠI OSPF6D tại t=15s. Chờ hội tụ vọt đỉnh...")
+             # Đo hội tụ mặt phẳng điều khiển thật sự (neighbor Full + route trong kernel) ở luồng nền
+             def _on_ready(router, res):
+                 rec.mark("ospf6 converged")
+                 log_ui(txt_wid, f"  -> {router}: adjacency Full sau {res['adjacency_s']:.2f}s, đủ route sau {res['routes_s']:.2f}s kể từ lúc khởi động lại")
+             def _watch(timeout):
+                 try:
+                     ctrl.update(convergence.wait_converged(
+                         convergence.default_specs(['s1']), timeout=timeout, on_ready=_on_ready))
+                 except Exception as e:
+                     ctrl['error'] = str(e)
+             watcher = threading.Thread(target=_watch, args=(CASE_DURATION - t,), daemon=True)
+             watcher.start()
              
         elif t % 5 == 0:
-             log_ui(txt_wid, f"  ... Đang thu thập dữ liệu và cập nhật luồng mạng (Giây thứ {t}/80)...")
+             log_ui(txt_wid, f"  ... Đang thu thập dữ liệu và cập nhật luồng mạng (Giây thứ {t}/{CASE_DURATION})...")
+    rec.stop()
+    if watcher:
+        watcher.join()
+    ospf_conv = ctrl['routers']['s1']['converged_s'] if ctrl.get('converged') else None
+    if ospf_conv is None and 'routers' in ctrl:
+        log_ui(txt_wid, "  -> OSPFv3 của S1 chưa hội tụ trong cửa sổ đo:\n" + convergence.format_report(ctrl).rstrip())
+    elif ospf_conv is None:
+        log_ui(txt_wid, f"  -> Không đo được hội tụ OSPFv3 của S1: {ctrl.get('error', 'ospf6d chưa được khởi động lại')}")
+    
+    conv = rec.convergence_time("ospf6d killed", pct=CONVERGENCE_PCT, after_label="ospf6d restarted")
+    if conv is not None:
+        log_ui(txt_wid, f"  -> Thời gian hội tụ (về {CONVERGENCE_PCT*100:.0f}% baseline): {conv:.2f}s tính từ lúc ngắt OSPF6D")
+    else:
+        log_ui(txt_wid, "  -> Chưa xác định được thời gian hội tụ (thông lượng chưa hồi phục hoặc baseline = 0)")
 
     # Khôi phục trạng thái chuẩn (cấp lại IP bị flush do Linux Down state)
     restore_s2_links()
     exec_netns("web_server1", "rm -f /tmp/ping_run; killall -9 ping6 sh 2>/dev/null")
     
     # RENDER 
-    fig, ax = plt.subplots(figsize=(8, 5))
-    ax.axvspan(5, 15, color='#ffcc99', alpha=0.5, label='S1 OSPF OFF (Sập mạng)')
-    # ĐỂ ĐÚNG YÊU CẦU TRONG ẢNH CỦA USER: Vẽ nét đứt (--), không dùng marker để mượt mà
-    ax.plot(tl, tp, color='#2a9d8f', linestyle='--', linewidth=2.5, label='S1 Băng Thông')
-    
-    ax.axvline(x=5, color='red', linestyle='solid', linewidth=1.5)
-    ax.axvline(x=15, color='green', linestyle='solid', linewidth=1.5)
-    
-    ax.set_title("CASE 1: OSPF STARTUP CONVERGENCE (SPINE S1)", fontweight='bold')
-    ax.set_xlabel("Thời gian (s) - Kéo dài chờ OSPF Bcast Wait Timer")
-    ax.set_ylabel("Thông lượng ICMP (Mbps)")
-    
-    # Giới hạn trục phù hợp để giống ảnh
-    ax.set_xlim([0, 80])
-    ax.set_xticks(range(0, 81, 10))
-    ax.grid(linestyle="--", alpha=0.5)
-    ax.legend()
-    
-    fig.tight_layout()
-    path = os.path.join(LOG_DIR, "case1_start_convergence.png")
-    fig.savefig(path, dpi=150)
-    plt.close(fig)
+    tl, tp = rec.throughput(smooth=0.25)
+    path = None
+    t_down = rec.marker_time("ospf6d killed") or 5
+    t_up = rec.marker_time("ospf6d restarted") or 15
+    if PLOTS_ENABLED:
+        fig, ax = _figure((8, 5))
+        ax.axvspan(t_down, t_up, color='#ffcc99', alpha=0.5, label='S1 OSPF OFF (Sập mạng)')
+        # ĐỂ ĐÚNG YÊU CẦU TRONG ẢNH CỦA USER: Vẽ nét đứt (--), không dùng marker để mượt mà
+        ax.plot(tl, tp, color='#2a9d8f', linestyle='--', linewidth=2.5, label='S1 Băng Thông')
+    
+        ax.axvline(x=t_down, color='red', linestyle='solid', linewidth=1.5)
+        ax.axvline(x=t_up, color='green', linestyle='solid', linewidth=1.5)
+        if conv is not None:
+            ax.axvline(x=t_down + conv, color='purple', linestyle=':', linewidth=1.5, label=f'Hội tụ: {conv:.2f}s')
+        t_ctrl = rec.marker_time("ospf6 converged")
+        if t_ctrl is not None:
+            ax.axvline(x=t_ctrl, color='blue', linestyle='-.', linewidth=1.2, label=f'OSPF Full + route: {t_ctrl - t_up:.2f}s')
+
+        ax.set_title("CASE 1: OSPF STARTUP CONVERGENCE (SPINE S1)", fontweight='bold')
+        ax.set_xlabel("Thời gian (s) - Kéo dài chờ OSPF Bcast Wait Timer")
+        ax.set_ylabel("Thông lượng ICMP (Mbps)")
+    
+        # Giới hạn trục phù hợp để giống ảnh
+        ax.set_xlim([0, CASE_DURATION])
+        ax.set_xticks(range(0, CASE_DURATION + 1, 10))
+        ax.grid(linestyle="--", alpha=0.5)
+        ax.legend()
+    
+        fig.tight_layout()
+        path = os.path.join(LOG_DIR, "case1_start_convergence.png")
+        fig.savefig(path, dpi=150)
     
     import csv 
     csv_path = os.path.join(LOG_DIR, "case1_start_convergence.csv")
     with open(csv_path, 'w', newline='', encoding='utf-8') as f:
         w = csv.writer(f)
         w.writerow(['Time_Seconds', 'Raw_TX_Bytes_Linux', 'Calculated_Throughput_Mbps'])
-        for time_s, raw_tx, thp in zip(tl, raw_tx_list, tp):
-            w.writerow([time_s, raw_tx, thp])
+        _, raw_tx_list = rec.series()
+        for time_s, raw_tx, thp in zip(tl, raw_tx_list[:, 0], rec.throughput()[1]):
+            w.writerow([round(float(time_s), 3), int(raw_tx), round(float(thp), 3)])
             
-    log_ui(txt_wid, f"  -> Xong Case 1! Đã lưu tại: {path} và {csv_path}")
+    log_ui(txt_wid, f"  -> Xong Case 1! Đã lưu tại: {path or '-'} và {csv_path}")
+    return {'convergence_s': conv, 'ospf_convergence_s': ospf_conv, 'markers': rec.markers,
+            'png': path, 'csv': csv_path}
 
 def case2_s1_failover(txt_wid):
     log_ui(txt_wid, "[CASE 2] Đo hội tụ Spine S1 lúc Rút Cáp và Phục hồi (Failover)...")
@@ -208,165 +306,185 @@ def case2_s1_failover(txt_wid):
     exec_netns("web_server1", "touch /tmp/ping_run")
     exec_netns("web_server1", "nohup sh -c 'while [ -f /tmp/ping_run ]; do ping6 -i 0.005 -s 1400 fd00:30::1; sleep 0.05; done' >/dev/null 2>&1 &")
     
-    tl, tp = [], []
-    raw_tx_list = []
-    last_tx = sum([get_rx_tx_bytes('s1', f's1-eth{i}')[1] for i in [1, 2, 3]])
-    
-    for t in range(80):
-        time.sleep(1)
-        curr_tx = sum([get_rx_tx_bytes('s1', f's1-eth{i}')[1] for i in [1, 2, 3]])
-        mbps = ((curr_tx - last_tx) * 8) / 1000000.0
-        last_tx = curr_tx
-        tl.append(t)
-        tp.append(max(0, mbps))
-        raw_tx_list.append(curr_tx)
+    import recorder
+    rec = recorder.TrafficRecorder({'s1': SPINE_INTFS['s1']}, rate_hz=RECORD_HZ, duration=CASE_DURATION + 5)
+    rec.start()
+    ctrl, watcher = {}, None   # Kết quả đo hội tụ mặt phẳng điều khiển + luồng đo (tạo ở t=15s)
+    
+    for t in range(1, CASE_DURATION + 1):
+        rec.sleep_until(t)
         
         if t == 5:
             log_ui(txt_wid, "  -> RÚT CÁP Spine S1 (t=5s) - Mô phỏng đứt gãy...")
             for i in [3, 4, 5]: exec_netns(f"s{i}", f"ip link set s{i}-eth0 down")
+            rec.mark("link down")
         elif t == 15:
             log_ui(txt_wid, "  -> CẮM LẠI CÁP Spine S1 (t=15s) - Khôi phục và chờ hội tụ ổn định...")
             exec_netns("s3", "ip link set s3-eth0 up; ip -6 addr add fc00:1::2/126 dev s3-eth0 2>/dev/null")
             exec_netns("s4", "ip link set s4-eth0 up; ip -6 addr add fc00:1::6/126 dev s4-eth0 2>/dev/null")
             exec_netns("s5", "ip link set s5-eth0 up; ip -6 addr add fc00:1::10/126 dev s5-eth0 2>/dev/null")
+            rec.mark("link up")
         elif t % 5 == 0:
-            log_ui(txt_wid, f"  ... Đang thu thập dữ liệu lưu lượng qua cáp quang (Giây thứ {t}/80)...")
+            log_ui(txt_wid, f"  ... Đang thu thập dữ liệu lưu lượng qua cáp quang (Giây thứ {t}/{CASE_DURATION})...")
+    rec.stop()
+    
+    conv = rec.convergence_time("link down", pct=CONVERGENCE_PCT, after_label="link up")
+    if conv is not None:
+        log_ui(txt_wid, f"  -> Thời gian hội tụ (về {CONVERGENCE_PCT*100:.0f}% baseline): {conv:.2f}s tính từ lúc rút cáp")
+    else:
+        log_ui(txt_wid, "  -> Chưa xác định được thời gian hội tụ (thông lượng chưa hồi phục hoặc baseline = 0)")
 
     restore_s2_links()
     exec_netns("web_server1", "rm -f /tmp/ping_run; killall -9 ping6 sh 2>/dev/null")
     
-    fig, ax = plt.subplots(figsize=(8, 5))
-    ax.axvspan(5, 15, color='#e5e5e5', alpha=1, label='Downtime (Link ngắt vật lý)')
+    tl, tp = rec.throughput(smooth=0.25)
+    path = None
+    t_down = rec.marker_time("link down") or 5
+    t_up = rec.marker_time("link up") or 15
+    if PLOTS_ENABLED:
+        fig, ax = _figure((8, 5))
+        ax.axvspan(t_down, t_up, color='#e5e5e5', alpha=1, label='Downtime (Link ngắt vật lý)')
     
-    # NÉT ĐỨT Y HỆT LỜI CẦU NGUYỆN CASE 1
-    ax.plot(tl, tp, color='#1d3557', linestyle='--', linewidth=2.5, label='S1 Băng Thông')
+        # NÉT ĐỨT Y HỆT LỜI CẦU NGUYỆN CASE 1
+        ax.plot(tl, tp, color='#1d3557', linestyle='--', linewidth=2.5, label='S1 Băng Thông')
     
-    ax.axvline(x=5, color='red', linestyle='solid', linewidth=1.5)
-    ax.axvline(x=15, color='green', linestyle='solid', linewidth=1.5)
+        ax.axvline(x=t_down, color='red', linestyle='solid', linewidth=1.5)
+        ax.axvline(x=t_up, color='green', linestyle='solid', linewidth=1.5)
+        if conv is not None:
+            ax.axvline(x=t_down + conv, color='purple', linestyle=':', linewidth=1.5, label=f'Hội tụ: {conv:.2f}s')
     
-    ax.set_title("CASE 2: S1 FAILOVER & RECOVERY (CABLE CUT)", fontweight='bold')
-    ax.set_xlabel("Thời gian (s) - Kéo dài chờ OSPF Bcast Wait Timer")
-    ax.set_ylabel("Thông lượng (Mbps)")
+        ax.set_title("CASE 2: S1 FAILOVER & RECOVERY (CABLE CUT)", fontweight='bold')
+        ax.set_xlabel("Thời gian (s) - Kéo dài chờ OSPF Bcast Wait Timer")
+        ax.set_ylabel("Thông lượng (Mbps)")
     
-    ax.set_xlim([0, 80])
-    ax.set_xticks(range(0, 81, 10))
-    ax.grid(linestyle="--", alpha=0.5)
-    ax.legend()
+        ax.set_xlim([0, CASE_DURATION])
+        ax.set_xticks(range(0, CASE_DURATION + 1, 10))
+        ax.grid(linestyle="--", alpha=0.5)
+        ax.legend()
     
-    fig.tight_layout()
-    path = os.path.join(LOG_DIR, "case2_failover.png")
-    fig.savefig(path, dpi=150)
-    plt.close(fig)
+        fig.tight_layout()
+        path = os.path.join(LOG_DIR, "case2_failover.png")
+        fig.savefig(path, dpi=150)
 
     import csv
     csv_path = os.path.join(LOG_DIR, "case2_failover.csv")
     with open(csv_path, 'w', newline='', encoding='utf-8') as f:
         w = csv.writer(f)
         w.writerow(['Time_Seconds', 'Raw_TX_Bytes_Linux', 'Calculated_Throughput_Mbps'])
-        for time_s, raw_tx, thp in zip(tl, raw_tx_list, tp):
-            w.writerow([time_s, raw_tx, thp])
+        _, raw_tx_list = rec.series()
+        for time_s, raw_tx, thp in zip(tl, raw_tx_list[:, 0], rec.throughput()[1]):
+            w.writerow([round(float(time_s), 3), int(raw_tx), round(float(thp), 3)])
             
-    log_ui(txt_wid, f"  -> Xong Case 2! Đã lưu tại: {path} và {csv_path}")
-
-def probe_port_fast(src, dst_node, dst_ip, port):
-    res = os.system(f"sudo ip netns exec {src} nc -z -w 1 {dst_ip} {port} >/dev/null 2>&1")
-    return res == 0
+    log_ui(txt_wid, f"  -> Xong Case 2! Đã lưu tại: {path or '-'} và {csv_path}")
+    return {'convergence_s': conv, 'markers': rec.markers, 'png': path, 'csv': csv_path}
+
+ACL_PORTS = [80, 3306, 53]
+
+def acl_label(src, dst, p_web, p_db, p_dns):
+    # Mapping Rule của Tường lửa để chấm màu và nhãn (Bỏ qua Ping vì ICMP luôn được cấp phép để định tuyến IPv6)
+    if not p_web and not p_db and not p_dns:
+        score = 0
+        txt = "DENY"
+    elif p_web and p_db and p_dns:
+        if src.startswith('db') and dst.startswith('db'):
+            txt = "DB CLUSTER\n(Allow All)"
+        else:
+            txt = "ALLOW\nALL"
+        score = 4
+    elif p_web and not p_db and not p_dns:
+        score = 2
+        txt = "ALLOW\nWEB (80)"
+    elif p_db and not p_web and not p_dns:
+        score = 3
+        txt = "ALLOW\nDB (3306)"
+    elif p_dns and not p_web and not p_db:
+        score = 1
+        txt = "ALLOW\nDNS (53)"
+    else:
+        score = 2
+        t = []
+        if p_web: t.append("P80")
+        if p_db: t.append("P33")
+        if p_dns: t.append("P53")
+        txt = "Mix:\n" + "\n".join(t)
+    return score, txt
 
 def case3_firewall_acl(txt_wid):
     log_ui(txt_wid, "[CASE 3] Dò quét lỗ hổng Tường Lửa (8 Host) - Đa luồng siêu tốc...")
     hosts = ['web_server1', 'web_server2', 'dns_server1', 'dns_server2', 'db_server1', 'db_server2', 'internet', 'serverhcm']
     labels = ['Web1', 'Web2', 'DNS1', 'DNS2', 'DB1', 'DB2', 'INET', 'HCM']
     N = len(hosts)
+    import numpy as np
     mat = np.zeros((N, N))
     texts = [["" for _ in range(N)] for _ in range(N)]
     raw_c3 = [["" for _ in range(N)] for _ in range(N)]
     
-    # Thiết lập server lắng nghe port giả lập nhanh bằng nc để quét ko bị kẹt
-    # SỬ DỤNG fuser -k THAY VÌ killall ĐỂ KHÔNG GIẾT NHẦM TIẾN TRÌNH GOOGLE/PYTHON/MININET Ở MÁY THỰC
-    for h in hosts:
-        exec_netns(h, "fuser -k -9 80/tcp 3306/tcp 53/tcp >/dev/null 2>&1")
-        v6_flag = "" if h in ['internet', 'serverhcm'] else "-6 "
-        exec_netns(h, f"nc {v6_flag}-l -p 80 -k >/dev/null 2>&1 &")
-        exec_netns(h, f"nc {v6_flag}-l -p 3306 -k >/dev/null 2>&1 &")
-        exec_netns(h, f"nc {v6_flag}-l -p 53 -k >/dev/null 2>&1 &")
-    time.sleep(1)
+    # Mỗi host 1 tiến trình listeners.py giữ cả 3 port; quét ngay khi tất cả báo READY (không sleep đoán mò)
+    families = {h: 4 if h in ['internet', 'serverhcm'] else 6 for h in hosts}
+    listener_grp = listeners.ListenerGroup(families, ACL_PORTS).start()
+    if listener_grp.not_ready:
+        log_ui(txt_wid, f"  ! Listener chưa sẵn sàng trên: {', '.join(listener_grp.not_ready)}")
 
     import concurrent.futures
+    import port_scan
+
+    def scan_src(i, src):
+        # Mỗi nguồn: 1 agent asyncio trong namespace, connect() song song tới mọi (đích, port)
+        dst_ips = {dst: get_target_ip(src, dst) for dst in hosts if dst != src}
+        ports = port_scan.scan_from(src, sorted(set(dst_ips.values())), ACL_PORTS)
+        res = []
+        for j, dst in enumerate(hosts):
+            if i == j:
+                res.append((i, j, 4, "Local", 0.0, True, True, True))
+                continue
+            open_ports = ports[dst_ips[dst]]
+            p_web, p_db, p_dns = (open_ports[p] for p in ACL_PORTS)
+            score, txt = acl_label(src, dst, p_web, p_db, p_dns)
+            res.append((i, j, score, txt, p_web, p_db, p_dns))
+        return res
 
-    def scan_combo(i, j, src, dst):
-        if i == j: return (i, j, 4, "Local", 0.0, True, True, True)
-        ip_target = get_target_ip(src, dst)
-        rtt_val = measure_rtt(src, dst)
-        p_ping = rtt_val >= 0
-        p_web = probe_port_fast(src, dst, ip_target, 80)
-        p_db = probe_port_fast(src, dst, ip_target, 3306)
-        p_dns = probe_port_fast(src, dst, ip_target, 53)
-        
-        # Mapping Rule của Tường lửa để chấm màu và nhãn (Bỏ qua Ping vì ICMP luôn được cấp phép để định tuyến IPv6)
-        if not p_web and not p_db and not p_dns:
-            score = 0
-            txt = "DENY"
-        elif p_web and p_db and p_dns:
-            if src.startswith('db') and dst.startswith('db'):
-                txt = "DB CLUSTER\n(Allow All)"
-            else:
-                txt = "ALLOW\nALL"
-            score = 4
-        elif p_web and not p_db and not p_dns:
-            score = 2
-            txt = "ALLOW\nWEB (80)"
-        elif p_db and not p_web and not p_dns:
-            score = 3
-            txt = "ALLOW\nDB (3306)"
-        elif p_dns and not p_web and not p_db:
-            score = 1
-            txt = "ALLOW\nDNS (53)"
-        else:
-            score = 2
-            t = []
-            if p_web: t.append("P80")
-            if p_db: t.append("P33")
-            if p_dns: t.append("P53")
-            txt = "Mix:\n" + "\n".join(t)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=N) as executor:
+            futures = [executor.submit(scan_src, i, src) for i, src in enumerate(hosts)]
             
-        return (i, j, score, txt, p_ping, p_web, p_db, p_dns)
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = []
-        for i, src in enumerate(hosts):
-            for j, dst in enumerate(hosts):
-                futures.append(executor.submit(scan_combo, i, j, src, dst))
-        
-        for future in concurrent.futures.as_completed(futures):
-            i, j, score, txt, rtt_val, p_web, p_db, p_dns = future.result()
-            mat[i, j] = score
-            texts[i][j] = txt
-            raw_c3[i][j] = (rtt_val, p_web, p_db, p_dns)
-            log_ui(txt_wid, f"  + Xong quét {hosts[i]} -> {hosts[j]} (Score: {score}/4)")
-
-    for h in hosts: 
-        exec_netns(h, "fuser -k -9 80/tcp 3306/tcp 53/tcp >/dev/null 2>&1")
-    
-    from matplotlib.colors import ListedColormap
-    fig, ax = plt.subplots(figsize=(12, 10))
-    # Bản đồ 5 cấp màu: Đỏ (Deny) -> Cam (DNS) -> Vàng (Web) -> Xanh Lơ (DB) -> Xanh Lá (Local/Cluster All)
-    cmap = ListedColormap(['#d90429', '#f4a261', '#e9c46a', '#a8dadc', '#40916c'])
-    cax = ax.imshow(mat, cmap=cmap, vmin=0, vmax=4)
-    
-    ax.set_xticks(range(N))
-    ax.set_yticks(range(N))
-    ax.set_xticklabels(labels, rotation=45, ha='right')
-    ax.set_yticklabels(labels)
+            for future in concurrent.futures.as_completed(futures):
+                for i, j, score, txt, p_web, p_db, p_dns in future.result():
+                    mat[i, j] = score
+                    texts[i][j] = txt
+                    raw_c3[i][j] = (p_web, p_db, p_dns)
+                    log_ui(txt_wid, f"  + Xong quét {hosts[i]} -> {hosts[j]} (Score: {score}/4)")
+    finally:
+        listener_grp.stop()
+
+    # RTT cả ma trận lấy trong một lượt quét song song, SAU khi quét port và lúc fabric không có iperf
+    # (Case 4/5 chạy song song sẽ tạm dừng bơm tải vài giây này) → cột Ping_RTT_ms không bị nhiễu tải
+    with FABRIC.idle():
+        rtt_mat = measure_matrix(hosts, paths=False)['rtt']
     for i in range(N):
         for j in range(N):
-            cl = "black" if (0 < mat[i,j] < 4) else "white"
-            ax.text(j, i, texts[i][j], ha="center", va="center", color=cl, fontweight='bold', fontsize=7)
+            raw_c3[i][j] = (0.0 if i == j else float(rtt_mat[i, j]),) + raw_c3[i][j]
+    
+    path = None
+    if PLOTS_ENABLED:
+        from matplotlib.colors import ListedColormap
+        fig, ax = _figure((12, 10))
+        # Bản đồ 5 cấp màu: Đỏ (Deny) -> Cam (DNS) -> Vàng (Web) -> Xanh Lơ (DB) -> Xanh Lá (Local/Cluster All)
+        cmap = ListedColormap(['#d90429', '#f4a261', '#e9c46a', '#a8dadc', '#40916c'])
+        cax = ax.imshow(mat, cmap=cmap, vmin=0, vmax=4)
+    
+        ax.set_xticks(range(N))
+        ax.set_yticks(range(N))
+        ax.set_xticklabels(labels, rotation=45, ha='right')
+        ax.set_yticklabels(labels)
+        for i in range(N):
+            for j in range(N):
+                cl = "black" if (0 < mat[i,j] < 4) else "white"
+                ax.text(j, i, texts[i][j], ha="center", va="center", color=cl, fontweight='bold', fontsize=7)
             
-    ax.set_title("CASE 3: MA TRẬN PHÂN QUYỀN TƯỜNG LỬA (ACL ZERO TRUST)", fontweight='bold')
-    fig.tight_layout()
-    path = os.path.join(LOG_DIR, "case3_acl_heatmap.png")
-    fig.savefig(path, dpi=150)
-    plt.close(fig)
+        ax.set_title("CASE 3: MA TRẬN PHÂN QUYỀN TƯỜNG LỬA (ACL ZERO TRUST)", fontweight='bold')
+        fig.tight_layout()
+        path = os.path.join(LOG_DIR, "case3_acl_heatmap.png")
+        fig.savefig(path, dpi=150)
     
     import csv 
     csv_path = os.path.join(LOG_DIR, "case3_acl_heatmap.csv")
@@ -378,9 +496,14 @@ def case3_firewall_acl(txt_wid):
                 rtt, w80, w33, w53 = raw_c3[i][j]
                 w.writerow([_src, _dst, rtt, w80, w33, w53, mat[i][j]])
                 
-    log_ui(txt_wid, f"  -> Xong Case 3! Đã lưu tại: {path} và {csv_path}")
+    log_ui(txt_wid, f"  -> Xong Case 3! Đã lưu tại: {path or '-'} và {csv_path}")
+    return {'hosts': hosts, 'acl_score': mat.tolist(), 'png': path, 'csv': csv_path}
 
 def measure_static_bandwidths(traffic_type):
+    with FABRIC.busy():
+        return _measure_static_bandwidths(traffic_type)
+
+def _measure_static_bandwidths(traffic_type):
     # Dọn dẹp iperf cũ
     for n in ['db_server1', 'db_server2', 'web_server1', 'web_server2']:
         exec_netns(n, "killall -9 iperf 2>/dev/null")
@@ -399,17 +522,18 @@ def measure_static_bandwidths(traffic_type):
 
     time.sleep(1) # Cho iperf TCP handshake ổn định
     
-    l1 = sum([get_rx_tx_bytes('s1', f's1-eth{i}')[1] for i in [1, 2, 3]])
-    l2 = sum([get_rx_tx_bytes('s2', f's2-eth{i}')[1] for i in [1, 2, 3]])
+    # Chụp s1 và s2 trong cùng một snapshot để 2 Spine được so sánh tại cùng thời điểm
+    snap1 = counters.snapshot(['s1', 's2'])
     time.sleep(4)
-    c1 = sum([get_rx_tx_bytes('s1', f's1-eth{i}')[1] for i in [1, 2, 3]])
-    c2 = sum([get_rx_tx_bytes('s2', f's2-eth{i}')[1] for i in [1, 2, 3]])
+    snap2 = counters.snapshot(['s1', 's2'])
+    l1, c1 = [counters.total_bytes(sn, 's1', SPINE_INTFS['s1']) for sn in (snap1, snap2)]
+    l2, c2 = [counters.total_bytes(sn, 's2', SPINE_INTFS['s2']) for sn in (snap1, snap2)]
     
     for n in ['db_server1', 'db_server2', 'web_server1', 'web_server2']: 
         exec_netns(n, "killall -9 iperf 2>/dev/null")
         
-    mbps1 = ((c1 - l1) * 8) / (4 * 1000000.0)
-    mbps2 = ((c2 - l2) * 8) / (4 * 1000000.0)
+    mbps1 = counters.rate_mbps(snap1, snap2, 's1', SPINE_INTFS['s1'])
+    mbps2 = counters.rate_mbps(snap1, snap2, 's2', SPINE_INTFS['s2'])
     return round(mbps1, 2), round(mbps2, 2), l1, c1, l2, c2
 
 def case4_ecmp_balance(txt_wid):
@@ -425,25 +549,27 @@ def case4_ecmp_balance(txt_wid):
     v_s1 = [s1_off, s1_on]
     v_s2 = [s2_off, s2_on]
     
-    fig, ax = plt.subplots(figsize=(7, 6))
-    x = np.arange(2)
-    width = 0.5
-    
-    p1 = ax.bar(x, v_s1, width, label='Spine 1 (S1)', color='#457b9d')
-    p2 = ax.bar(x, v_s2, width, bottom=v_s1, label='Spine 2 (S2)', color='#e63946')
-    ax.set_ylabel('Băng thông trung bình (Mbps)')
-    ax.set_title('CASE 4: PHÂN BỔ TẢI ECMP QUA 2 MỐC TRẠNG THÁI', fontweight='bold')
-    ax.set_xticks(x)
-    ax.set_xticklabels(categories)
-    ax.legend()
-    # Thêm Label số học
-    ax.bar_label(p1, label_type='center', color='white', fontweight='bold', fmt='%.2f M')
-    ax.bar_label(p2, label_type='center', color='white', fontweight='bold', fmt='%.2f M')
-    
-    fig.tight_layout()
-    path = os.path.join(LOG_DIR, "case4_ecmp_balance.png")
-    fig.savefig(path, dpi=150)
-    plt.close(fig)
+    path = None
+    if PLOTS_ENABLED:
+        fig, ax = _figure((7, 6))
+        import numpy as np
+        x = np.arange(2)
+        width = 0.5
+    
+        p1 = ax.bar(x, v_s1, width, label='Spine 1 (S1)', color='#457b9d')
+        p2 = ax.bar(x, v_s2, width, bottom=v_s1, label='Spine 2 (S2)', color='#e63946')
+        ax.set_ylabel('Băng thông trung bình (Mbps)')
+        ax.set_title('CASE 4: PHÂN BỔ TẢI ECMP QUA 2 MỐC TRẠNG THÁI', fontweight='bold')
+        ax.set_xticks(x)
+        ax.set_xticklabels(categories)
+        ax.legend()
+        # Thêm Label số học
+        ax.bar_label(p1, label_type='center', color='white', fontweight='bold', fmt='%.2f M')
+        ax.bar_label(p2, label_type='center', color='white', fontweight='bold', fmt='%.2f M')
+    
+        fig.tight_layout()
+        path = os.path.join(LOG_DIR, "case4_ecmp_balance.png")
+        fig.savefig(path, dpi=150)
     
     import csv 
     csv_path = os.path.join(LOG_DIR, "case4_ecmp_balance.csv")
@@ -453,7 +579,9 @@ def case4_ecmp_balance(txt_wid):
         w.writerow(['Mốc 1 (Single Flow)', s1_l1, s1_c1, s2_l1, s2_c1, s1_off, s2_off])
         w.writerow(['Mốc 2 (Multi Flow)', s1_l2, s1_c2, s2_l2, s2_c2, s1_on, s2_on])
         
-    log_ui(txt_wid, f"  -> Xong Case 4! Đã lưu tại: {path} và {csv_path}")
+    log_ui(txt_wid, f"  -> Xong Case 4! Đã lưu tại: {path or '-'} và {csv_path}")
+    return {'single_flow_mbps': {'s1': s1_off, 's2': s2_off}, 'multi_flow_mbps': {'s1': s1_on, 's2': s2_on},
+            'png': path, 'csv': csv_path}
 
 def case5_path_tracing(txt_wid, src, dst):
     log_ui(txt_wid, f"[CASE 5] Bắt đầu Trace đường đi từ {src} đến {dst}...")
@@ -482,53 +610,51 @@ def case5_path_tracing(txt_wid, src, dst):
     exec_netns(dst, "iperf -s -V -D")
     time.sleep(1)
     
-    # 3. Bơm Data TCP kịch trần bằng Iperf Client (Sử dụng -P 8 Đa luồng để ép OSPF chia rẽ ECMP)
-    log_ui(txt_wid, f"  -> Đang bơm lưu lượng Data MAX Băng thông bằng luồng TCP Iperf (-V Nhiều luồng)...")
-    exec_netns(src, f"iperf -c {dst_ip} -V -t 10 -P 8 >/dev/null 2>&1 &")
-    
-    all_routers = ['s1', 's2', 's3', 's4', 's5', 's7', 'r1']
-    nodes_to_monitor = [src, dst] + all_routers
-    throughput_sample = {n: 0.0 for n in nodes_to_monitor}
-    
-    # 4. Thu thập toàn bộ trạng thái Bytes truyền qua các Port trên Topology chuẩn xác trong vòng 3.5 giây
-    time.sleep(1.5) # Để iperf tăng gia tốc tới định
-    log_ui(txt_wid, "  -> Đang thu hình dòng chảy Bytes của luồng Iperf qua hệ thống Spine-Leaf...")
-    bytes_t1 = {}
-    raw_counters_t1 = {}
-    raw_counters_t2 = {}
-    t1 = time.time()
-    for n in nodes_to_monitor:
-        out = exec_netns(n, "ls /sys/class/net/ 2>/dev/null").strip().split()
-        intfs = [i for i in out if i not in ['lo', 'vxlan100']]
-        for i in intfs:
-            rx, tx = get_rx_tx_bytes(n, i)
-            bytes_t1[(n, i)] = (rx, tx)
-            raw_counters_t1[f"{n}_{i}"] = max(rx, tx)
+    # Toàn bộ pha bơm iperf + đo bộ đếm nằm trong FABRIC.busy(): Case 3 chạy song song sẽ không đo RTT giữa pha này
+    with FABRIC.busy():
+        # 3. Bơm Data TCP kịch trần bằng Iperf Client (Sử dụng -P 8 Đa luồng để ép OSPF chia rẽ ECMP)
+        log_ui(txt_wid, f"  -> Đang bơm lưu lượng Data MAX Băng thông bằng luồng TCP Iperf (-V Nhiều luồng)...")
+        exec_netns(src, f"iperf -c {dst_ip} -V -t 10 -P 8 >/dev/null 2>&1 &")
+    
+        all_routers = ['s1', 's2', 's3', 's4', 's5', 's7', 'r1']
+        nodes_to_monitor = [src, dst] + all_routers
+        throughput_sample = {n: 0.0 for n in nodes_to_monitor}
+    
+        # 4. Thu thập toàn bộ trạng thái Bytes truyền qua các Port trên Topology chuẩn xác trong vòng 3.5 giây
+        time.sleep(1.5) # Để iperf tăng gia tốc tới định
+        log_ui(txt_wid, "  -> Đang thu hình dòng chảy Bytes của luồng Iperf qua hệ thống Spine-Leaf...")
+        bytes_t1 = {}
+        raw_counters_t1 = {}
+        raw_counters_t2 = {}
+        # Một snapshot = mọi interface của mọi node được chụp cùng một thời điểm (không còn lệch mẫu giữa các cổng)
+        snap1 = counters.snapshot(nodes_to_monitor)
+        for n, intf_map in snap1['nodes'].items():
+            for i, (rx, tx) in intf_map.items():
+                if i in ['lo', 'vxlan100']: continue
+                bytes_t1[(n, i)] = (rx, tx)
+                raw_counters_t1[f"{n}_{i}"] = max(rx, tx)
             
-    time.sleep(3.5) # Time Block đo đạc
-    
-    t2 = time.time()
-    dt = t2 - t1
-    for n in nodes_to_monitor:
-        out = exec_netns(n, "ls /sys/class/net/ 2>/dev/null").strip().split()
-        intfs = [i for i in out if i not in ['lo', 'vxlan100']]
-        for i in intfs:
-            if (n, i) not in bytes_t1: continue
-            rx, tx = get_rx_tx_bytes(n, i)
-            raw_counters_t2[f"{n}_{i}"] = max(rx, tx)
-            rx1, tx1 = bytes_t1[(n, i)]
-            mbps_rx = ((rx - rx1) * 8) / dt / 1000000.0
-            mbps_tx = ((tx - tx1) * 8) / dt / 1000000.0
-            max_intf = max(mbps_rx, mbps_tx)
-            if max_intf > throughput_sample[n]:
-                throughput_sample[n] = max_intf
-
-    # Tắt iperf và Đóng lại Firewall như cũ
-    exec_netns(src, "killall -9 iperf 2>/dev/null")
-    exec_netns(dst, "killall -9 iperf 2>/dev/null")
-    for r in all_routers:
-        exec_netns(r, "ip6tables -D FORWARD -p tcp --dport 5001 -j ACCEPT 2>/dev/null")
-    exec_netns(dst, "ip6tables -D INPUT -p tcp --dport 5001 -j ACCEPT 2>/dev/null")
+        time.sleep(3.5) # Time Block đo đạc
+    
+        snap2 = counters.snapshot(nodes_to_monitor)
+        dt = snap2['time'] - snap1['time']
+        for n, intf_map in snap2['nodes'].items():
+            for i, (rx, tx) in intf_map.items():
+                if (n, i) not in bytes_t1: continue
+                raw_counters_t2[f"{n}_{i}"] = max(rx, tx)
+                rx1, tx1 = bytes_t1[(n, i)]
+                mbps_rx = ((rx - rx1) * 8) / dt / 1000000.0
+                mbps_tx = ((tx - tx1) * 8) / dt / 1000000.0
+                max_intf = max(mbps_rx, mbps_tx)
+                if max_intf > throughput_sample[n]:
+                    throughput_sample[n] = max_intf
+
+        # Tắt iperf và Đóng lại Firewall như cũ
+        exec_netns(src, "killall -9 iperf 2>/dev/null")
+        exec_netns(dst, "killall -9 iperf 2>/dev/null")
+        for r in all_routers:
+            exec_netns(r, "ip6tables -D FORWARD -p tcp --dport 5001 -j ACCEPT 2>/dev/null")
+        exec_netns(dst, "ip6tables -D INPUT -p tcp --dport 5001 -j ACCEPT 2>/dev/null")
     
     # Lọc ra các Node vượt mức traffic > 50 Mbps (Có tải tham gia vào luồng xoáy)
     active_switches = [r for r in all_routers if throughput_sample[r] > 50.0]
@@ -592,36 +718,37 @@ def case5_path_tracing(txt_wid, src, dst):
             throughput_sample[p] = base_tp
             
     # RENDER BẢNG MATPLOTLIB (TABLE DẠNG MA TRẬN YÊU CẦU CỦA USER)
+    img_path = None
     cols = len(final_path)
     table_data = [final_path, [f"{max(0.0, throughput_sample[p]):.0f}" for p in final_path]]
     row_labels = ["Path", "Thông lượng (Mbps)"]
     
-    fig, ax = plt.subplots(figsize=(max(8, cols * 1.5), 3))
-    ax.axis('off')
-    ax.axis('tight')
-    
-    # Can thiệp vẽ lưới bảng Table Grid Line
-    table = ax.table(cellText=table_data, rowLabels=row_labels, loc='center', cellLoc='center')
-    table.scale(1, 4) 
-    table.set_fontsize(14)
-    
-    for (row, col), cell in table.get_celld().items():
-        cell.set_edgecolor('black')
-        cell.set_linewidth(1.5)
-        # Bố trí nền và in đậm như thiết kế Excel
-        if row == 0 and col >= 0:
-            cell.set_text_props(weight='bold', color='#1d3557')
-            cell.set_facecolor('#e8f1f5')
-        elif col == -1:
-            cell.set_text_props(weight='bold')
-            cell.set_facecolor('#f4a261')
+    if PLOTS_ENABLED:
+        fig, ax = _figure((max(8, cols * 1.5), 3))
+        ax.axis('off')
+        ax.axis('tight')
+    
+        # Can thiệp vẽ lưới bảng Table Grid Line
+        table = ax.table(cellText=table_data, rowLabels=row_labels, loc='center', cellLoc='center')
+        table.scale(1, 4) 
+        table.set_fontsize(14)
+    
+        for (row, col), cell in table.get_celld().items():
+            cell.set_edgecolor('black')
+            cell.set_linewidth(1.5)
+            # Bố trí nền và in đậm như thiết kế Excel
+            if row == 0 and col >= 0:
+                cell.set_text_props(weight='bold', color='#1d3557')
+                cell.set_facecolor('#e8f1f5')
+            elif col == -1:
+                cell.set_text_props(weight='bold')
+                cell.set_facecolor('#f4a261')
             
-    ax.set_title(f"BẢNG ĐIỀU TRA ĐƯỜNG ĐI ROUTING PURE-IPV6\nTỪ [{src.upper()}] ĐẾN [{dst.upper()}]", fontweight='bold', pad=20, fontsize=15)
+        ax.set_title(f"BẢNG ĐIỀU TRA ĐƯỜNG ĐI ROUTING PURE-IPV6\nTỪ [{src.upper()}] ĐẾN [{dst.upper()}]", fontweight='bold', pad=20, fontsize=15)
     
-    fig.tight_layout()
-    img_path = os.path.join(LOG_DIR, "case5_path_tracing.png")
-    fig.savefig(img_path, dpi=160, bbox_inches='tight')
-    plt.close(fig)
+        fig.tight_layout()
+        img_path = os.path.join(LOG_DIR, "case5_path_tracing.png")
+        fig.savefig(img_path, dpi=160, bbox_inches='tight')
     
     import csv 
     csv_path = os.path.join(LOG_DIR, "case5_path_tracing.csv")
@@ -642,10 +769,67 @@ def case5_path_tracing(txt_wid, src, dst):
                         b1, b2 = val1, val2
             w.writerow([idx + 1, p_item, best_intf, b1, b2, f"{dt*1000:.0f}ms", f"{max(0.0, throughput_sample[p_item]):.2f}"])
             
-    log_ui(txt_wid, f"  -> Xong Case 5! Đã lưu tại: {img_path} và {csv_path}")
+    log_ui(txt_wid, f"  -> Xong Case 5! Đã lưu tại: {img_path or '-'} và {csv_path}")
+    return {'src': src, 'dst': dst, 'path': final_path,
+            'throughput_mbps': {p: round(max(0.0, throughput_sample[p]), 2) for p in final_path},
+            'png': img_path, 'csv': csv_path}
+
+# ================= LẬP LỊCH CHẠY SONG SONG CÁC CASE =================
+# Dấu chân tài nguyên của từng Case: (mutates = thứ bị thay đổi/chiếm giữ, uses = thứ chỉ đọc/phụ thuộc)
+# 'counters:spine' = bơm iperf + đo bộ đếm interface: 2 case cùng đo sẽ cộng tải của nhau vào số đo.
+# Case 1/2 đánh sập link s2 / ospf6d s1 nên đụng mọi case đi qua fabric; Case 4 dùng port 3306 của DB
+# giống listener của Case 3 nên 2 case này vẫn tuần tự. Case 3 (quét ACL) chạy song song được với Case 5:
+# RTT của Case 3 đo trong FABRIC.idle(), chỉ chờ pha iperf của Case 5 chứ không chờ cả Case.
+CASE_FOOTPRINTS = {
+    0: ({'link:s2', 'daemon:s1', 'route:s1', 'proc:web_server1', 'counters:spine'}, set()),
+    1: ({'link:s2', 'link:s3-eth0', 'link:s4-eth0', 'link:s5-eth0', 'proc:web_server1', 'counters:spine'}, set()),
+    2: ({f'port:{h}:{p}' for h in NODE_LIST for p in ACL_PORTS}, {'link:s2', 'route:s1', 'daemon:s1'}),
+    3: ({'proc:iperf', 'counters:spine', 'port:db_server1:3306', 'port:db_server2:3306'}, {'link:s2', 'route:s1'}),
+    4: ({'proc:iperf', 'counters:spine', 'fw:5001'}, {'link:s2', 'route:s1'}),
+}
+CASE_NAMES = ['Case 1', 'Case 2', 'Case 3', 'Case 4', 'Case 5']
+
+def run_cases(to_run, txt_wid, case5_src='web_server1', case5_dst='db_server1', parallel=True):
+    """
+    Chạy các Case được chọn: Case không xung đột chạy song song, Case xung đột chạy tuần tự.
+    parallel=False: ép chạy tuần tự hoàn toàn. Trả về list timing kèm 'result' của từng Case.
+    """
+    fns = {
+        0: lambda: case1_ospf_startup(txt_wid),
+        1: lambda: case2_s1_failover(txt_wid),
+        2: lambda: case3_firewall_acl(txt_wid),
+        3: lambda: case4_ecmp_balance(txt_wid),
+        4: lambda: case5_path_tracing(txt_wid, case5_src, case5_dst),
+    }
+    jobs = [scheduler.Job(CASE_NAMES[i], fns[i], *CASE_FOOTPRINTS[i]) for i in to_run]
+    if not parallel:
+        for j in jobs:
+            j.mutates.add('serial')
+
+    def on_event(job, kind, info):
+        if kind == 'start':
+            log_ui(txt_wid, f"  [Lịch] Bắt đầu {job.name} tại t={info:.1f}s")
+        elif kind == 'error':
+            log_ui(txt_wid, f"  [Lịch] {job.name} LỖI: {info}")
+        elif kind == 'done':
+            log_ui(txt_wid, f"  [Lịch] Xong {job.name} sau {info:.1f}s")
+
+    timings = scheduler.run_jobs(jobs, on_event)
+
+    import csv
+    csv_path = os.path.join(LOG_DIR, "run_charts_timings.csv")
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['Case', 'Start_Seconds', 'End_Seconds', 'Duration_Seconds', 'Status'])
+        for tm in timings:
+            w.writerow([tm['name'], tm['start'], tm['end'], tm['duration'], tm['status']])
+    total = max((tm['end'] for tm in timings), default=0.0)
+    serial = sum(tm['duration'] for tm in timings)
+    log_ui(txt_wid, f"  [Lịch] Tổng thời gian {total:.1f}s (nếu chạy tuần tự: {serial:.1f}s). Chi tiết: {csv_path}")
+    return timings
 
 # ================= GIAO DIỆN GUI TKINTER =================
-class AppTool(tk.Tk):
+class AppTool(tk.Tk if tk else object):
     def __init__(self):
         super().__init__()
         self.title("IPv6 Data Center Orchestrator & Analyzer v1.0")
@@ -683,6 +867,7 @@ class AppTool(tk.Tk):
         ttk.Button(f_btn, text="⚡ Ping Test", command=lambda: self.run_tool('ping')).pack(side=tk.LEFT, padx=5)
         ttk.Button(f_btn, text="📍 Traceroute Path", command=lambda: self.run_tool('path')).pack(side=tk.LEFT, padx=5)
         ttk.Button(f_btn, text="📉 Đếm Loss %", command=lambda: self.run_tool('loss')).pack(side=tk.LEFT, padx=5)
+        ttk.Button(f_btn, text="🌐 Quét Ma Trận", command=self.run_matrix).pack(side=tk.LEFT, padx=5)
         
         # Xóa các checkbox dư thừa bị ghi đè nhầm ở lần patch trước
         
@@ -730,6 +915,7 @@ class AppTool(tk.Tk):
         btn_sel = tk.Button(f_gen, text="In Các Trường Hợp Chọn", bg="#fca311", font=("Arial", 10, "bold"), height=2, command=lambda: self.run_charts(False))
         btn_sel.pack(side=tk.RIGHT, expand=True, fill=tk.X, padx=5)
         
+        ui_events.pump(self)
         log_ui(self.txt_log, "=== HỆ THỐNG ĐÃ SẴN SÀNG ===")
         log_ui(self.txt_log, f"Mọi kết quả Biểu Đồ & Log sẽ được lưu tại: {LOG_DIR}")
         
@@ -741,7 +927,7 @@ class AppTool(tk.Tk):
             return
             
         def task():
-            self.txt_log.insert(tk.END, f"\n[Executing] {action.upper()} từ {src} -> {dst}...\n")
+            log_ui(self.txt_log, f"\n[Executing] {action.upper()} từ {src} -> {dst}...")
             if action == 'ping':
                 rtt = measure_rtt(src, dst)
                 log_ui(self.txt_log, f"➜ Độ trễ (RTT): {rtt} ms" if rtt>=0 else "➜ Lỗi: Không thể Ping (Timeout)")
@@ -754,28 +940,41 @@ class AppTool(tk.Tk):
                 
         threading.Thread(target=task, daemon=True).start()
 
+    def run_matrix(self):
+        def task():
+            log_ui(self.txt_log, f"\n[Executing] QUÉT MA TRẬN {len(NODE_LIST)}x{len(NODE_LIST)} (RTT / Loss / Path)...")
+            t0 = time.time()
+            res = measure_matrix()
+            for i, src in enumerate(res['nodes']):
+                for j, dst in enumerate(res['nodes']):
+                    if i == j: continue
+                    rtt = res['rtt'][i, j]
+                    rtt_txt = f"{rtt:.3f} ms" if rtt >= 0 else "Timeout"
+                    log_ui(self.txt_log, f"➜ {src} -> {dst}: RTT {rtt_txt} | Loss {res['loss'][i, j]}%\n    {res['path'].get((src, dst), '')}")
+            log_ui(self.txt_log, f"➜ Xong quét ma trận sau {time.time() - t0:.1f}s")
+
+        threading.Thread(target=task, daemon=True).start()
+
     def run_charts(self, build_all=False):
         to_run = [i for i in range(5) if self.chk_vars[i].get() or build_all]
         if not to_run:
             messagebox.showwarning("Nhắc nhở", "Hãy chọn ít nhất 1 biểu đồ cần chạy!")
             return
+        src = self.src_cbo.get()
+        dst = self.dst_cbo.get()
             
         def task():
             log_ui(self.txt_log, "\n>>> BẮT ĐẦU CHẠY KỊCH BẢN XUẤT BIỂU ĐỒ <<<")
-            if 0 in to_run: case1_ospf_startup(self.txt_log)
-            if 1 in to_run: case2_s1_failover(self.txt_log)
-            if 2 in to_run: case3_firewall_acl(self.txt_log)
-            if 3 in to_run: case4_ecmp_balance(self.txt_log)
-            if 4 in to_run: 
-                src = self.src_cbo.get()
-                dst = self.dst_cbo.get()
-                case5_path_tracing(self.txt_log, src, dst)
+            run_cases(to_run, self.txt_log, src, dst)
             log_ui(self.txt_log, ">>> KẾT THÚC CHUỖI XUẤT BIỂU ĐỒ. KIỂM TRA LOG_DIR! <<<")
-            messagebox.showinfo("Thành công", f"Đã kết xuất biểu đồ hoàn tất!\nXem tại folder:\n{LOG_DIR}")
+            ui_events.post_call(messagebox.showinfo, "Thành công", f"Đã kết xuất biểu đồ hoàn tất!\nXem tại folder:\n{LOG_DIR}")
         
         threading.Thread(target=task, daemon=True).start()
 
 if __name__ == '__main__':
+    if tk is None:
+        print("Máy không có Tkinter -> hãy dùng chế độ dòng lệnh: python3 cli.py --help")
+        sys.exit(1)
     if os.geteuid() != 0:
         print("LƯU Ý: Công cụ đang chạy không dưới quyền ROOT, sẽ sử dụng cơ chế sudo bên trong hệ thống.")
     app = AppTool()
@@ -9,6 +9,7 @@ MÔ HÌNH BÀI TẬP: BORDER-SPINE-LEAF PURE IPV6 INTERNAL + NAT64 TAYGA
 import os
 import sys
 import time
+import subprocess
 
 from mininet.topo import Topo
 from mininet.net import Mininet
@@ -16,6 +17,18 @@ from mininet.node import Node
 from mininet.log import setLogLevel, info
 from mininet.cli import CLI
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+import ipbatch
+import teardown
+import convergence
+import frr
+
+# Thời gian chờ tối đa cho OSPFv3 hội tụ lúc dựng mạng (máy nhanh thường chỉ mất vài giây)
+OSPF_TIMEOUT = 60
+# Tên registry teardown (/tmp/teardown/<tag>.json) của topology này
+TEARDOWN_TAG = 'baitap4'
+HOSTS_CLEAN_CMD = "sed -i '/# MININET-DNS-MAPPING-START/,/# MININET-DNS-MAPPING-END/d' /etc/hosts"
+
 class TechVerseCLI(CLI):
     """
     Tuỳ biến dòng lệnh Mininet CLI (dấu nhắc mininet>).
@@ -112,23 +125,11 @@ class FRRouter(Node):
         self.cmd(f'rm -rf {confDir} && mkdir -p {confDir}')
         self.cmd(f'chmod 777 {confDir}')
 
-        # Khung file config FRR cơ bản (Base Configuration)
-        base_conf = (
-            f"hostname {self.name}\n"
-            "log stdout\n"
-            "service advanced-vty\n"
-            "!\n"
-            "line vty\n"
-            " no login\n" # Không cần pass khi truy cập console CLI của Router
-            "!\n"
-        )
-        with open(f'{confDir}/zebra.conf', 'w') as f: f.write(base_conf)
-        with open(f'{confDir}/ospf6d.conf', 'w') as f: f.write(base_conf)
+        # Render sẵn zebra.conf + ospf6d.conf (kèm toàn bộ cấu hình OSPF6 của router) từ OSPF_PLAN
+        # (hoặc plan truyền qua addHost(..., ospf_plan=...) như clos.py).
+        # Daemon KHÔNG khởi chạy ở đây mà được start_frr() bật đồng thời cho mọi router sau khi gán IP.
+        frr.write_configs(self.name, params.get('ospf_plan') or convergence.OSPF_PLAN)
         self.cmd(f'chown -R frr:frr {confDir}')
-        
-        # Khởi chạy Zombie Daemon Zebra (quản lý interface phần cứng gốc) và OSPF6D (động cơ tính toán Routing IPv6)
-        self.cmd(f'/usr/lib/frr/zebra -d -u frr -g frr -A 127.0.0.1 -f {confDir}/zebra.conf -i {confDir}/zebra.pid')
-        self.cmd(f'/usr/lib/frr/ospf6d -d -u frr -g frr -A 127.0.0.1 -f {confDir}/ospf6d.conf -i {confDir}/ospf6d.pid')
 
     def terminate(self):
         # Lúc tắt Mininet, tiến hành ám sát các tiến trình chạy ngầm FRR để không nghẽn RAM máy chính.
@@ -193,6 +194,37 @@ class LogicNetworkTopo(Topo):
         self.addLink(r1, serverhcm, intfName1='r1-eth1', intfName2='serverhcm-eth0')
         self.addLink(r1, internet, intfName1='r1-eth2', intfName2='internet-eth0')
 
+def apply_batches(net, configs):
+    """Áp dụng đồng thời các ipbatch.NodeConfig, chỉ in ra node nào có dòng lệnh lỗi."""
+    configs = list(configs)
+    t0 = time.time()
+    results = ipbatch.apply_all(net, configs)
+    for name, (rc, out) in results.items():
+        if rc != 0:
+            info(f'    ! {name}: {out.strip()}\n')
+    info(f'    -> {sum(len(c) for c in configs)} lệnh / {len(results)} node áp dụng trong {time.time() - t0:.2f}s\n')
+
+def start_frr(net, names, timeout=frr.READY_TIMEOUT):
+    """
+    Bật zebra + ospf6d cho mọi router ĐỒNG THỜI (nsenter theo PID, giống ipbatch.apply_all),
+    mỗi router chờ tới khi pid + VTY sẵn sàng. Ghi log router nào chưa sẵn sàng và thời gian từng router.
+    """
+    t0 = time.time()
+    procs = {name: subprocess.Popen(['nsenter', '-t', str(net[name].pid), '-n', 'sh', '-c', frr.start_cmd(name, timeout)],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+             for name in names}
+    done = {}
+    while len(done) < len(procs):
+        for name, p in procs.items():
+            if name not in done and p.poll() is not None:
+                done[name] = (p.returncode, time.time() - t0)
+        time.sleep(0.02)
+    for name, (rc, dt) in done.items():
+        if rc != 0:
+            info(f'*** [CẢNH BÁO] FRR trên {name} chưa sẵn sàng sau {timeout}s\n')
+    info('*** FRR sẵn sàng: ' + ', '.join(f'{n} {dt:.2f}s' for n, (rc, dt) in done.items() if rc == 0) + '\n')
+    return done
+
 def configure_network(net):
     """
     Phần linh hồn của hệ thống. Nạp cấu hình IP, định tuyến và VXLAN lên xương sống Mininet.
@@ -208,146 +240,103 @@ def configure_network(net):
 
     info('*** Gán IPv6 cho Internal Network...\n')
     routers = ['s1', 's2', 's3', 's4', 's5', 's7', 'r1']
+    # Toàn bộ cấu hình được khai báo vào ipbatch.NodeConfig rồi biên dịch thành MỘT script `ip -batch`
+    # cho mỗi node, áp dụng đồng thời cho mọi node (thay vì hàng trăm lần node.cmd()).
+    cfg = {name: ipbatch.NodeConfig(name) for name in net.nameToNode if hasattr(net[name], 'pid')}
     
     # [LOOPBACK]: Mỗi con Router được gán 1 địa chỉ /128 gắn trên Loopback giả lập (mô phỏng Router-ID cực kỳ ổn định).
     for r in routers:
-        node = net[r]
-        node.cmd("ip -6 addr add fc00:1111::%s/128 dev lo" % (r.replace('s', '').replace('r', '9')))
+        cfg[r].addr('lo', "fc00:1111::%s/128" % (r.replace('s', '').replace('r', '9')))
         
-    s1, s2, s3, s4, s5, s7, r1 = [net[x] for x in routers]
     
     # [POINT-TO-POINT]: Cấp địa chỉ IPv6 tĩnh theo chuẩn Subnet /126 cho các liên kết cáp P2P Lõi.
-    # Nhánh Core - Spine/Border
-    s7.cmd('ip -6 addr add fc00:3::1/126 dev s7-eth0'); s1.cmd('ip -6 addr add fc00:3::2/126 dev s1-eth0')
-    s7.cmd('ip -6 addr add fc00:3::5/126 dev s7-eth1'); s2.cmd('ip -6 addr add fc00:3::6/126 dev s2-eth0')
-    s7.cmd('ip -6 addr add fc00:3::9/126 dev s7-eth2'); r1.cmd('ip -6 addr add fc00:3::10/126 dev r1-eth0')
-    
-    # Nhánh Spine S1 - Leaf (3,4,5)
-    s1.cmd('ip -6 addr add fc00:1::1/126 dev s1-eth1'); s3.cmd('ip -6 addr add fc00:1::2/126 dev s3-eth0')
-    s1.cmd('ip -6 addr add fc00:1::5/126 dev s1-eth2'); s4.cmd('ip -6 addr add fc00:1::6/126 dev s4-eth0')
-    s1.cmd('ip -6 addr add fc00:1::9/126 dev s1-eth3'); s5.cmd('ip -6 addr add fc00:1::10/126 dev s5-eth0')
-    
-    # Nhánh Spine S2 - Leaf (3,4,5)
-    s2.cmd('ip -6 addr add fc00:2::1/126 dev s2-eth1'); s3.cmd('ip -6 addr add fc00:2::2/126 dev s3-eth1')
-    s2.cmd('ip -6 addr add fc00:2::5/126 dev s2-eth2'); s4.cmd('ip -6 addr add fc00:2::6/126 dev s4-eth1')
-    s2.cmd('ip -6 addr add fc00:2::9/126 dev s2-eth3'); s5.cmd('ip -6 addr add fc00:2::10/126 dev s5-eth1')
-    
-    # [GATEWAY]: Khai báo địa chỉ Gateway mạng nội bộ trên chân của Leaf Switch túc trực.
-    s3.cmd('ip -6 addr add fd00:10::254/64 dev s3-eth2; ip -6 addr add fd00:10::254/64 dev s3-eth3')
-    s4.cmd('ip -6 addr add fd00:20::254/64 dev s4-eth2; ip -6 addr add fd00:20::254/64 dev s4-eth3')
-    s5.cmd('ip -6 addr add fd00:30::254/64 dev s5-eth2; ip -6 addr add fd00:30::254/64 dev s5-eth3')
+    p2p = [
+        # Nhánh Core - Spine/Border
+        ('s7', 's7-eth0', 'fc00:3::1/126', 's1', 's1-eth0', 'fc00:3::2/126'),
+        ('s7', 's7-eth1', 'fc00:3::5/126', 's2', 's2-eth0', 'fc00:3::6/126'),
+        ('s7', 's7-eth2', 'fc00:3::9/126', 'r1', 'r1-eth0', 'fc00:3::10/126'),
+        # Nhánh Spine S1 - Leaf (3,4,5)
+        ('s1', 's1-eth1', 'fc00:1::1/126', 's3', 's3-eth0', 'fc00:1::2/126'),
+        ('s1', 's1-eth2', 'fc00:1::5/126', 's4', 's4-eth0', 'fc00:1::6/126'),
+        ('s1', 's1-eth3', 'fc00:1::9/126', 's5', 's5-eth0', 'fc00:1::10/126'),
+        # Nhánh Spine S2 - Leaf (3,4,5)
+        ('s2', 's2-eth1', 'fc00:2::1/126', 's3', 's3-eth1', 'fc00:2::2/126'),
+        ('s2', 's2-eth2', 'fc00:2::5/126', 's4', 's4-eth1', 'fc00:2::6/126'),
+        ('s2', 's2-eth3', 'fc00:2::9/126', 's5', 's5-eth1', 'fc00:2::10/126'),
+    ]
+    for n1, i1, a1, n2, i2, a2 in p2p:
+        cfg[n1].addr(i1, a1)
+        cfg[n2].addr(i2, a2)
     
     # [HOSTS]: Gán địa chỉ tĩnh và điều khiển Hướng định tuyến mặc định của các máy trạm đi qua cửa ngõ Gateway.
-    net['web_server1'].cmd('ip -6 addr add fd00:10::1/64 dev web-eth0; ip -6 route add default via fd00:10::254')
-    net['web_server2'].cmd('ip -6 addr add fd00:10::2/64 dev web-eth1; ip -6 route add default via fd00:10::254')
-    net['dns_server1'].cmd('ip -6 addr add fd00:20::1/64 dev dns-eth0; ip -6 route add default via fd00:20::254')
-    net['dns_server2'].cmd('ip -6 addr add fd00:20::2/64 dev dns-eth1; ip -6 route add default via fd00:20::254')
-    net['db_server1'].cmd('ip -6 addr add fd00:30::1/64 dev db-eth0; ip -6 route add default via fd00:30::254')
-    net['db_server2'].cmd('ip -6 addr add fd00:30::2/64 dev db-eth1; ip -6 route add default via fd00:30::254')
+    # (Route mặc định IPv6 viết "::/0" vì dòng ip -batch không nhận cờ -6)
+    for host, intf, addr, gw in [('web_server1', 'web-eth0', 'fd00:10::1/64', 'fd00:10::254'),
+                                 ('web_server2', 'web-eth1', 'fd00:10::2/64', 'fd00:10::254'),
+                                 ('dns_server1', 'dns-eth0', 'fd00:20::1/64', 'fd00:20::254'),
+                                 ('dns_server2', 'dns-eth1', 'fd00:20::2/64', 'fd00:20::254'),
+                                 ('db_server1', 'db-eth0', 'fd00:30::1/64', 'fd00:30::254'),
+                                 ('db_server2', 'db-eth1', 'fd00:30::2/64', 'fd00:30::254')]:
+        cfg[host].addr(intf, addr).route('::/0', via=gw)
 
     # [BRIDGE L2 LÊN L3]: Giải bài toán gom chân Switch cho các Host.
     # Leaf s3 có 2 máy tính cắm vào cổng eth2 và eth3.
     # Để bọn chúng thông với nhau, sinh ra bộ "Cầu nối ảo - Br0", gom eth2 và eth3 vào Bridge. 
-    # Địa chỉ Gateway bây giờ sẽ chuyển lên cắm trên bộ Bridge thay vì từng cổng lẻ tẻ.
-    for leaf, net_ip, eth2, eth3 in [(s3, 'fd00:10::254/64', 's3-eth2', 's3-eth3'),
-                                     (s4, 'fd00:20::254/64', 's4-eth2', 's4-eth3'),
-                                     (s5, 'fd00:30::254/64', 's5-eth2', 's5-eth3')]:
-        leaf.cmd('ip link add name br0 type bridge')
-        leaf.cmd('ip link set br0 up')
-        leaf.cmd(f'ip link set {eth2} master br0') # Cắm dây vào switch ảo br0
-        leaf.cmd(f'ip link set {eth3} master br0')
-        leaf.cmd(f'ip -6 addr add {net_ip} dev br0') # Trả chùm IP Gateway về Lõi Switch (SVI)
-        leaf.cmd(f'ip -6 addr flush dev {eth2}')    # Tẩy trắng IP trên dây thực (Do Bridge xử lý rồi)
-        leaf.cmd(f'ip -6 addr flush dev {eth3}')
+    # Địa chỉ Gateway (SVI) cắm thẳng trên bộ Bridge thay vì từng cổng lẻ tẻ, cổng thực được tẩy trắng IP.
+    for leaf, net_ip, eth2, eth3 in [('s3', 'fd00:10::254/64', 's3-eth2', 's3-eth3'),
+                                     ('s4', 'fd00:20::254/64', 's4-eth2', 's4-eth3'),
+                                     ('s5', 'fd00:30::254/64', 's5-eth2', 's5-eth3')]:
+        cfg[leaf].bridge('br0', ports=[eth2, eth3], addrs=[net_ip]).flush(eth2).flush(eth3)
         
     # [ROUTER XUYÊN MẠNG INTERNET]: Thiết lập IP tĩnh trên R1 đóng vai trò Internet biên.
-    r1.cmd('ifconfig r1-eth1 203.162.1.254/24')
-    r1.cmd('ifconfig r1-eth2 8.8.8.254/24')
+    cfg['r1'].addr('r1-eth1', '203.162.1.254/24').addr('r1-eth2', '8.8.8.254/24')
     # Bổ sung ép default route chuẩn để giải quyết lỗi "Network is unreachable" khi gọi chéo.
-    net['serverhcm'].cmd('ip route add default via 203.162.1.254 2>/dev/null')
-    net['internet'].cmd('ip route add default via 8.8.8.254 2>/dev/null')
+    cfg['serverhcm'].route('default', via='203.162.1.254').route('192.168.255.0/24', via='203.162.1.254')
+    cfg['internet'].route('default', via='8.8.8.254').route('192.168.255.0/24', via='8.8.8.254')
     
-    net['serverhcm'].cmd('ip route add 192.168.255.0/24 via 203.162.1.254')
-    net['internet'].cmd('ip route add 192.168.255.0/24 via 8.8.8.254')
+    apply_batches(net, cfg.values())
     
     info('*** Không bật NAT mặc định. Hãy dùng lệnh: mininet> nat ...\n')
-    time.sleep(2)
-    
-    info('*** Cấu hình OSPFv3 (ospf6d) cho định tuyến mạng IPv6...\n')
     
-    # [HÀM BƠM CẤU HÌNH FRR TỰ ĐỘNG]: Kết nối Netcat (nc) tcp port 2606 trực tiếp với OSPF6 Daemon.
-    # Mọi cấu hình Interface/Area0 sẽ được lập trình gõ lệnh như Cisco IOS mà không cần thao tác bằng tay.
-    def config_ospf6_via_tcp(node, rid, infts, r_extra=""):
-        cmds = f"enable\nconf t\nrouter ospf6\nospf6 router-id {rid}\nexit\n"
-        for i in infts:
-            if i == 'lo' or i == 'br0':
-                cmds += f"interface {i}\nipv6 ospf6 area 0\nexit\n"
-            else:
-                cmds += f"interface {i}\nipv6 ospf6 area 0\nipv6 ospf6 network point-to-point\nexit\n" # Kéo các cổng vật lý vào Spine-Leaf P2P (Triệt tiêu độ trễ DR/BDR)
-        if r_extra:
-            cmds += f"router ospf6\n{r_extra}\nexit\n"
-        cmds += "end\nwr\nexit\n"
-        # Bơm chuỗi lệnh qua TCP 2606 (Port mặc định của OSPF6D VTY) 
-        node.cmd(f'echo -e "{cmds}" | nc -w 1 127.0.0.1 2606 | tr -cd \'\\11\\12\\15\\40-\\176\'')
+    # Cấu hình OSPF6 đã nằm sẵn trong /tmp/<router>/ospf6d.conf (frr.render_ospf6d):
+    # - Leaf S3/S4/S5 BẮT BUỘC đưa `br0` vào OSPF để R1 (không tham gia VXLAN) biết đường về fd00:10,20,30
+    #   khi trả gói NAT64; lưu lượng Tenant-to-Tenant vẫn đi hầm VXLAN nhờ route tĩnh Metric 10.
+    # - R1 redistribute + phát tuyến mặc định (::/0) xuống toàn bộ Spine-Leaf để Server biết đường ra NAT64.
+    info('*** Khởi chạy FRR (zebra + ospf6d) song song trên các router...\n')
+    start_frr(net, routers)
 
-    # Bắn Cấu trúc vào từng Node
-    config_ospf6_via_tcp(s7, '7.7.7.7', ['s7-eth0', 's7-eth1', 's7-eth2', 'lo'])
-    config_ospf6_via_tcp(s1, '1.1.1.1', ['s1-eth0', 's1-eth1', 's1-eth2', 's1-eth3', 'lo'])
-    config_ospf6_via_tcp(s2, '2.2.2.2', ['s2-eth0', 's2-eth1', 's2-eth2', 's2-eth3', 'lo'])
-    
-    # Ở đây chúng ta BẮT BUỘC phải tiếp tục đưa `br0` vào OSPF. 
-    # Lý do: Con Border R1 (cục móp ngoài cùng) KHÔNG HỀ tham gia hầm VXLAN. Nếu không chạy OSPF thả `br0` bay ra ngoài, R1 sẽ mù tịt không biết mạng `fd00:10,20,30` nằm đâu để trả gói tin NAT64 từ Internet về.
-    # Trong khi đó, gói tin nội bộ Tenant-to-Tenant giữa S3/S4/S5 vẫn chắc chắn rớt xuống hầm VXLAN vì ta đã cấu hình IP Static MAC Metric 10 (mạnh hơn OSPF).
-    config_ospf6_via_tcp(s3, '3.3.3.3', ['s3-eth0', 's3-eth1', 'br0', 'lo'])
-    config_ospf6_via_tcp(s4, '4.4.4.4', ['s4-eth0', 's4-eth1', 'br0', 'lo'])
-    config_ospf6_via_tcp(s5, '5.5.5.5', ['s5-eth0', 's5-eth1', 'br0', 'lo'])
-    
-    # [INTERNET ADVERTISEMENT]: Cấu hình cực chuẩn mực của Data Center NAT Router.
-    # Quả cầu r1 thay vì chỉ học đường đi, nó phải là kẻ **Tiêm một mũi tiêm (Redistribute Static/Default)** 
-    # lan tỏa một tuyến đường Mặc định (::/0) đè xuống toàn bộ Spine-Leaf. 
-    # Nhờ vậy máy chủ Server tự biết đường mà quăng các gói tin NAT64 ra r1 mà không bị drop (No Route).
-    config_ospf6_via_tcp(r1, '100.100.100.100', ['r1-eth0', 'lo'], "redistribute static\nredistribute kernel\ndefault-information originate always")
-
-    info('*** OSPFv3 đang hội tụ (Tạm đợi 15s)...\n')
-    time.sleep(15)
+    # Thay vì ngủ cứng 15s: hỏi song song ospf6d (neighbor Full) + bảng route kernel (prefix mong đợi)
+    # của từng router, đi tiếp ngay khi tất cả hội tụ. Hết OSPF_TIMEOUT vẫn đi tiếp nhưng có cảnh báo.
+    info('*** OSPFv3 đang hội tụ (theo dõi neighbor/route, tối đa %ds)...\n' % OSPF_TIMEOUT)
+    report = convergence.wait_converged(convergence.default_specs(routers),
+                                        exec_fn=lambda name, cmd: net[name].cmd(cmd), timeout=OSPF_TIMEOUT)
+    info(convergence.format_report(report))
     
     info('*** Thiết lập Tàu Ngầm Overlay VXLAN (VNI 100) chạy trên giao diện Loopback...\n')
+    overlay = {leaf: ipbatch.NodeConfig(leaf) for leaf in ['s3', 's4', 's5']}
     # [VXLAN]: Leaf s3, s4, s5 đóng vai trò VTEP (Các trạm thu phát của đường hầm).
     for leaf, ip, v6_lo in [('s3', 'fc00:100::3/64', 'fc00:1111::3'), 
                             ('s4', 'fc00:100::4/64', 'fc00:1111::4'), 
                             ('s5', 'fc00:100::5/64', 'fc00:1111::5')]:
-        node = net[leaf]
         # Tạo đường ống VXLAN (ID 100), đóng gói bọc Frame lại và định tuyến dựa trên IP Nguồn VTEP (local v6_lo)
-        node.cmd(f'ip -6 link add vxlan100 type vxlan id 100 dstport 4789 local {v6_lo}')
-        node.cmd('ip link set vxlan100 up')
-        node.cmd(f'ip -6 addr add {ip} dev vxlan100')
+        overlay[leaf].link_add('vxlan100', 'vxlan', f'id 100 dstport 4789 local {v6_lo}').up('vxlan100').addr('vxlan100', ip)
 
     # [BẢNG FDB ĐA CHIỀU (MESH MAPPING)]: Vì không có Controller ngoài, ta phải chỉ rõ đích đến cho VXLAN (Unicast)
     # Nếu đang ở S3, ngõ ra VXLAN sẽ được băm hướng về Loopback của S4(..::4) hoặc S5(..::5)
-    s3.cmd('bridge fdb append 00:00:00:00:00:00 dev vxlan100 dst fc00:1111::4')
-    s3.cmd('bridge fdb append 00:00:00:00:00:00 dev vxlan100 dst fc00:1111::5')
-    
-    s4.cmd('bridge fdb append 00:00:00:00:00:00 dev vxlan100 dst fc00:1111::3')
-    s4.cmd('bridge fdb append 00:00:00:00:00:00 dev vxlan100 dst fc00:1111::5')
-
-    s5.cmd('bridge fdb append 00:00:00:00:00:00 dev vxlan100 dst fc00:1111::3')
-    s5.cmd('bridge fdb append 00:00:00:00:00:00 dev vxlan100 dst fc00:1111::4')
+    for leaf, peers in [('s3', ['4', '5']), ('s4', ['3', '5']), ('s5', ['3', '4'])]:
+        for peer in peers:
+            overlay[leaf].fdb('00:00:00:00:00:00', 'vxlan100', f'fc00:1111::{peer}')
     
     info('*** Cấu hình L3VNI (Điều hướng Gói tin của Server đi qua Đường hầm VXLAN)...\n')
     # Ở giai đoạn này: Thay vì cho phép OSPF dẫn gói tin User băng ngang lõi Spine (Metric 20 mặc định),
     # Ta ép các Subnet đích cưỡng chế phải bị nhét vào ống VXLAN bằng IP Route tĩnh (Metric 10 nhỏ hơn -> Ưu tiên hơn).
+    # S3 (Cụm Web) muốn qua DNS (20) hoặc DB (30), S4 (Cụm DNS) qua Web/DB, S5 (Cụm DB) ngược về Web/DNS: đều trườn vào ống vxlan!
+    subnet_of = {'s3': ('fd00:10::/64', 'fc00:100::3'), 's4': ('fd00:20::/64', 'fc00:100::4'), 's5': ('fd00:30::/64', 'fc00:100::5')}
+    for leaf in overlay:
+        for peer, (subnet, vtep_ip) in subnet_of.items():
+            if peer != leaf:
+                overlay[leaf].route(subnet, via=vtep_ip, dev='vxlan100', metric=10)
     
-    # S3 (Cụm Web) muốn qua DNS (20) hoặc DB (30), phải trườn vào ống vxlan!
-    s3.cmd('ip -6 route add fd00:20::/64 via fc00:100::4 dev vxlan100 metric 10')
-    s3.cmd('ip -6 route add fd00:30::/64 via fc00:100::5 dev vxlan100 metric 10')
-
-    # S4 (Cụm DNS) muốn qua Web (10) hoặc DB (30), ngóc đầu qua vxlan!
-    s4.cmd('ip -6 route add fd00:10::/64 via fc00:100::3 dev vxlan100 metric 10')
-    s4.cmd('ip -6 route add fd00:30::/64 via fc00:100::5 dev vxlan100 metric 10')
-
-    # S5 (Cụm DB) truy vết ngược về Web(10) và DNS(20) thông qua hầm!
-    s5.cmd('ip -6 route add fd00:10::/64 via fc00:100::3 dev vxlan100 metric 10')
-    s5.cmd('ip -6 route add fd00:20::/64 via fc00:100::4 dev vxlan100 metric 10')
+    apply_batches(net, overlay.values())
     
     info('*** Cấy ghép DNS nội bộ (Local /etc/hosts) giả lập cho toàn bộ Môi trường...\n')
     # Ánh xạ tên miền (Domain Name) -> Địa chỉ IP (A/AAAA Record). 
@@ -369,11 +358,31 @@ def configure_network(net):
     with open('/etc/hosts', 'a') as f:
         f.write(hosts_entries)
 
-def mn_cleanup():
-    """Bộ càn quét khổng lồ: Thanh trừng tất cả process Zombie rác, nhả lại RAM và Network sau khi ấn Ctrl+C."""
+def track_resources(net, routers):
+    """
+    Ghi registry teardown ngay sau net.start(): node/link của Mininet + những gì configure_network() sẽ tạo
+    (symlink /var/run/netns, thư mục FRR /tmp/<router>, thư mục tayga, khối /etc/hosts).
+    Mọi daemon (zebra/ospf6d/tayga) nằm trong namespace của node nên được dọn theo namespace, không cần killall.
+    """
+    reg = teardown.Registry(TEARDOWN_TAG).track_net(net)
+    reg.add_netns(*[name for name, n in net.nameToNode.items() if hasattr(n, 'pid')])
+    reg.add_files(*[frr.conf_dir(r) for r in routers], '/tmp/r1_tayga')
+    reg.add_cmd(HOSTS_CLEAN_CMD)
+    return reg.save()
+
+def mn_cleanup(full=False):
+    """
+    Dọn rác của lần chạy trước theo registry teardown (chỉ đúng tài nguyên topology này đã tạo).
+    full=True (cờ --clean): càn quét toàn cục kiểu cũ - mn -c + killall, dùng khi registry cũng không cứu được.
+    """
+    if not full:
+        rep = teardown.cleanup_stale(TEARDOWN_TAG)
+        if rep:
+            info('*** Dọn tài nguyên lần chạy trước: ' + teardown.format_report(rep))
+        return
     info('*** Dọn rác hệ thống (Flush Clean)...\n')
     os.system('rm -rf /var/run/netns/web* /var/run/netns/dns* /var/run/netns/db* 2>/dev/null')
-    os.system("sed -i '/# MININET-DNS-MAPPING-START/,/# MININET-DNS-MAPPING-END/d' /etc/hosts 2>/dev/null")
+    os.system(HOSTS_CLEAN_CMD + ' 2>/dev/null')
     os.system('sudo mn -c 2>/dev/null')
     os.system('sudo killall -9 zebra ospf6d tayga 2>/dev/null')
 
@@ -384,6 +393,7 @@ def run():
     # Vì sao? Vì trí não của Mạng nằm tự phân tán tại các Router chạy OSPF (Distributed Routing).
     net = Mininet(topo=topo, controller=None)
     net.start()
+    track_resources(net, convergence.OSPF_PLAN)
     
     # Kích quy trình gán IP + Mở Cáp
     configure_network(net)
@@ -396,8 +406,8 @@ def run():
     # Neo màn hình tại Command Line tự tạo
     TechVerseCLI(net)
     
-    # Kết xuất, rút quân!
-    net.stop()
+    # Kết xuất, rút quân! (dọn song song đúng tài nguyên đã ghi thay vì net.stop() + mn -c)
+    info('*** ' + teardown.format_report(teardown.stop(net)))
 
 if __name__ == '__main__':
     # Chỉ định màn in Mức Thông báo (Info) để debug
@@ -405,7 +415,7 @@ if __name__ == '__main__':
     
     # Bắt tín hiệu cờ Dọn Rác từ Argument terminal
     if '--clean' in sys.argv or '-c' in sys.argv:
-        mn_cleanup()
+        mn_cleanup(full=True)
         sys.exit(0)
     
     # Bức nền Mininet yêu cầu quyền tối cao (Root - Sudo) để tạo Network Namespace ẩn (Veth pairs)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# source/ui_events.py
+"""
+HÀNG ĐỢI SỰ KIỆN GIAO DIỆN + BỘ GHI LOG NỀN
+- Tk không an toàn đa luồng: luồng worker KHÔNG được chạm vào widget.
+  Worker chỉ đẩy sự kiện có cấu trúc vào hàng đợi:
+      ('log', widget, msg)        -> thêm một dòng vào ô log
+      ('call', fn, args)          -> gọi fn(*args) trên luồng Tk (VD: messagebox)
+- Mainloop của Tk rút hàng đợi theo lô định kỳ bằng after(): mỗi widget chỉ insert/see một lần mỗi lô
+  thay vì insert + update() (vẽ lại toàn bộ) cho từng dòng.
+- Ghi file log qua một luồng nền có bộ đệm: gom nhiều dòng rồi ghi một lần, không mở/đóng file mỗi dòng.
+"""
+import queue
+import atexit
+import threading
+
+DRAIN_INTERVAL_MS = 50
+MAX_BATCH = 1000
+FLUSH_INTERVAL = 0.5
+
+_events = queue.Queue()
+
+def post_log(widget, msg):
+    _events.put(('log', widget, msg))
+
+def post_call(fn, *args):
+    _events.put(('call', fn, args))
+
+def drain(max_batch=MAX_BATCH):
+    """Rút tối đa max_batch sự kiện và áp lên widget. CHỈ gọi từ luồng Tk."""
+    pending = {}   # widget -> [dòng]
+    for _ in range(max_batch):
+        try:
+            ev = _events.get_nowait()
+        except queue.Empty:
+            break
+        if ev[0] == 'log':
+            pending.setdefault(ev[1], []).append(ev[2])
+        elif ev[0] == 'call':
+            # Đổ log đang chờ trước để thứ tự hiển thị khớp với thứ tự worker gửi
+            _flush(pending)
+            pending = {}
+            ev[1](*ev[2])
+    _flush(pending)
+
+def _flush(pending):
+    for wid, lines in pending.items():
+        wid.insert('end', "\n".join(lines) + "\n")
+        wid.see('end')
+
+def pump(root, interval_ms=DRAIN_INTERVAL_MS):
+    """Gắn vòng rút hàng đợi định kỳ vào mainloop của `root`."""
+    def tick():
+        try:
+            drain()
+        finally:
+            root.after(interval_ms, tick)
+    root.after(interval_ms, tick)
+
+class LogWriter:
+    """Luồng nền gom các dòng log và ghi nối vào file theo lô."""
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._q = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, line):
+        self._q.put(line)
+
+    def _loop(self):
+        while True:
+            try:
+                first = self._q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while True:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            lines = [l for l in batch if l is not None]
+            if lines:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write("".join(lines))
+                except OSError:
+                    pass
+            if stop:
+                return
+
+    def close(self):
+        if self._thread.is_alive():
+            self._q.put(None)
+            self._thread.join(timeout=2)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# common/ipbatch.py
+"""
+BỘ BIÊN DỊCH CẤU HÌNH `ip -batch` / `bridge -batch` DÙNG CHUNG CHO CÁC BÀI TẬP
+- Khai báo cấu hình từng node theo kiểu khai báo (địa chỉ, link, bridge, route, fdb)
+  thay vì gọi hàng trăm lần node.cmd() (mỗi lần là một lượt ghi pty + chờ prompt của Mininet).
+- Mỗi node được biên dịch thành MỘT script ip -batch (+ một script bridge -batch nếu có fdb)
+  và áp dụng trong một lệnh duy nhất.
+- apply_all() áp dụng cho mọi node ĐỒNG THỜI bằng nsenter theo PID của node,
+  nên thời gian dựng mạng không còn tăng theo số lệnh.
+Lưu ý: dòng trong ip -batch không nhận tuỳ chọn -4/-6, họ địa chỉ được suy ra từ chính địa chỉ
+(route mặc định IPv6 phải viết "::/0" thay vì "default").
+"""
+import os
+import tempfile
+import subprocess
+
+class NodeConfig:
+    """Cấu hình của một network namespace, các hàm trả về self để viết nối tiếp."""
+    def __init__(self, name):
+        self.name = name
+        self.ip_lines = []
+        self.bridge_lines = []
+
+    def ip(self, line):
+        """Thêm nguyên một dòng lệnh ip (không có chữ 'ip' ở đầu)."""
+        self.ip_lines.append(line)
+        return self
+
+    def addr(self, dev, cidr):
+        return self.ip(f"addr add {cidr} dev {dev}")
+
+    def flush(self, dev):
+        return self.ip(f"addr flush dev {dev}")
+
+    def link_add(self, name, kind, opts=""):
+        return self.ip(f"link add name {name} type {kind} {opts}".rstrip())
+
+    def up(self, dev):
+        return self.ip(f"link set dev {dev} up")
+
+    def master(self, dev, bridge):
+        return self.ip(f"link set dev {dev} master {bridge}")
+
+    def bridge(self, name, ports=(), addrs=()):
+        """Tạo bridge, gom port vào, gắn địa chỉ SVI lên bridge."""
+        self.link_add(name, 'bridge').up(name)
+        for p in ports:
+            self.master(p, name)
+        for a in addrs:
+            self.addr(name, a)
+        return self
+
+    def route(self, prefix, via=None, dev=None, metric=None):
+        line = f"route add {prefix}"
+        if via:
+            line += f" via {via}"
+        if dev:
+            line += f" dev {dev}"
+        if metric is not None:
+            line += f" metric {metric}"
+        return self.ip(line)
+
+    def fdb(self, mac, dev, dst):
+        self.bridge_lines.append(f"fdb append {mac} dev {dev} dst {dst}")
+        return self
+
+    def scripts(self):
+        """Trả về (nội dung ip -batch, nội dung bridge -batch)."""
+        ip_s = "\n".join(self.ip_lines) + "\n" if self.ip_lines else ""
+        br_s = "\n".join(self.bridge_lines) + "\n" if self.bridge_lines else ""
+        return ip_s, br_s
+
+    def __len__(self):
+        return len(self.ip_lines) + len(self.bridge_lines)
+
+def _write_scripts(cfg, tmpdir):
+    ip_s, br_s = cfg.scripts()
+    parts = []
+    if ip_s:
+        path = os.path.join(tmpdir, f"{cfg.name}.ip")
+        with open(path, 'w') as f:
+            f.write(ip_s)
+        parts.append(f"ip -force -batch {path}")
+    if br_s:
+        path = os.path.join(tmpdir, f"{cfg.name}.bridge")
+        with open(path, 'w') as f:
+            f.write(br_s)
+        parts.append(f"bridge -force -batch {path}")
+    # ';' chứ không phải '&&': lỗi ip (VD: địa chỉ đã tồn tại) không được chặn fdb phía sau
+    return "; ".join(parts)
+
+def apply(node, cfg):
+    """Áp dụng cấu hình lên một node Mininet chỉ bằng MỘT lần node.cmd()."""
+    with tempfile.TemporaryDirectory(prefix="ipbatch-") as tmpdir:
+        cmd = _write_scripts(cfg, tmpdir)
+        return node.cmd(f"{cmd} 2>&1") if cmd else ""
+
+def apply_all(net, configs):
+    """
+    Áp dụng đồng thời cấu hình cho nhiều node.
+    configs: iterable NodeConfig (tên trùng tên node trong net).
+    Trả về {tên node: (mã thoát, output)}; mã khác 0 nghĩa là có dòng lệnh lỗi.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="ipbatch-") as tmpdir:
+        procs = {}
+        for cfg in configs:
+            cmd = _write_scripts(cfg, tmpdir)
+            if not cmd:
+                continue
+            pid = str(net[cfg.name].pid)
+            procs[cfg.name] = subprocess.Popen(['nsenter', '-t', pid, '-n', 'sh', '-c', cmd],
+                                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        for name, p in procs.items():
+            out, _ = p.communicate()
+            results[name] = (p.returncode, out)
+    return results
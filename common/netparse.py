@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# common/netparse.py
+"""
+THƯ VIỆN PARSE KẾT QUẢ ĐO DÙNG CHUNG (iperf2 text, iperf3 text/JSON, ping/ping6, traceroute)
+- Trả về bản ghi có kiểu (namedtuple) thay vì tuple rời; đơn vị băng thông chuẩn hoá về Mbps
+  (bits/Kbits/Mbits/Gbits/sec và Bytes/KBytes/MBytes/GBytes/sec).
+- Không đoán mò: khi output không có phần tổng kết (sai định dạng, lệnh chưa chạy xong)
+  bản ghi có ok=False và error mô tả lý do, thay vì âm thầm trả 9999 / 0.
+- parse_batch(): output gộp của nhiều lệnh chạy song song trong một shell, mỗi phần mở đầu bằng `@@<khoá>`
+  → tách cả khối bằng MỘT lượt regex rồi parse từng phần ({khoá: bản ghi}), không còn awk/tr trong shell.
+- parse_many() / parse_files() + columns(): parse một list log / các file log rồi gom thành cột
+  (mảng NumPy nếu có numpy) để tính toán trên cả đợt stress test.
+- Bộ mẫu output thật cho từng định dạng nằm ở common/test_netparse.py (pytest).
+"""
+import re
+import sys
+import json
+import glob
+from collections import namedtuple
+
+PingResult = namedtuple('PingResult', 'ok sent received loss_pct rtt_min rtt_avg rtt_max rtt_mdev error')
+Throughput = namedtuple('Throughput', 'ok kind mbps retransmits jitter_ms lost_pct streams error')
+TraceResult = namedtuple('TraceResult', 'ok hops reached error')   # hops: [(ttl, ip hoặc None, rtt_ms hoặc None)]
+
+_UNIT = {'': 1e-6, 'k': 1e-3, 'm': 1.0, 'g': 1e3, 't': 1e6}
+
+_PING_STATS = re.compile(r'---\s*\S+\s+ping statistics\s*---')
+_PING_COUNT = re.compile(r'(\d+) packets transmitted, (\d+) (?:packets )?received')
+_PING_LOSS = re.compile(r'(\d+(?:\.\d+)?)% packet loss')
+_PING_RTT = re.compile(r'(?:rtt|round-trip) min/avg/max(?:/(?:mdev|stddev))?\s*=\s*'
+                       r'([\d.]+)/([\d.]+)/([\d.]+)(?:/([\d.]+))?\s*ms')
+_RATE = re.compile(r'([\d.]+)\s*([KMGT]?)(bits|Bytes)/sec', re.I)
+_IPERF2_UDP = re.compile(r'([\d.]+)\s*ms\s+(\d+)\s*/\s*(\d+)\s*\(([\d.e+-]+)%\)')
+_IPERF3_RETR = re.compile(r'bits/sec\s+(\d+)\s+sender', re.I)
+_TRACE_HOP = re.compile(r'^\s*(\d+)\s+(.*)$')
+_TRACE_ADDR = re.compile(r'([0-9a-fA-F:.]+[0-9a-fA-F])\s+(?:\([^)]*\)\s+)?([\d.]+)\s*ms')
+_BATCH = re.compile(r'^@@(\S+)[ \t]*\n?(.*?)(?=^@@|\Z)', re.M | re.S)
+
+def to_mbps(value, prefix='M', unit='bits'):
+    """Chuẩn hoá một giá trị tốc độ về Mbps: to_mbps(1.2, 'G') = 1200.0; to_mbps(500, 'K', 'Bytes') = 4.0."""
+    mbps = float(value) * _UNIT[prefix.lower()]
+    return mbps * 8 if unit.lower() == 'bytes' else mbps
+
+# ----- ping / ping6 -----
+def parse_ping(raw):
+    """Output ping/ping6 (iputils, busybox) → PingResult. Chỉ đọc phần statistics CUỐI (bỏ rác lẫn vào)."""
+    raw = raw or ''
+    marks = list(_PING_STATS.finditer(raw))
+    section = raw[marks[-1].start():] if marks else raw
+    cnt = _PING_COUNT.search(section)
+    loss = _PING_LOSS.search(section)
+    if not loss:
+        return PingResult(False, None, None, None, None, None, None, None, 'không có dòng packet loss')
+    rtt = _PING_RTT.search(section)
+    vals = [float(x) if x else None for x in rtt.groups()] if rtt else [None] * 4
+    return PingResult(True, int(cnt.group(1)) if cnt else None, int(cnt.group(2)) if cnt else None,
+                      min(100.0, float(loss.group(1))), *vals, '')
+
+# ----- iperf -----
+def parse_iperf3_json(raw, udp=None):
+    """Output `iperf3 -J` (client) → Throughput. udp=None: tự nhận theo start.test_start.protocol."""
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        last = (raw or '').strip().splitlines() or ['không có output']
+        return Throughput(False, 'iperf3', 0.0, None, None, None, None, last[-1][:80])
+    if data.get('error'):
+        return Throughput(False, 'iperf3', 0.0, None, None, None, None, data['error'])
+    start = data.get('start', {}).get('test_start', {})
+    if udp is None:
+        udp = start.get('protocol') == 'UDP'
+    end = data.get('end', {})
+    streams = start.get('num_streams')
+    if udp:
+        s = end.get('sum', {})
+        if not s:
+            return Throughput(False, 'iperf3', 0.0, None, None, None, streams, 'thiếu end.sum')
+        return Throughput(True, 'iperf3', s.get('bits_per_second', 0) / 1e6, None,
+                          s.get('jitter_ms'), s.get('lost_percent'), streams, '')
+    # TCP: băng thông phía nhận (lượng dữ liệu thật sự tới nơi), retransmit phía gửi
+    recv, sent = end.get('sum_received'), end.get('sum_sent', {})
+    if not recv:
+        return Throughput(False, 'iperf3', 0.0, None, None, None, streams, 'thiếu end.sum_received')
+    return Throughput(True, 'iperf3', recv.get('bits_per_second', 0) / 1e6, sent.get('retransmits'),
+                      None, None, streams, '')
+
+def parse_iperf_text(raw):
+    """
+    Output dạng text của iperf2 hoặc iperf3 → Throughput (dòng tổng kết cuối cùng).
+    iperf2: ưu tiên dòng [SUM] (-P > 1), UDP lấy thêm jitter / lost từ Server Report.
+    iperf3: ưu tiên dòng 'receiver' (SUM nếu có), retransmit từ dòng 'sender'.
+    """
+    lines = [l for l in (raw or '').splitlines() if '/sec' in l and _RATE.search(l)]
+    if not lines:
+        return Throughput(False, 'text', 0.0, None, None, None, None, 'không có dòng bits/sec')
+    kind = 'iperf3' if any(l.rstrip().endswith(('sender', 'receiver')) for l in lines) else 'iperf2'
+    pick = lines
+    if kind == 'iperf3':
+        pick = [l for l in lines if l.rstrip().endswith('receiver')] or lines
+    sums = [l for l in pick if 'SUM' in l]
+    line = (sums or pick)[-1]
+    m = _RATE.search(line)
+    mbps = to_mbps(m.group(1), m.group(2), m.group(3))
+    retr = jitter = lost = None
+    if kind == 'iperf3':
+        senders = [l for l in lines if l.rstrip().endswith('sender')]
+        senders = [l for l in senders if 'SUM' in l] or senders
+        r = _IPERF3_RETR.search(senders[-1]) if senders else None
+        retr = int(r.group(1)) if r else None
+    u = _IPERF2_UDP.search(line)
+    if u:
+        jitter, lost = float(u.group(1)), float(u.group(4))
+    streams = len({l.split(']')[0] for l in lines if l.lstrip().startswith('[') and 'SUM' not in l}) or None
+    return Throughput(True, kind, mbps, retr, jitter, lost, streams, '')
+
+def parse_iperf(raw):
+    """Tự nhận định dạng: JSON (iperf3 -J) hoặc text (iperf2 / iperf3)."""
+    return parse_iperf3_json(raw) if (raw or '').lstrip().startswith('{') else parse_iperf_text(raw)
+
+# ----- traceroute -----
+def parse_traceroute(raw, target=None):
+    """Output traceroute/traceroute6 -n → TraceResult; hop timeout ('*') có ip=None."""
+    hops = []
+    for line in (raw or '').splitlines():
+        if line.startswith('traceroute'):
+            continue
+        m = _TRACE_HOP.match(line)
+        if not m:
+            continue
+        a = _TRACE_ADDR.search(m.group(2))
+        hops.append((int(m.group(1)), a.group(1) if a else None, float(a.group(2)) if a else None))
+    if not hops:
+        return TraceResult(False, [], False, 'không có hop nào')
+    last = hops[-1][1]
+    reached = last is not None and (target is None or last == target)
+    return TraceResult(True, hops, reached, '')
+
+# ----- Parse hàng loạt -----
+PARSERS = {'ping': parse_ping, 'iperf': parse_iperf, 'iperf3': parse_iperf3_json,
+           'iperf_text': parse_iperf_text, 'traceroute': parse_traceroute}
+
+def parse_many(raws, kind='iperf'):
+    """Parse một loạt output cùng loại (list chuỗi) → list bản ghi (mỗi chuỗi một lần gọi parser)."""
+    fn = PARSERS[kind]
+    return [fn(r) for r in raws]
+
+def parse_batch(out, kind='ping'):
+    """
+    Output gộp dạng '@@<khoá> <kết quả>' (một dòng) hoặc '@@<khoá>\\n<kết quả nhiều dòng>' của các lệnh chạy
+    song song → {khoá: bản ghi}. Tách mọi phần bằng một lượt finditer; dòng rác trước '@@' đầu tiên bị bỏ qua.
+    """
+    fn = PARSERS[kind]
+    return {m.group(1): fn(m.group(2)) for m in _BATCH.finditer(out or '')}
+
+def parse_files(pattern, kind='iperf'):
+    """Parse mọi file log khớp glob (VD: '/tmp/iperf_t2_lab*.txt') → {đường dẫn: bản ghi}."""
+    out = {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path, errors='replace') as f:
+            out[path] = PARSERS[kind](f.read())
+    return out
+
+def columns(records):
+    """Gom list bản ghi cùng kiểu thành {trường: cột}; cột số là mảng NumPy (None → NaN) nếu có numpy."""
+    if not records:
+        return {}
+    cols = {f: [getattr(r, f) for r in records] for f in records[0]._fields}
+    try:
+        import numpy as np
+    except ImportError:
+        return cols
+    for f, vals in cols.items():
+        if all(v is None or isinstance(v, (int, float)) for v in vals):
+            cols[f] = np.array([float('nan') if v is None else v for v in vals], dtype=float)
+    return cols
+
+if __name__ == '__main__':
+    # Dùng như bộ lọc: cat log | python3 netparse.py [ping|iperf|iperf3|iperf_text|traceroute]
+    print(PARSERS[sys.argv[1] if len(sys.argv) > 1 else 'iperf'](sys.stdin.read()))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# common/ovsbatch.py
+"""
+GOM CẤU HÌNH OVS THÀNH GIAO DỊCH OVSDB + FILE FLOW (THAY CHO HÀNG CHỤC `switch.cmd('ovs-vsctl set port ...')`)
+- Khai báo cấu hình từng switch (STP, port trunk / access, policing, hàng đợi HTB, flow) theo kiểu nối tiếp,
+  giống ipbatch.NodeConfig cho namespace.
+- apply_all() đẩy MỌI lệnh ovs-vsctl của mọi switch trong MỘT giao dịch `ovs-vsctl -- ... -- ...`
+  (một lần commit + một lần chờ ovs-vswitchd), rồi nạp flow của từng switch bằng MỘT lệnh
+  `ovs-ofctl replace-flows` / `add-flows` đọc từ file, các switch chạy song song.
+- Giao dịch OVSDB là nguyên tử: một lệnh sai làm hỏng cả giao dịch → tự thử lại theo từng switch
+  để switch hợp lệ vẫn được cấu hình và chỉ ra switch lỗi.
+- Lệnh chạy ở root namespace (bridge OVS không nằm trong namespace của node nào), không qua pty Mininet.
+"""
+import os
+import time
+import tempfile
+import subprocess
+
+def _vlans(vlans):
+    return ','.join(str(v) for v in vlans) if not isinstance(vlans, (str, int)) else str(vlans)
+
+class SwitchConfig:
+    """Cấu hình của một bridge OVS, các hàm trả về self để viết nối tiếp."""
+    def __init__(self, name, protocol=None):
+        self.name = getattr(name, 'name', name)   # nhận tên hoặc node Mininet
+        self.protocol = protocol                  # VD: 'OpenFlow13' cho ovs-ofctl -O
+        self.cmds = []                            # mỗi phần tử: list tham số của một lệnh ovs-vsctl
+        self.flows = []
+        self.replace = False
+
+    def vsctl(self, *args):
+        """Thêm nguyên một lệnh ovs-vsctl (không có chữ 'ovs-vsctl' ở đầu)."""
+        self.cmds.append([str(a) for a in args])
+        return self
+
+    def set(self, table, record, *pairs):
+        return self.vsctl('set', table, record, *pairs)
+
+    def stp(self, priority=None):
+        pairs = ['stp_enable=true'] + ([f'other_config:stp-priority={priority}'] if priority is not None else [])
+        return self.set('Bridge', self.name, *pairs)
+
+    def trunk(self, port, vlans):
+        return self.set('Port', port, 'vlan_mode=trunk', f'trunk={_vlans(vlans)}')
+
+    def access(self, port, vlan):
+        return self.set('Port', port, f'tag={vlan}')
+
+    def policing(self, intf, rate_kbps, burst_kb):
+        return self.set('Interface', intf, f'ingress_policing_rate={rate_kbps}', f'ingress_policing_burst={burst_kb}')
+
+    def htb(self, port, max_rate, queues):
+        """Gắn QoS linux-htb lên port; queues = [(min_rate, max_rate), ...] theo thứ tự queue 0, 1, ...
+        Tên @id có tiền tố tên port nên nhiều switch dùng chung được một giao dịch."""
+        tag = port.replace('-', '_')
+        refs = ','.join(f'{i}=@{tag}_q{i}' for i in range(len(queues)))
+        self.set('Port', port, f'qos=@{tag}_qos')
+        self.vsctl(f'--id=@{tag}_qos', 'create', 'qos', 'type=linux-htb',
+                   f'other-config:max-rate={max_rate}', f'queues={refs}')
+        for i, (lo, hi) in enumerate(queues):
+            self.vsctl(f'--id=@{tag}_q{i}', 'create', 'queue',
+                       f'other-config:min-rate={lo}', f'other-config:max-rate={hi}')
+        return self
+
+    def flow(self, spec):
+        self.flows.append(spec)
+        return self
+
+    def replace_flows(self, *specs):
+        """Bảng flow sau khi áp dụng chỉ còn đúng các flow khai báo (thay cho del-flows + add-flow)."""
+        self.replace = True
+        self.flows.extend(specs)
+        return self
+
+    def __len__(self):
+        return len(self.cmds) + len(self.flows)
+
+def _vsctl_argv(cmds):
+    argv = ['ovs-vsctl']
+    for c in cmds:
+        argv += ['--'] + c
+    return argv
+
+def _run(argv, timeout=60):
+    try:
+        p = subprocess.run(argv, capture_output=True, text=True, timeout=timeout)
+        return p.returncode, (p.stdout + p.stderr).strip()
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return -1, str(e)
+
+def _ofctl_argv(cfg, path):
+    argv = ['ovs-ofctl'] + (['-O', cfg.protocol] if cfg.protocol else [])
+    return argv + ['replace-flows' if cfg.replace else 'add-flows', cfg.name, path]
+
+def apply(cfg):
+    """Áp dụng cấu hình một switch: một giao dịch ovs-vsctl + một lệnh ovs-ofctl. Trả về {bước: (mã, output)}."""
+    return apply_all([cfg])['results'].get(cfg.name, {})
+
+def apply_all(configs):
+    """
+    Áp dụng cấu hình cho nhiều switch.
+    Trả về {'vsctl_ms', 'ofctl_ms', 'total_ms', 'transactions': số giao dịch OVSDB đã dùng,
+            'results': {tên switch: {'vsctl': (mã, output), 'ofctl': (mã, output)}}}; mã khác 0 là lỗi.
+    """
+    configs = [c for c in configs if len(c)]
+    results = {c.name: {} for c in configs}
+    t0 = time.perf_counter()
+
+    with_cmds = [c for c in configs if c.cmds]
+    transactions = 0
+    if with_cmds:
+        rc, out = _run(_vsctl_argv([cmd for c in with_cmds for cmd in c.cmds]))
+        transactions = 1
+        if rc == 0:
+            for c in with_cmds:
+                results[c.name]['vsctl'] = (0, '')
+        else:
+            # Cả giao dịch bị huỷ → làm lại từng switch để khoanh vùng lỗi
+            for c in with_cmds:
+                results[c.name]['vsctl'] = _run(_vsctl_argv(c.cmds))
+                transactions += 1
+    t1 = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(prefix='ovsbatch-') as tmpdir:
+        procs = {}
+        for c in configs:
+            if not c.flows and not c.replace:
+                continue
+            path = os.path.join(tmpdir, f'{c.name}.flows')
+            with open(path, 'w') as f:
+                f.write('\n'.join(c.flows) + '\n')
+            procs[c.name] = subprocess.Popen(_ofctl_argv(c, path), stdout=subprocess.PIPE,
+                                             stderr=subprocess.STDOUT, text=True)
+        for name, p in procs.items():
+            out, _ = p.communicate()
+            results[name]['ofctl'] = (p.returncode, out.strip())
+    t2 = time.perf_counter()
+
+    return {'vsctl_ms': round((t1 - t0) * 1000, 1), 'ofctl_ms': round((t2 - t1) * 1000, 1),
+            'total_ms': round((t2 - t0) * 1000, 1), 'transactions': transactions, 'results': results}
+
+def failures(report):
+    """Danh sách (switch, bước, output) bị lỗi trong kết quả apply_all()."""
+    return [(sw, step, out) for sw, steps in report['results'].items()
+            for step, (rc, out) in steps.items() if rc != 0]
+
+def format_report(report, configs=None):
+    n_cmds = sum(len(c.cmds) for c in configs) if configs else None
+    n_flows = sum(len(c.flows) for c in configs) if configs else None
+    msg = (f"OVS batch: {len(report['results'])} switch"
+           + (f", {n_cmds} lệnh vsctl, {n_flows} flow" if configs else '')
+           + f" | {report['transactions']} giao dịch OVSDB {report['vsctl_ms']:.0f} ms"
+           + f" + flow {report['ofctl_ms']:.0f} ms = {report['total_ms']:.0f} ms")
+    bad = failures(report)
+    if bad:
+        msg += ' | LỖI: ' + ', '.join(f'{sw}/{step}' for sw, step, _ in bad)
+    return msg + '\n'
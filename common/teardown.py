@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# common/teardown.py
+"""
+DỌN DẸP CHÍNH XÁC TÀI NGUYÊN ĐÃ TẠO (THAY CHO `mn -c` + `killall -9 zebra ospf6d tayga`)
+- Registry ghi lại mọi thứ một lần dựng mạng tạo ra: namespace của từng node (inode ns/net + pid shell
+  của node và thời điểm khởi chạy shell – kernel tái sử dụng số inode nên inode một mình chưa đủ định danh),
+  interface ở root namespace (veth phía switch), OVS bridge, tiến trình (pid + thời điểm khởi chạy),
+  symlink /var/run/netns, file/thư mục tạm và lệnh dọn thêm (VD: gỡ khối /etc/hosts).
+- teardown() xoá ĐÚNG những thứ đó, các nhóm chạy song song:
+    tiến trình: giết mọi pid nằm trong namespace đã ghi (zebra/ospf6d/tayga/iperf... chỉ của mạng này),
+                CHỈ khi shell đã ghi của namespace đó vẫn còn sống (cùng pid + starttime + inode);
+                shell bị giết sau cùng để namespace không bị giải phóng / tái sử dụng giữa chừng
+    OVS: một giao dịch ovs-vsctl duy nhất cho mọi bridge; link: một lệnh `ip -force -batch`
+- Registry được lưu ra /tmp/teardown/<tag>.json → lần chạy sau (hoặc sau Ctrl+C / crash)
+  cleanup_stale(tag) vẫn dọn được mà không đụng tới tiến trình / mạng của người khác trên máy.
+- `mn -c` chỉ còn là phương án dự phòng khi sau teardown vẫn còn sót tài nguyên.
+Dùng: reg = Registry('cauhinh2').track_net(net).save()  ...  teardown.stop(net)
+"""
+import os
+import json
+import time
+import signal
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+STATE_DIR = '/tmp/teardown'
+
+def _ns_inode(pid):
+    """Chuỗi định danh network namespace của tiến trình (VD: 'net:[4026532712]'); None nếu pid đã chết."""
+    try:
+        return os.readlink(f'/proc/{pid}/ns/net')
+    except OSError:
+        return None
+
+def _starttime(pid):
+    """Thời điểm khởi chạy (trường 22 của /proc/<pid>/stat) – chống giết nhầm khi pid bị tái sử dụng."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return int(f.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+def _pids_by_ns(inodes):
+    """Quét /proc MỘT lần: {inode: [pid]} cho các namespace cần dọn."""
+    found = {ino: [] for ino in inodes}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            ino = _ns_inode(entry)
+            if ino in found:
+                found[ino].append(int(entry))
+    return found
+
+def _sigkill(pids):
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+def _run(cmd, stdin=None, timeout=30):
+    try:
+        p = subprocess.run(cmd, input=stdin, capture_output=True, text=True, timeout=timeout)
+        return p.returncode
+    except (OSError, subprocess.TimeoutExpired):
+        return -1
+
+class Registry:
+    """Danh sách tài nguyên của một lần dựng mạng, định danh bằng `tag` (VD: tên file cấu hình)."""
+    def __init__(self, tag):
+        self.tag = tag
+        self.namespaces = {}   # node -> {'ns': inode ns/net, 'pid': pid shell node, 'start': starttime shell}
+        self.pids = {}         # pid -> starttime (tiến trình ở root namespace: shell switch, daemon ngoài)
+        self.bridges = set()   # OVS bridge
+        self.links = set()     # interface ở root namespace
+        self.netns = set()     # tên trong /var/run/netns
+        self.files = set()     # file / thư mục tạm
+        self.cmds = []         # lệnh shell dọn thêm, chạy cuối cùng
+
+    @property
+    def path(self):
+        return os.path.join(STATE_DIR, f'{self.tag}.json')
+
+    # ----- Ghi nhận -----
+    def track_net(self, net):
+        """Ghi lại node, bridge, link của một đối tượng Mininet đã start(); gắn registry vào net.teardown."""
+        root = _ns_inode('self')
+        for node in net.hosts:
+            ino, st = _ns_inode(node.pid), _starttime(node.pid)
+            if ino and ino != root and st is not None:
+                self.namespaces[node.name] = {'ns': ino, 'pid': int(node.pid), 'start': st}
+            else:
+                self.add_pids(node.pid)
+        for sw in net.switches:
+            if hasattr(sw, 'dpid') and 'OVS' in type(sw).__name__:
+                self.bridges.add(sw.name)
+            if getattr(sw, 'pid', None):
+                self.add_pids(sw.pid)
+            self.links.update(i.name for i in sw.intfList() if i.name != 'lo')
+        for c in net.controllers:
+            if getattr(c, 'pid', None):
+                self.add_pids(c.pid)
+        net.teardown = self
+        return self
+
+    def add_pids(self, *pids):
+        for pid in pids:
+            st = _starttime(pid)
+            if st is not None:
+                self.pids[int(pid)] = st
+        return self
+
+    def add_netns(self, *names):
+        self.netns.update(names)
+        return self
+
+    def add_files(self, *paths):
+        self.files.update(paths)
+        return self
+
+    def add_cmd(self, cmd):
+        if cmd not in self.cmds:
+            self.cmds.append(cmd)
+        return self
+
+    # ----- Lưu / nạp -----
+    def save(self):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        state = {'tag': self.tag, 'namespaces': self.namespaces,
+                 'pids': {str(p): st for p, st in self.pids.items()},
+                 'bridges': sorted(self.bridges), 'links': sorted(self.links),
+                 'netns': sorted(self.netns), 'files': sorted(self.files), 'cmds': self.cmds}
+        with open(self.path, 'w') as f:
+            json.dump(state, f, indent=1)
+        return self
+
+    @classmethod
+    def load(cls, tag):
+        """Nạp registry của lần chạy trước; None nếu không có."""
+        reg = cls(tag)
+        try:
+            with open(reg.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Bản ghi cũ chỉ có inode (không có shell để đối chiếu) → bỏ qua, không dám giết theo namespace
+        reg.namespaces = {n: v for n, v in state.get('namespaces', {}).items()
+                          if isinstance(v, dict) and {'ns', 'pid', 'start'} <= set(v)}
+        reg.pids = {int(p): st for p, st in state.get('pids', {}).items()}
+        reg.bridges = set(state.get('bridges', []))
+        reg.links = set(state.get('links', []))
+        reg.netns = set(state.get('netns', []))
+        reg.files = set(state.get('files', []))
+        reg.cmds = list(state.get('cmds', []))
+        return reg
+
+    # ----- Dọn dẹp -----
+    def _live_namespaces(self):
+        """{inode: pid shell} cho các namespace mà shell đã ghi vẫn là chính nó (pid + starttime + inode khớp)."""
+        return {v['ns']: v['pid'] for v in self.namespaces.values()
+                if _starttime(v['pid']) == v['start'] and _ns_inode(v['pid']) == v['ns']}
+
+    def _kill(self):
+        live = self._live_namespaces()
+        victims = []
+        # Hai lượt giết các tiến trình khác trong namespace (bắt cả tiến trình vừa fork) khi shell còn giữ namespace
+        for _ in range(2):
+            found = [p for ino, pids in _pids_by_ns(set(live)).items() for p in pids if p != live[ino]]
+            _sigkill(found)
+            victims += found
+        anchors = [pid for ino, pid in live.items() if _starttime(pid) is not None]
+        roots = [p for p, st in self.pids.items() if _starttime(p) == st]
+        _sigkill(anchors + roots)
+        return len(set(victims)) + len(anchors) + len(roots)
+
+    def _del_bridges(self):
+        if not self.bridges:
+            return 0
+        cmd = ['ovs-vsctl']
+        for br in sorted(self.bridges):
+            cmd += ['--if-exists', 'del-br', br, '--']
+        _run(cmd[:-1])
+        return len(self.bridges)
+
+    def _del_links(self):
+        # Veth có đầu kia trong namespace đã chết tự biến mất; còn lại (link switch-switch) xoá bằng một batch
+        alive = [l for l in sorted(self.links) if os.path.exists(f'/sys/class/net/{l}')]
+        if alive:
+            _run(['ip', '-force', '-batch', '-'], stdin=''.join(f'link del dev {l}\n' for l in alive))
+        return len(alive)
+
+    def _del_netns(self):
+        for name in self.netns:
+            path = f'/var/run/netns/{name}'
+            if os.path.islink(path):
+                os.remove(path)
+            elif os.path.exists(path):
+                _run(['ip', 'netns', 'delete', name])
+        return len(self.netns)
+
+    def _del_files(self):
+        for path in self.files:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.lexists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return len(self.files)
+
+    def leftovers(self):
+        """Tài nguyên còn sót sau teardown (rỗng nghĩa là sạch)."""
+        left = []
+        if self.bridges:
+            try:
+                out = subprocess.run(['ovs-vsctl', 'list-br'], capture_output=True, text=True, timeout=10).stdout
+                left += [f'bridge {b}' for b in out.split() if b in self.bridges]
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        left += [f'link {l}' for l in self.links if os.path.exists(f'/sys/class/net/{l}')]
+        for ino, pids in _pids_by_ns(set(self._live_namespaces())).items():
+            left += [f'pid {p} ({ino})' for p in pids]
+        return left
+
+    def teardown(self, fallback=True, settle=1.0):
+        """
+        Xoá song song mọi tài nguyên đã ghi. Nếu sau `settle` giây vẫn còn sót và fallback=True → chạy `mn -c`.
+        Trả về {'elapsed', 'counts': {nhóm: số lượng}, 'leftover': [...], 'fallback': bool}.
+        """
+        t0 = time.monotonic()
+        jobs = {'pids': self._kill, 'bridges': self._del_bridges, 'links': self._del_links,
+                'netns': self._del_netns, 'files': self._del_files}
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            futures = {k: pool.submit(fn) for k, fn in jobs.items()}
+            counts = {k: f.result() for k, f in futures.items()}
+        for cmd in self.cmds:
+            subprocess.run(cmd, shell=True, capture_output=True)
+        counts['cmds'] = len(self.cmds)
+
+        deadline = time.monotonic() + settle
+        left = self.leftovers()
+        while left and time.monotonic() < deadline:
+            # Namespace chỉ biến mất khi tiến trình cuối cùng trong nó thoát → chờ kernel thu hồi
+            time.sleep(0.05)
+            self._kill()
+            left = self.leftovers()
+        used_fallback = bool(left) and fallback
+        if used_fallback:
+            full_cleanup()
+            left = self.leftovers()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return {'elapsed': round(time.monotonic() - t0, 2), 'counts': counts,
+                'leftover': left, 'fallback': used_fallback}
+
+def full_cleanup():
+    """Phương án dự phòng: `mn -c` toàn cục (dọn cả tài nguyên không ghi nhận được)."""
+    _run(['mn', '-c'], timeout=60)
+
+def stop(net, fallback=True):
+    """
+    Thay cho net.stop() + mn -c: dọn đúng những gì registry của net đã ghi.
+    net chưa có registry (không gọi track_net) → ghi nhận ngay bây giờ rồi dọn.
+    """
+    reg = getattr(net, 'teardown', None) or Registry('adhoc').track_net(net)
+    report = reg.teardown(fallback=fallback)
+    # Thu hồi shell Mininet đã bị giết để không để lại zombie / fd khi dựng lại mạng trong cùng tiến trình
+    for node in net.hosts + net.switches + net.controllers:
+        shell = getattr(node, 'shell', None)
+        if shell is not None:
+            shell.poll()
+            for f in (getattr(node, 'stdin', None), getattr(node, 'stdout', None)):
+                try:
+                    f and f.close()
+                except OSError:
+                    pass
+            node.shell = None
+    return report
+
+def cleanup_stale(tag, fallback=True):
+    """Dọn tài nguyên còn sót của lần chạy trước có cùng tag (Ctrl+C / crash); không có registry → không làm gì."""
+    reg = Registry.load(tag)
+    return reg.teardown(fallback=fallback) if reg else None
+
+def format_report(report):
+    c = report['counts']
+    msg = (f"Teardown {report['elapsed']:.2f}s: {c.get('pids', 0)} tiến trình, {c.get('bridges', 0)} bridge, "
+           f"{c.get('links', 0)} link, {c.get('netns', 0)} netns, {c.get('files', 0)} file")
+    if report['fallback']:
+        msg += " | còn sót → đã chạy mn -c"
+    if report['leftover']:
+        msg += f" | VẪN CÒN: {', '.join(report['leftover'][:5])}"
+    return msg + "\n"
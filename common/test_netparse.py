@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# common/test_netparse.py
+"""
+MẪU OUTPUT THẬT CHO netparse (chạy: python3 -m pytest common/test_netparse.py)
+- GOLDEN: (loại parser, output thật, các trường mong đợi) cho ping/ping6, iperf2, iperf3 text/JSON, traceroute.
+- parse_batch: output gộp '@@<khoá>' của nhiều lệnh chạy song song (dạng một dòng và nhiều dòng).
+"""
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import netparse
+
+GOLDEN = [
+    ('ping', """PING 203.162.1.1 (203.162.1.1) 56(84) bytes of data.
+64 bytes from 203.162.1.1: icmp_seq=1 ttl=63 time=20.4 ms
+64 bytes from 203.162.1.1: icmp_seq=2 ttl=63 time=20.2 ms
+
+--- 203.162.1.1 ping statistics ---
+2 packets transmitted, 2 received, 0% packet loss, time 1001ms
+rtt min/avg/max/mdev = 20.211/20.321/20.432/0.110 ms
+""", dict(ok=True, sent=2, received=2, loss_pct=0.0, rtt_avg=20.321, rtt_mdev=0.110)),
+    ('ping', """PING fd00:30::1(fd00:30::1) 56 data bytes
+
+--- fd00:30::1 ping statistics ---
+5 packets transmitted, 3 received, +2 errors, 40% packet loss, time 4005ms
+rtt min/avg/max/mdev = 0.061/0.083/0.112/0.021 ms, pipe 2
+""", dict(ok=True, sent=5, received=3, loss_pct=40.0, rtt_min=0.061, rtt_max=0.112)),
+    ('ping', """PING 10.0.30.1 (10.0.30.1) 56(84) bytes of data.
+
+--- 10.0.30.1 ping statistics ---
+3 packets transmitted, 0 received, 100% packet loss, time 2030ms
+""", dict(ok=True, received=0, loss_pct=100.0, rtt_avg=None)),
+    ('ping', """macof garbage 1:2:3 -> 4:5:6 0.0.0.0.1 > 0.0.0.0.2
+--- 10.0.0.1 ping statistics ---
+10 packets transmitted, 10 packets received, 0% packet loss
+round-trip min/avg/max = 0.101/0.250/0.499 ms
+""", dict(ok=True, sent=10, received=10, rtt_avg=0.25, rtt_mdev=None)),
+    ('ping', "connect: Network is unreachable\n", dict(ok=False, loss_pct=None)),
+    ('iperf_text', """------------------------------------------------------------
+Client connecting to 10.0.99.1, TCP port 5001
+TCP window size: 85.0 KByte (default)
+------------------------------------------------------------
+[  3] local 10.0.20.1 port 40122 connected with 10.0.99.1 port 5001
+[ ID] Interval       Transfer     Bandwidth
+[  3]  0.0-20.0 sec  2.19 GBytes   941 Mbits/sec
+""", dict(ok=True, kind='iperf2', mbps=941.0, streams=1)),
+    ('iperf_text', """[  4]  0.0- 3.0 sec   410 MBytes  1.15 Gbits/sec
+[  3]  0.0- 3.0 sec   400 MBytes  1.12 Gbits/sec
+[SUM]  0.0- 3.0 sec   810 MBytes  2.27 Gbits/sec
+""", dict(ok=True, kind='iperf2', mbps=2270.0, streams=2)),
+    ('iperf_text', """[  3]  0.0- 5.0 sec   642 KBytes  1.05 Mbits/sec
+[  3] Sent 447 datagrams
+[  3] Server Report:
+[  3]  0.0- 5.0 sec   625 KBytes  1.02 Mbits/sec   0.020 ms   12/  447 (2.7%)
+""", dict(ok=True, kind='iperf2', mbps=1.02, jitter_ms=0.02, lost_pct=2.7)),
+    ('iperf_text', """[  3]  0.0- 3.0 sec   384 KBytes   1000 Kbits/sec
+""", dict(ok=True, mbps=1.0)),
+    ('iperf_text', """Connecting to host 10.0.99.1, port 5201
+[  5] local 10.0.10.1 port 51234 connected to 10.0.99.1 port 5201
+[ ID] Interval           Transfer     Bitrate         Retr  Cwnd
+[  5]   0.00-1.00   sec  1.21 MBytes  10.1 Mbits/sec    3   14.1 KBytes
+- - - - - - - - - - - - - - - - - - - - - - - - -
+[ ID] Interval           Transfer     Bitrate         Retr
+[  5]   0.00-3.00   sec  3.62 MBytes  10.1 Mbits/sec   17             sender
+[  5]   0.00-3.04   sec  3.40 MBytes  9.38 Mbits/sec                  receiver
+
+iperf Done.
+""", dict(ok=True, kind='iperf3', mbps=9.38, retransmits=17)),
+    ('iperf_text', "connect failed: Connection refused\n", dict(ok=False, mbps=0.0)),
+    ('iperf3', json.dumps({'start': {'test_start': {'protocol': 'TCP', 'num_streams': 5}},
+                           'end': {'sum_sent': {'bits_per_second': 9.9e6, 'retransmits': 42},
+                                   'sum_received': {'bits_per_second': 9.5e6}}}),
+     dict(ok=True, mbps=9.5, retransmits=42, streams=5)),
+    ('iperf3', json.dumps({'start': {'test_start': {'protocol': 'UDP', 'num_streams': 1}},
+                           'end': {'sum': {'bits_per_second': 1.0e6, 'jitter_ms': 0.031, 'lost_percent': 0.5}}}),
+     dict(ok=True, mbps=1.0, jitter_ms=0.031, lost_pct=0.5)),
+    ('iperf3', json.dumps({'start': {}, 'end': {}, 'error': 'unable to connect to server: Connection refused'}),
+     dict(ok=False, error='unable to connect to server: Connection refused')),
+    ('traceroute', """traceroute to 203.162.1.1 (203.162.1.1), 5 hops max, 60 byte packets
+ 1  10.0.20.254  0.061 ms
+ 2  *
+ 3  203.162.1.1  10.432 ms
+""", dict(ok=True, reached=True, hops=[(1, '10.0.20.254', 0.061), (2, None, None), (3, '203.162.1.1', 10.432)])),
+    ('traceroute', """traceroute to fd00:30::1 (fd00:30::1), 5 hops max, 80 byte packets
+ 1  fc00:1::1  0.050 ms
+ 2  *
+""", dict(ok=True, reached=False)),
+]
+
+
+@pytest.mark.parametrize('kind, raw, expect', GOLDEN)
+def test_golden(kind, raw, expect):
+    rec = netparse.PARSERS[kind](raw)
+    for field, want in expect.items():
+        got = getattr(rec, field)
+        if isinstance(want, float) and got is not None:
+            assert got == pytest.approx(want), field
+        else:
+            assert got == want, field
+
+def test_parse_batch_single_line():
+    out = ("rác trước\n"
+           "@@10.0.0.1 --- 10.0.0.1 ping statistics --- 3 packets transmitted, 3 received, 0% packet loss, "
+           "time 2ms rtt min/avg/max/mdev = 0.1/0.2/0.3/0.05 ms\n"
+           "@@10.0.0.2 --- 10.0.0.2 ping statistics --- 3 packets transmitted, 0 received, 100% packet loss\n")
+    res = netparse.parse_batch(out, 'ping')
+    assert set(res) == {'10.0.0.1', '10.0.0.2'}
+    assert res['10.0.0.1'].rtt_avg == pytest.approx(0.2)
+    assert res['10.0.0.2'].loss_pct == 100.0
+
+def test_parse_batch_multi_line():
+    out = ("@@fd00:30::1\ntraceroute to fd00:30::1 (fd00:30::1), 5 hops max, 80 byte packets\n"
+           " 1  fc00:1::1  0.050 ms\n 2  *\n 3  fd00:30::1  0.120 ms\n"
+           "@@203.162.1.1\n 1  10.0.20.254  0.061 ms\n")
+    res = netparse.parse_batch(out, 'traceroute')
+    assert [ip for _, ip, _ in res['fd00:30::1'].hops] == ['fc00:1::1', None, 'fd00:30::1']
+    assert res['203.162.1.1'].hops == [(1, '10.0.20.254', 0.061)]